@@ -110,6 +110,7 @@ class DataCollector:
         self.is_initialized = False
         self.capture_started = False
         self._count_thread = None
+        self._listen_process = None
         self.stop_listening_flag = False
         self.bin_sizes = bin_sizes
         self.data_array_size = math.ceil(self.duration / self.interval * 1000)
@@ -147,6 +148,7 @@ class DataCollector:
               f"-e frame.cap_len -e frame.interface_name -e _ws.col.Protocol " \
               f"{self.bpf_filter}"  # -e eth.src -e eth.dst"
         proc = subprocess.Popen(cmd.split(" "), stdout=subprocess.PIPE)
+        self._listen_process = proc
         for line in io.TextIOWrapper(proc.stdout, encoding="utf-8"):
             yield line.rstrip().split("\t")
             if self.stop_listening_flag:
@@ -256,14 +258,29 @@ class DataCollector:
         if self._count_thread:
             self._count_thread.join()
 
-    def start(self):
+    def stop(self):
+        """
+        Stops the collection of data before the duration has elapsed. Packets arriving within the next 2 seconds are
+        still counted, the data collected so far is written to the output file.
+        """
+        stop_timer = threading.Timer(2, self._stop_listening)
+        stop_timer.setDaemon(True)
+        stop_timer.start()
+
+    def _stop_listening(self):
+        if self._listen_process:
+            self._listen_process.terminate()
+
+    def start(self, start_time: float = None):
         """
         Starts collection of data. "activate_capture" needs to be called first.
+
+        :param start_time: Wall-clock time (time.time()) of the first interval, default is now
         """
         if not self.is_initialized:
             log.error("Packet capture not yet activated.")
             return
-        self.start_time = time.time()
+        self.start_time = start_time if start_time is not None else time.time()
         self.capture_started = True
 
 
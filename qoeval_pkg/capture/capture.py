@@ -11,32 +11,48 @@
 import logging as log
 import os
 import subprocess
+import threading
 import time
 import shlex
 import Xlib
 import Xlib.display
 from collections import namedtuple
+from typing import Tuple
 from qoeval_pkg.utils import convert_to_seconds
 from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.capture.frame_tap import FrameTap
+from qoeval_pkg.emulator.standard_emulator import get_vd_name, get_emulator_port
+from qoeval_pkg.errors import PermanentError
+from qoeval_pkg.start_barrier import StartBarrier
+from qoeval_pkg.timing import span
 
 # Define constants
 FFMPEG = "ffmpeg"
+FFPROBE = "ffprobe"
 FFMPEG_FORMAT = "x11grab"
 CAPTURE_FPS = "30"  # rate in FPS
 CAPTURE_DEFAULT_REC_TIME = "00:00:30"
 DISPLAY = "1"
+CAPTURE_POLL_INTERVAL = 0.2  # interval for checking if a recording should be stopped [s]
 
-SDK_EMULATOR_WINDOW_TITLE = "Android Emulator"
+SIMULATED_VIDEO_SIZE = (1280, 720)  # size [pixel] of a synthesized video if there is no trigger image
+SIMULATED_PLAYBACK_START = 2.0  # time [s] at which the synthesized video starts moving (end of buffer initialization)
+SIMULATED_TRIGGER_START = 4.0  # time [s] at which the start trigger image is shown
+SIMULATED_TRIGGER_END_MARGIN = 3.0  # time [s] from showing the end trigger image to the end of the recording
+SIMULATED_TRIGGER_DURATION = 1.0  # time [s] a trigger image is shown
+
+SDK_EMULATOR_WINDOW_TITLE = "Android Emulator"  # followed by " - <AVD name>:<port>"
 GENYMOTION_EMULATOR_WINDOW_TITLE = "- Genymotion"
 
 # Define data structures and tuples
 WinGeo = namedtuple('WinGeo', 'x y height width')
 
 
-def check_env(qoeval_config: QoEvalConfiguration):
+def check_env(qoeval_config: QoEvalConfiguration, is_grabbing_screen: bool = True):
     log.info("checking availability of ffpeg...")
     check_ext(FFMPEG)
-    check_ffmpeg_features()
+    if is_grabbing_screen:
+        check_ffmpeg_features()
 
     if not os.path.exists(qoeval_config.video_capture_path.get()):
         log.debug(f"output directory \"{qoeval_config.video_capture_path.get()}\" does not exist - trying to create it")
@@ -49,7 +65,7 @@ def check_ext(name):
                             universal_newlines=True)
     if len(output.stdout) == 0:
         log.error(f"External component {name} not found. Must be in path - did you run install.sh?")
-        raise RuntimeError('External component not found.')
+        raise PermanentError('External component not found.')
     else:
         log.debug(f"using {output.stdout}")
 
@@ -60,18 +76,31 @@ def check_ffmpeg_features():
                             universal_newlines=True)
     if output.stdout.find(FFMPEG_FORMAT) == -1:
         log.error(f"ffmpeg does not support format {FFMPEG_FORMAT}")
-        raise RuntimeError('Installed ffmpeg does not support a required format.')
+        raise PermanentError('Installed ffmpeg does not support a required format.')
 
 
 class Capture:
-    def __init__(self, qoeval_config: QoEvalConfiguration):
+    # True if the captured frames can be analyzed by a FrameTap while recording
+    supports_frame_tap = False
+    # True if ffmpeg has to support grabbing the screen (FFMPEG_FORMAT)
+    is_grabbing_screen = True
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, tmp_file_suffix: str = ""):
         log.basicConfig(level=log.DEBUG)
         self.qoeval_config = qoeval_config
-        check_env(self.qoeval_config)
+        # appended to the names of temporary files, so that several captures can share a video capture path
+        self.tmp_file_suffix = tmp_file_suffix
+        self._stop_event = threading.Event()
+        check_env(self.qoeval_config, self.is_grabbing_screen)
 
-    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True):
+    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True,
+                        frame_tap: FrameTap = None, start_barrier: StartBarrier = None):
         raise RuntimeError(f"Method not implemented.")
 
+    def stop_recording(self):
+        """Stops a running recording before its duration has elapsed (the recorded part is kept)"""
+        self._stop_event.set()
+
 
 SCREENCOPY_NAME = "scrcpy"
 SCREENCOPY_OPTIONS_WITH_MIRROR = "--stay-awake -N --record"  # note: must end with option for file recording
@@ -79,54 +108,71 @@ SCREENCOPY_OPTIONS_NO_MIRROR = "--no-display --stay-awake -N --record"
 
 
 class CaptureRealDevice(Capture):
-    def __init__(self, qoeval_config: QoEvalConfiguration):
-        super().__init__(qoeval_config)
+    def __init__(self, qoeval_config: QoEvalConfiguration, tmp_file_suffix: str = ""):
+        super().__init__(qoeval_config, tmp_file_suffix)
         check_ext(SCREENCOPY_NAME)
 
-    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True):
+    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True,
+                        frame_tap: FrameTap = None, start_barrier: StartBarrier = None):
+        if frame_tap:
+            log.warning("Live analysis of the captured frames is not supported for real devices")
+        self._stop_event.clear()
         # start video recording from real device
         duration_in_secs = convert_to_seconds(duration)
 
-        dest_tmp = os.path.join(self.qoeval_config.video_capture_path.get(), 'captured_realdev')
+        dest_tmp = os.path.join(self.qoeval_config.video_capture_path.get(), f'captured_realdev{self.tmp_file_suffix}')
         dest = os.path.join(self.qoeval_config.video_capture_path.get(), output_filename)
         if self.qoeval_config.show_device_screen_mirror.get():
             scrcpy_opts = SCREENCOPY_OPTIONS_WITH_MIRROR
         else:
             scrcpy_opts = SCREENCOPY_OPTIONS_NO_MIRROR
-        scrcpy_output = subprocess.Popen(shlex.split(f"{SCREENCOPY_NAME} {scrcpy_opts} {dest_tmp}.mp4"),
-                                         stdout=subprocess.PIPE,
-                                         universal_newlines=True)
-
-        if audio and self.qoeval_config.audio_device_real.get() == '':
-            log.error("Cannot capture audio - audio device not specified - check AudioDeviceReal parameter in config")
-            audio = False
-
-        if audio:
-            # start audio recording - will use ffmpeg for timing the recording
-            command = f"{FFMPEG} -f alsa -i {self.qoeval_config.audio_device_real.get()} -t {duration} -y {dest_tmp}.wav"
-            log.debug(f"start audio recording cmd: {command}")
-            subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                           universal_newlines=True).check_returncode()
-        else:
-            # poll regularly if the process has terminated - until we have reached desired duration
-            runtime_capture = 0.0
-            while scrcpy_output.poll() is None and runtime_capture < duration_in_secs:
-                time.sleep(1)
-                runtime_capture += 1
-
-        scrcpy_output.terminate()
+        if len(self.qoeval_config.adb_device_serial.get()) > 1:
+            # several devices can be attached (e.g. one per worker)
+            scrcpy_opts = f"--serial {self.qoeval_config.adb_device_serial.get()} {scrcpy_opts}"
+        if start_barrier:
+            start_barrier.wait("capture")
+        with span("capture.record"):
+            scrcpy_output = subprocess.Popen(shlex.split(f"{SCREENCOPY_NAME} {scrcpy_opts} {dest_tmp}.mp4"),
+                                             stdout=subprocess.PIPE,
+                                             universal_newlines=True)
+            if start_barrier:
+                start_barrier.started("capture")
+
+            if audio and self.qoeval_config.audio_device_real.get() == '':
+                log.error("Cannot capture audio - audio device not specified - check AudioDeviceReal parameter in "
+                          "config")
+                audio = False
+
+            if audio:
+                # start audio recording - will use ffmpeg for timing the recording
+                command = f"{FFMPEG} -f alsa -i {self.qoeval_config.audio_device_real.get()} -t {duration} " \
+                          f"-y {dest_tmp}.wav"
+                log.debug(f"start audio recording cmd: {command}")
+                subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
+                               universal_newlines=True).check_returncode()
+            else:
+                # poll regularly if the process has terminated - until we have reached desired duration
+                runtime_capture = 0.0
+                while scrcpy_output.poll() is None and runtime_capture < duration_in_secs and \
+                        not self._stop_event.wait(1):
+                    runtime_capture += 1
+
+            scrcpy_output.terminate()
 
         # re-encoding to compressed format (we do not delete the raw dest_tmp on purpose, so it can be compared later)
         command = f"{FFMPEG} -i {dest_tmp}.mp4 -i {dest_tmp}.wav -filter:v fps=60 -map 0:v -map 1:a " \
                   f"-c:v mpeg4 -vtag xvid -qscale:v 1 -c:a libmp3lame -qscale:a 1 -shortest -y {dest}.avi"
         log.debug(f"re-encoding cmd: {command}")
-        subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                       universal_newlines=True).check_returncode()
+        with span("capture.reencode"):
+            subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
+                           universal_newlines=True).check_returncode()
 
 
 class CaptureEmulator(Capture):
-    def __init__(self, qoeval_config: QoEvalConfiguration):
-        super().__init__(qoeval_config)
+    supports_frame_tap = True
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, tmp_file_suffix: str = ""):
+        super().__init__(qoeval_config, tmp_file_suffix)
         self._display = Xlib.display.Display()
         self._root = self._display.screen().root
 
@@ -172,6 +218,15 @@ class CaptureEmulator(Capture):
         log.error(f"Window with title \"{title}\" not found")
         return None
 
+    def get_sdk_emulator_window_title(self) -> str:
+        """Returns the title (fragment) of the window of the standard emulator of this configuration"""
+        # the emulators of several workers differ by AVD name and port (any emulator window if neither is given)
+        port = get_emulator_port(self.qoeval_config)
+        if not self.qoeval_config.vd_name.get() and port is None:
+            return SDK_EMULATOR_WINDOW_TITLE
+        title = f"{SDK_EMULATOR_WINDOW_TITLE} - {get_vd_name(self.qoeval_config)}:"
+        return f"{title}{port}" if port else title
+
     def get_window_position(self, window):
         """
         Returns the (x, y, height, width) of a window with the specified title relative to the top-left
@@ -197,7 +252,9 @@ class CaptureEmulator(Capture):
         window.configure(stack_mode=Xlib.X.Above)
         self._display.sync()
 
-    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True):
+    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True,
+                        frame_tap: FrameTap = None, start_barrier: StartBarrier = None):
+        self._stop_event.clear()
         if audio and self.qoeval_config.audio_device_emu.get() == '':
             log.error("Cannot capture audio - audio device not specified - check AudioDeviceEmu parameter in config")
             audio = False
@@ -209,7 +266,7 @@ class CaptureEmulator(Capture):
             # audio_param = f"-f alsa -i hw:0 -ac 2"
         else:
             audio_param = ""
-        window = self.get_window(SDK_EMULATOR_WINDOW_TITLE)
+        window = self.get_window(self.get_sdk_emulator_window_title())
         if window:
             # standard emulator has no UI elements within the window
             right_border = 0
@@ -219,12 +276,15 @@ class CaptureEmulator(Capture):
             right_border = 50
         if not window:
             log.error(f"Emulator window not found - cannot start recording")
+            if start_barrier:
+                # the other components of the recording must not wait for the capture
+                start_barrier.abort()
             return
         self.bring_window_to_foreground(window)
         window_pos = self.get_window_position(window)
         log.info(f'Found emulator window at {window_pos.x},{window_pos.y} dim {window_pos.width},{window_pos.height}')
         dest = os.path.join(self.qoeval_config.video_capture_path.get(), output_filename)
-        dest_tmp = os.path.join(self.qoeval_config.video_capture_path.get(), 'captured_raw')
+        dest_tmp = os.path.join(self.qoeval_config.video_capture_path.get(), f'captured_raw{self.tmp_file_suffix}')
         # command = f"{FFMPEG} {audio_param} -f {FFMPEG_FORMAT} -draw_mouse 0 -r {FFMPEG_RATE} -s " \
         #           f"{window_pos.width}x{window_pos.height} " + \
         #           f"-i :{DISPLAY}+{window_pos.x},{window_pos.y} -t {FFMPEG_REC_TIME} -c:v libxvid " \
@@ -242,17 +302,113 @@ class CaptureEmulator(Capture):
                   f"-i :{DISPLAY}+{window_pos.x},{window_pos.y} -t {duration} " + \
                   f"-acodec pcm_s16le -ar 44100 " + \
                   f"-qscale 0 -vcodec huffyuv -y {dest_tmp}.avi"
+        if frame_tap:
+            # additional low-resolution output analyzed while recording (video is the second input if audio is used)
+            command += " " + frame_tap.get_ffmpeg_output(window_pos.width - right_border, window_pos.height,
+                                                         1 if audio else 0)
 
         log.debug(f"cmd: {command}")
-        subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                       universal_newlines=True).check_returncode()
+        if start_barrier:
+            start_barrier.wait("capture")
+        with span("capture.record"):
+            process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE if frame_tap else subprocess.DEVNULL)
+            if start_barrier:
+                start_barrier.started("capture")
+            if frame_tap:
+                frame_tap.start(process.stdout)
+            while process.poll() is None:
+                if self._stop_event.wait(CAPTURE_POLL_INTERVAL):
+                    log.info("Stopping recording before the end of the capture time")
+                    # ffmpeg finishes the output files properly when "q" is pressed
+                    process.stdin.write(b"q")
+                    process.stdin.flush()
+                    process.wait()
+            process.stdin.close()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+        if frame_tap and frame_tap.is_aborted():
+            log.error(f"Recording aborted ({frame_tap.stop_reason}) - not re-encoding {dest_tmp}.avi")
+            return
 
         # re-encoding to compressed format (we do not delete the raw dest_tmp on purpose, so it can be compared later)
         command = f"{FFMPEG} -i {dest_tmp}.avi -c:v mpeg4 -vtag xvid -filter:v fps=60 -qscale:v 1 " \
                   f"-c:a libmp3lame -qscale:a 1 -y {dest}.avi"
         log.debug(f"re-encoding cmd: {command}")
-        subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                       universal_newlines=True).check_returncode()
+        with span("capture.reencode"):
+            subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
+                           universal_newlines=True).check_returncode()
+
+
+def _get_image_size(image_path: str) -> Tuple[int, int]:
+    command = f"{FFPROBE} -v error -select_streams v:0 -show_entries stream=width,height " \
+              f"-of default=nw=1:nk=1 {image_path}"
+    output = subprocess.run(shlex.split(command), stdout=subprocess.PIPE, universal_newlines=True)
+    output.check_returncode()
+    width, height = output.stdout.split()[:2]
+    return int(width), int(height)
+
+
+class CaptureSimulated(Capture):
+    """
+        Synthesizes the recording of a stimulus with ffmpeg instead of capturing a device (see qoeval --simulate)
+
+        The video shows a static gray screen until SIMULATED_PLAYBACK_START and a moving test pattern afterwards. The
+        trigger images of the stimulus ("{type_id}-{table_id}_start.png" and "..._end.png" in the trigger image path)
+        are shown at known times, so that post-processing detects the relevant section like in a real recording.
+        """
+    is_grabbing_screen = False
+
+    def start_recording(self, output_filename: str, duration: str = CAPTURE_DEFAULT_REC_TIME, audio: bool = True,
+                        frame_tap: FrameTap = None, start_barrier: StartBarrier = None):
+        if frame_tap:
+            log.warning("Live analysis of the captured frames is not supported for simulated recordings")
+        duration_in_secs = convert_to_seconds(duration)
+        dest = os.path.join(self.qoeval_config.video_capture_path.get(), output_filename)
+        dest_tmp = os.path.join(self.qoeval_config.video_capture_path.get(), f'captured_sim{self.tmp_file_suffix}')
+
+        # output_filename is the video id, e.g. "VS-A-1_E1-X-0.5.0_P0" for stimuli type "VS" and table "A"
+        stimuli_table = output_filename.split("_")[0].rsplit("-", 1)[0]
+        trigger_dir = self.qoeval_config.trigger_image_path.get()
+        t_end_trigger = max(SIMULATED_TRIGGER_START + SIMULATED_TRIGGER_DURATION,
+                            duration_in_secs - SIMULATED_TRIGGER_END_MARGIN)
+        triggers = []
+        for trigger_image, t_trigger in [(f"{stimuli_table}_start.png", SIMULATED_TRIGGER_START),
+                                         (f"{stimuli_table}_end.png", t_end_trigger)]:
+            trigger_image_path = os.path.join(trigger_dir, trigger_image)
+            if os.path.isfile(trigger_image_path):
+                triggers.append((trigger_image_path, t_trigger))
+            else:
+                log.warning(f"Trigger image {trigger_image_path} not found - not shown in the simulated recording")
+        width, height = _get_image_size(triggers[0][0]) if triggers else SIMULATED_VIDEO_SIZE
+
+        inputs = f"-f lavfi -i color=c=gray:s={width}x{height}:r={CAPTURE_FPS}:d={duration_in_secs} " \
+                 f"-f lavfi -i testsrc2=s={width}x{height}:r={CAPTURE_FPS}:d={duration_in_secs} " \
+                 f"-f lavfi -i sine=frequency=440:sample_rate=44100:d={duration_in_secs} "
+        video_filter = f"[0:v][1:v]overlay=enable='gte(t,{SIMULATED_PLAYBACK_START})'[v0]"
+        for i, (trigger_image_path, t_trigger) in enumerate(triggers):
+            inputs += f"-loop 1 -framerate {CAPTURE_FPS} -i {trigger_image_path} "
+            video_filter += f";[{i + 3}:v]scale={width}:{height}[t{i}];[v{i}][t{i}]overlay=" \
+                            f"enable='between(t,{t_trigger},{t_trigger + SIMULATED_TRIGGER_DURATION})'[v{i + 1}]"
+        audio_param = "-map 2:a -acodec pcm_s16le" if audio else ""
+        command = f"{FFMPEG} {inputs}-filter_complex \"{video_filter}\" -map [v{len(triggers)}] {audio_param} " \
+                  f"-t {duration_in_secs} -vcodec huffyuv -y {dest_tmp}.avi"
+
+        log.debug(f"cmd: {command}")
+        if start_barrier:
+            start_barrier.wait("capture")
+            start_barrier.started("capture")
+        with span("capture.record"):
+            subprocess.run(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           universal_newlines=True).check_returncode()
+
+        # re-encoding to compressed format like the recording of an emulator
+        command = f"{FFMPEG} -i {dest_tmp}.avi -c:v mpeg4 -vtag xvid -filter:v fps=60 -qscale:v 1 " \
+                  f"-c:a libmp3lame -qscale:a 1 -y {dest}.avi"
+        log.debug(f"re-encoding cmd: {command}")
+        with span("capture.reencode"):
+            subprocess.run(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           universal_newlines=True).check_returncode()
 
 
 def main():
@@ -0,0 +1,175 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Live analysis of the captured frames
+
+While recording, ffmpeg writes a second, low-resolution grayscale copy of the captured video to a pipe. The FrameTap
+reads these frames and detects (in real time)
+
+ - the end trigger image of the stimulus (e.g. VS-A_end.png), so that the recording can be stopped shortly after the
+   relevant section has been captured,
+ - a black window and
+ - a frozen window (no pixel changes at all),
+
+where the last two indicate a failed recording which should be aborted instead of being captured until the end.
+"""
+
+import logging as log
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+TAP_WIDTH = 160  # width of the frames analyzed [pixel], height is chosen according to the aspect ratio
+TRIGGER_PIXEL_TOLERANCE = 24  # max. difference in intensity of a pixel to be regarded as equal to the trigger image
+TRIGGER_MATCH_THRESHOLD = 0.95  # min. fraction of equal pixels for a frame to match the trigger image
+BLACK_LEVEL = 16  # max. mean intensity of a frame regarded as black
+FROZEN_PIXEL_DELTA = 2  # min. difference in intensity of a pixel to be regarded as changed
+
+STOP_END_TRIGGER = "end trigger detected"
+ABORT_BLACK = "window is black"
+ABORT_FROZEN = "window is frozen"
+
+
+class FrameTap:
+    """
+        Analyzes a low-resolution grayscale copy of the captured frames while recording.
+
+        The capture adds the output returned by get_ffmpeg_output to its ffmpeg command and calls start with the
+        stdout of the ffmpeg process. wait_for_stop blocks until the recording should be stopped.
+
+        Attributes
+        ----------
+        trigger_image_path : str
+            Path of the image marking the end of the relevant section, None: no end trigger detection
+        grace_period : float
+            Time [s] the recording is continued after the end trigger has been detected
+        black_timeout : float
+            Time [s] after which a black window aborts the recording, 0: disabled
+        frozen_timeout : float
+            Time [s] after which a frozen window aborts the recording, 0: disabled
+        stop_reason : str
+            Reason why the recording should be stopped (STOP_END_TRIGGER, ABORT_BLACK, ABORT_FROZEN) or None
+        end_trigger_time : float
+            Time (time.time()) at which the end trigger has been detected or None
+        """
+
+    def __init__(self, trigger_image_path: Optional[str], grace_period: float, black_timeout: float = 0.0,
+                 frozen_timeout: float = 0.0):
+        self.trigger_image_path = trigger_image_path
+        self.grace_period = grace_period
+        self.black_timeout = black_timeout
+        self.frozen_timeout = frozen_timeout
+        self.stop_reason = None
+        self.end_trigger_time = None
+        self.frame_count = 0
+        self._width = 0
+        self._height = 0
+        self._reference = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def get_ffmpeg_output(self, width: int, height: int, video_input: int = 0) -> str:
+        """
+            Returns the ffmpeg options for the additional output analyzed by the tap
+
+            Parameters
+            ----------
+            width : int
+                Width of the captured video
+            height : int
+                Height of the captured video
+            video_input : int
+                Index of the ffmpeg input holding the captured video
+            """
+        self._width = TAP_WIDTH
+        # even height, keeping the aspect ratio
+        self._height = max(2, int(round(height * TAP_WIDTH / width / 2.0)) * 2)
+        if self.trigger_image_path:
+            reference = cv2.imread(self.trigger_image_path, 0)
+            if reference is None:
+                log.error(f"Trigger image {self.trigger_image_path} could not be read - end trigger detection disabled")
+            else:
+                self._reference = cv2.resize(reference, (self._width, self._height),
+                                             interpolation=cv2.INTER_AREA).astype(np.int16)
+        return f"-map {video_input}:v -an -vf scale={self._width}:{self._height},format=gray " \
+               f"-f rawvideo -pix_fmt gray pipe:1"
+
+    def start(self, stream):
+        """Starts analyzing the frames read from the given (binary) stream"""
+        self._thread = threading.Thread(target=self._read_frames, args=(stream,), name="frametap", daemon=True)
+        self._thread.start()
+
+    def wait_for_stop(self, timeout: float = None) -> Optional[str]:
+        """
+            Blocks until the recording should be stopped or the captured stream has ended
+
+            If the end trigger has been detected, the method returns after the grace period. Returns the stop reason
+            or None if the stream ended (or the timeout expired) without a reason to stop.
+            """
+        self._stop_event.wait(timeout)
+        if self.stop_reason == STOP_END_TRIGGER:
+            remaining = self.end_trigger_time + self.grace_period - time.time()
+            if remaining > 0:
+                time.sleep(remaining)
+        return self.stop_reason
+
+    def is_aborted(self) -> bool:
+        return self.stop_reason in [ABORT_BLACK, ABORT_FROZEN]
+
+    def _read_frames(self, stream):
+        frame_size = self._width * self._height
+        previous = None
+        black_since = None
+        frozen_since = None
+        try:
+            while True:
+                # the stream is read until its end, otherwise ffmpeg would block when the pipe is full
+                data = stream.read(frame_size)
+                if not data or len(data) < frame_size:
+                    break
+                if self.stop_reason is not None:
+                    continue
+                now = time.time()
+                self.frame_count += 1
+                frame = np.frombuffer(data, dtype=np.uint8).reshape((self._height, self._width)).astype(np.int16)
+
+                if self._reference is not None and self._is_matching(frame):
+                    log.info(f"End trigger detected at frame {self.frame_count} - stopping recording in "
+                             f"{self.grace_period} s")
+                    self.end_trigger_time = now
+                    self._stop(STOP_END_TRIGGER)
+                    continue
+
+                if self.black_timeout > 0:
+                    black_since = (black_since or now) if frame.mean() <= BLACK_LEVEL else None
+                    if black_since is not None and now - black_since >= self.black_timeout:
+                        self._stop(ABORT_BLACK)
+                        continue
+
+                if self.frozen_timeout > 0:
+                    is_frozen = previous is not None and \
+                        np.count_nonzero(np.abs(frame - previous) >= FROZEN_PIXEL_DELTA) == 0
+                    frozen_since = (frozen_since or now) if is_frozen else None
+                    if frozen_since is not None and now - frozen_since >= self.frozen_timeout:
+                        self._stop(ABORT_FROZEN)
+                        continue
+                previous = frame
+        finally:
+            self._stop_event.set()
+
+    def _is_matching(self, frame: np.ndarray) -> bool:
+        equal_pixels = np.count_nonzero(np.abs(frame - self._reference) <= TRIGGER_PIXEL_TOLERANCE)
+        return equal_pixels >= TRIGGER_MATCH_THRESHOLD * frame.size
+
+    def _stop(self, reason: str):
+        if reason != STOP_END_TRIGGER:
+            log.error(f"Aborting recording after {self.frame_count} frames: {reason}")
+        self.stop_reason = reason
+        self._stop_event.set()
@@ -4,13 +4,67 @@
 #
 # License:  LGPL 3.0 - see LICENSE file for details
 import argparse
+import sys
 
-from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.configuration import QoEvalConfiguration, MobileDeviceType
 from qoeval_pkg.coordinator import Coordinator
+from qoeval_pkg.cost_model import CostModel, estimate_campaign
+from qoeval_pkg.distributed import distribute_campaign, QueueWorker
 from qoeval_pkg.parser.parser import load_parameter_file, is_correct_parameter_file
+from qoeval_pkg.scheduler import CampaignScheduler
+from qoeval_pkg.timing import get_campaign_metrics
+
+
+def _set_simulated(qoeval_config: QoEvalConfiguration):
+    qoeval_config.emulator_type.set(MobileDeviceType.SIMULATED.name)
+    # there is no network traffic to analyze
+    qoeval_config.traffic_analysis_live.set(False)
+    qoeval_config.traffic_analysis_plot.set(False)
+
+
+def worker_main(argv):
+    print("QoEval Command Line Worker")
+
+    parser = argparse.ArgumentParser(prog="qoeval worker")
+    parser.add_argument('--name', help="Name of the worker, must be unique (default: host name and process id)",
+                        action='store', default=None, type=str)
+    parser.add_argument('--device', help="Use the device given by the n-th entry of CoordinatorWorkers",
+                        action='store', default=None, type=int)
+    parser.add_argument('--parameterfile', dest='parameter_file', help='Path to parameter file',
+                        action='store', nargs='?', default='', type=str)
+    parser.add_argument('--simulate', help="Use a simulated device, capture and network emulation",
+                        action='store_true')
+    parser.add_argument('--follow', help="Keep waiting for new jobs when the queue is empty", action='store_true')
+
+    args = parser.parse_args(argv)
+
+    qoeval_config = QoEvalConfiguration()
+    if args.device is not None:
+        workers = qoeval_config.coordinator_workers.get()
+        if not 0 <= args.device < len(workers):
+            raise RuntimeError(f"Device {args.device} is not configured - CoordinatorWorkers holds {len(workers)} "
+                               f"devices")
+        qoeval_config = qoeval_config.copy(workers[args.device])
+    if args.simulate:
+        _set_simulated(qoeval_config)
+    if args.parameter_file and len(args.parameter_file) > 0:
+        qoeval_config.parameter_file.set(args.parameter_file)
+
+    parameter_table = load_parameter_file(qoeval_config.parameter_file.get())
+    worker = QueueWorker(qoeval_config, parameter_table, args.name)
+    completed = worker.run(follow=args.follow)
+
+    print(f"Worker {worker.name} completed {completed} jobs")
+    if args.simulate:
+        print(get_campaign_metrics(qoeval_config).get_summary())
+    print("Done.")
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker_main(sys.argv[2:])
+        return
+
     print("QoEval Command Line Coordinator")
 
     parser = argparse.ArgumentParser()
@@ -26,6 +80,21 @@ def main():
     parser.add_argument('--check-params', dest='check_params',
                         help='Perform additional check of parameter-file before running the coordinator',
                         action='store_true')
+    parser.add_argument('--parallel', help="Generate stimuli in parallel on all devices configured as "
+                                           "CoordinatorWorkers", action='store_true')
+    parser.add_argument('--postprocessing-workers', dest='postprocessing_workers',
+                        help="Number of threads post-processing recorded stimuli while the next ones are recorded "
+                             "(0: record all stimuli first)", action='store', default=None, type=int)
+    parser.add_argument('--simulate', help="Run the campaign offline with a simulated device, capture and network "
+                                           "emulation and report the throughput of the software pipeline",
+                        action='store_true')
+    parser.add_argument('--distribute', help="Publish the jobs of the campaign to the job queue in the video capture "
+                                             "path and wait until \"qoeval worker\" processes have run them (workers "
+                                             "on other hosts need the path on a network file system with POSIX "
+                                             "file locks, e.g. NFSv4)",
+                        action='store_true')
+    parser.add_argument('--estimate', help="Only print the predicted duration of the campaign (learned from the "
+                                           "timings of earlier stimuli) and exit", action='store_true')
 
     args = parser.parse_args()
 
@@ -39,21 +108,53 @@ def main():
         stimuli_entry_list = [stimuli_entry]
 
     qoeval_config = QoEvalConfiguration()
+    if args.simulate:
+        _set_simulated(qoeval_config)
 
     # modify qoeval default configuration according to supplied parameter values
     if args.parameter_file and len(args.parameter_file) > 0:
         qoeval_config.parameter_file.set(args.parameter_file)
 
+    parameter_table = load_parameter_file(qoeval_config.parameter_file.get())
     if args.check_params:
-        load_parameter_file(qoeval_config.parameter_file.get())
-        if not is_correct_parameter_file():
+        if not is_correct_parameter_file(parameter_table):
             raise RuntimeError(f"Check of parameter file {qoeval_config.parameter_file.get()} failed.")
         print(f"Checking parameter file {qoeval_config.parameter_file.get()}...   ok.")
 
     print(f"Starting to process type:{stimuli_type}; table: {stimuli_table}; entry:{stimuli_entry}")
 
-    coordinator = Coordinator(qoeval_config)
-    coordinator.start([stimuli_type], [stimuli_table], stimuli_entry_list, generate_stimuli=not args.skipgenerate,
-                      postprocessing=not args.skippostprocessing, overwrite=args.overwrite)
+    generate_stimuli = not args.skipgenerate
+    entry_ids = stimuli_entry_list if stimuli_entry_list else parameter_table.entry_ids(stimuli_type, stimuli_table)
+    cost_model = CostModel.from_history(qoeval_config, parameter_table)
+    workers = len(qoeval_config.coordinator_workers.get()) if args.parallel or args.distribute else 1
+    estimate = estimate_campaign(cost_model, qoeval_config, parameter_table,
+                                 [(stimuli_type, stimuli_table, entry_id) for entry_id in entry_ids],
+                                 generate_stimuli=generate_stimuli, postprocessing=not args.skippostprocessing,
+                                 overwrite=args.overwrite, workers=workers)
+    print(estimate)
+    if args.estimate:
+        return
+    estimate.start()
+
+    if args.distribute:
+        distribute_campaign(qoeval_config, parameter_table, stimuli_type, stimuli_table, stimuli_entry_list,
+                            overwrite=args.overwrite, generate_stimuli=generate_stimuli,
+                            postprocessing=not args.skippostprocessing, estimate=estimate)
+        print("Done.")
+        return
+
+    if args.parallel and generate_stimuli:
+        scheduler = CampaignScheduler(qoeval_config, parameter_table, cost_model=cost_model)
+        scheduler.estimate = estimate
+        scheduler.run(stimuli_type, stimuli_table, stimuli_entry_list, overwrite=args.overwrite)
+        generate_stimuli = False
+
+    coordinator = Coordinator(qoeval_config, parameter_table)
+    coordinator.estimate = estimate
+    coordinator.start([stimuli_type], [stimuli_table], stimuli_entry_list, generate_stimuli=generate_stimuli,
+                      postprocessing=not args.skippostprocessing, overwrite=args.overwrite,
+                      postprocessing_workers=args.postprocessing_workers)
 
+    if args.simulate:
+        print(get_campaign_metrics(qoeval_config).get_summary())
     print("Done.")
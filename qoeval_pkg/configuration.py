@@ -10,7 +10,10 @@ Handle configuration options
 - if no option is given, use default value
 
 """
+from __future__ import annotations
+
 import ast
+import copy
 import logging as log
 import os
 import pathlib
@@ -38,6 +41,7 @@ class MobileDeviceType(Enum):
     SDK_EMULATOR = 'emulator'
     GENYMOTION = 'genymotion'
     REAL_DEVICE = 'realdevice'
+    SIMULATED = 'simulated'  # no device at all, the recording is synthesized (see qoeval --simulate)
 
 
 # provide some default values
@@ -66,15 +70,28 @@ class QoEvalConfiguration:
 
         # general options and paths
         self.vd_path = Option(self, 'AVDPath', _default_avd_path, expand_user=True)
+        self.vd_name = Option(self, 'AVDName', '')
         self.video_capture_path = Option(self, 'VideoCapturePath', _default_video_capture_path, expand_user=True)
         self.trigger_image_path = Option(self, 'TriggerImagePath', '.', expand_user=True)
         self.parameter_file = Option(self, 'ParameterFile', './parameters.csv', expand_user=True)
         self.dynamic_parameter_path = Option(self, 'DynamicParameterPath', '.', expand_user=True)
+        # directory of the Prometheus textfile with the timing metrics of a campaign ("": VideoCapturePath)
+        self.metrics_textfile_path = Option(self, 'MetricsTextfilePath', '', expand_user=True)
 
         # coordinator settings
         self.coordinator_generate_stimuli = BoolOption(self, "CoordinatorGenerateStimuli", True)
         self.coordinator_postprocessing = BoolOption(self, "CoordinatorPostprocessing", False)
         self.coordinator_overwrite = BoolOption(self, "CoordinatorOverwrite", False)
+        # one dict of option values (e.g. AdbDeviceSerial, NetDeviceName) for each device used in parallel
+        self.coordinator_workers = ListDictOption(self, "CoordinatorWorkers", [])
+        # number of threads post-processing recorded stimuli while the next ones are recorded (0: no pipelining)
+        self.coordinator_postprocessing_workers = IntOption(self, "CoordinatorPostprocessingWorkers", 0)
+        self.coordinator_device_session = BoolOption(self, "CoordinatorDeviceSession", False)
+        # delay [s] before the first retry of a failed recording (doubled for each further retry) and its maximum
+        self.coordinator_retry_delay = FloatOption(self, "CoordinatorRetryDelay", 15.0)
+        self.coordinator_retry_max_delay = FloatOption(self, "CoordinatorRetryMaxDelay", 240.0)
+        # time [s] a job of a distributed campaign is reserved for a worker which stopped sending heartbeats
+        self.queue_lease_duration = FloatOption(self, "QueueLeaseDuration", 120.0)
 
         # gui
         self.gui_coordinator_stimuli = ListDictOption(self, "CoordinatorStimuliToGenerate", [])
@@ -88,6 +105,12 @@ class QoEvalConfiguration:
         self.show_device_screen_mirror = BoolOption(self, 'ShowDeviceScreenMirror', True)
         self.emulator_type = MobileDeviceTypeOption(self, 'EmulatorType', 'none')
         self.resolution_override = Option(self, 'ResolutionOverride', "")
+        # live analysis of the captured frames (emulators only): stop when the end trigger image has been recorded
+        self.capture_early_stop = BoolOption(self, 'CaptureEarlyStop', False)
+        self.capture_early_stop_grace_period = FloatOption(self, 'CaptureEarlyStopGracePeriod', 5.0)
+        # abort the recording if the window is black/frozen for the given time [s] (0: disabled)
+        self.capture_black_timeout = FloatOption(self, 'CaptureBlackTimeout', 20.0)
+        self.capture_frozen_timeout = FloatOption(self, 'CaptureFrozenTimeout', 30.0)
 
         self.adb_device_serial = Option(self, 'AdbDeviceSerial', '')
         self.audio_device_emu = Option(self, 'AudioDeviceEmu', '')
@@ -96,6 +119,7 @@ class QoEvalConfiguration:
         # network emulation options
         self.excluded_ports = ListIntOption(self, 'ExcludedPorts', [22, 5000, 5002])
         self.net_device_name = Option(self, 'NetDeviceName', 'eth0')
+        self.net_em_tc_backend = Option(self, 'NetEmTcBackend', 'batch')
         self.traffic_analysis_live = BoolOption(self, 'TrafficAnalysisLiveVisualization', False)
         self.traffic_analysis_plot = BoolOption(self, 'TrafficAnalysisPlot', True)
         self.traffic_analysis_bin_sizes = ListIntOption(self, "TrafficAnalysisBinSizes", [])
@@ -123,6 +147,18 @@ class QoEvalConfiguration:
 
         add_tooltips(self)
 
+    def copy(self, option_values: Dict[str, str] = None) -> QoEvalConfiguration:
+        """
+        Returns an independent copy of this configuration
+
+        :param option_values: option names (as used in the configuration file) and values to be set in the copy
+        """
+        config = copy.deepcopy(self)
+        if option_values:
+            for option, value in option_values.items():
+                config.configparser.set(qoeval_SECTION, option, str(value))
+        return config
+
     def mark_modified(self):
         self.modified_since_last_save = True
 
@@ -10,28 +10,44 @@
 """
 
 from qoeval_pkg.analysis import analysis
-from qoeval_pkg.capture.capture import CaptureEmulator, CaptureRealDevice
+from qoeval_pkg.capture.capture import CaptureEmulator, CaptureRealDevice, CaptureSimulated
+from qoeval_pkg.capture.frame_tap import FrameTap, STOP_END_TRIGGER
 from qoeval_pkg.postprocessing.bufferer.bufferer import Bufferer
 from qoeval_pkg.postprocessing.buffering_generator import BufferingGenerator
 from qoeval_pkg.postprocessing.postprocessor import PostProcessor
 from qoeval_pkg.postprocessing.determine_video_start import determine_video_start
 from qoeval_pkg.postprocessing.determine_image_timestamp import determine_frame, frame_to_time
 from qoeval_pkg.configuration import MobileDeviceOrientation, QoEvalConfiguration
+from qoeval_pkg.cost_model import get_stimulus_features
 from qoeval_pkg.emulator.genymotion_emulator import GenymotionEmulator
 from qoeval_pkg.emulator.standard_emulator import StandardEmulator
 from qoeval_pkg.emulator.physical_device import PhysicalDevice
-from qoeval_pkg.netem.netem import Connection, DynamicParametersSetup
-from qoeval_pkg.uicontrol.uicontrol import UiControl
-from qoeval_pkg.uicontrol.usecase import UseCaseType
+from qoeval_pkg.emulator.simulated_device import SimulatedDevice
+from qoeval_pkg.errors import PermanentError, TransientError, PHASE_DEVICE, PHASE_USE_CASE, PHASE_EXECUTE
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.planner import CampaignPlan, plan_campaign, link_recording, get_capture_duration
+from qoeval_pkg.retry import RetryPolicy, is_permanent, get_retry_phase
+from qoeval_pkg.start_barrier import StartBarrier
+from qoeval_pkg.task_graph import Task, run_task_graph
+from qoeval_pkg.timing import StimulusTimer, span, bind, get_campaign_metrics, STATUS_COMPLETED, STATUS_FAILED
+from qoeval_pkg.netem.change_log import change_log_file
+from qoeval_pkg.netem.netem import Connection, SimulatedConnection
+from qoeval_pkg.netem.trace_store import find_trace_file, get_trace_store
+from qoeval_pkg.uicontrol.uicontrol import UiControl, SimulatedUiControl
+from qoeval_pkg.uicontrol.usecase import UseCaseType, get_uc_type
 from qoeval_pkg.parser.parser import *
 from qoeval_pkg.utils import *
 
+import collections
+import concurrent.futures
+import contextlib
 import logging as log
 import threading
 import time
 import traceback
 
-from typing import List
+from dataclasses import asdict
+from typing import Callable, List, Optional, Tuple
 
 DELAY_TOLERANCE_MIN = 10  # minimum delay tolerance for sanity check [ms]
 DELAY_TOLERANCE_REL_NORMAL = 0.05  # relative delay tolerance for sanity check [0..1]
@@ -46,6 +62,14 @@ SHORT_WAITING = 3  # short waiting time [s]
 LONG_WAITING = 60  # long waiting time [s]
 
 
+def get_device_setup(type_id: str) -> Tuple[MobileDeviceOrientation, Optional[bool]]:
+    """Returns the device setup (orientation, playstore) required by a stimuli type (playstore None: device default)"""
+    if get_uc_type(type_id) == UseCaseType.YOUTUBE:
+        return MobileDeviceOrientation.LANDSCAPE, None
+    else:
+        return MobileDeviceOrientation.PORTRAIT, None
+
+
 def gen_log_file(qoeval_config: QoEvalConfiguration):
     return os.path.join(qoeval_config.video_capture_path.get(), 'qoeval.log')
 
@@ -60,30 +84,59 @@ class Coordinator:
             Coordinate the emulation run for generating one or more stimuli.
     """
 
-    def __init__(self, qoeval_config: QoEvalConfiguration):
+    def __init__(self, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable = None, name: str = None):
         log.basicConfig(level=log.DEBUG)
         self.qoeval_config = qoeval_config
+        # name of the coordinator, must be unique if several coordinators are used in parallel (see CampaignScheduler)
+        self.name = name if name else "coord1"
+        tmp_file_suffix = f"_{name}" if name else ""
+        # if no parameter table is given, the parameter file of the configuration is loaded when starting
+        self._is_parameter_table_given = parameter_table is not None
+        self.parameter_table = parameter_table
         self.ui_control = UiControl(self.qoeval_config.adb_device_serial.get())
+        self._connection_type = Connection
         if self.qoeval_config.emulator_type.get() == MobileDeviceType.GENYMOTION:
             self.emulator = GenymotionEmulator(self.qoeval_config)
-            self.capture = CaptureEmulator(self.qoeval_config)
+            self.capture = CaptureEmulator(self.qoeval_config, tmp_file_suffix)
         if self.qoeval_config.emulator_type.get() == MobileDeviceType.SDK_EMULATOR:
             self.emulator = StandardEmulator(self.qoeval_config)
-            self.capture = CaptureEmulator(self.qoeval_config)
+            self.capture = CaptureEmulator(self.qoeval_config, tmp_file_suffix)
         if self.qoeval_config.emulator_type.get() == MobileDeviceType.REAL_DEVICE:
             self.emulator = PhysicalDevice(self.qoeval_config, self.qoeval_config.show_device_screen_mirror.get())
-            self.capture = CaptureRealDevice(self.qoeval_config)
+            self.capture = CaptureRealDevice(self.qoeval_config, tmp_file_suffix)
+        if self.qoeval_config.emulator_type.get() == MobileDeviceType.SIMULATED:
+            self.emulator = SimulatedDevice(self.qoeval_config)
+            self.capture = CaptureSimulated(self.qoeval_config, tmp_file_suffix)
+            self.ui_control = SimulatedUiControl(self.qoeval_config.adb_device_serial.get())
+            self._connection_type = SimulatedConnection
 
         if not self.emulator:
             raise RuntimeError('No emulation device configured - check you \"qoeval.conf\" .')
+        self.journal = CampaignJournal(self.qoeval_config)
         self._is_prepared = False
+        # keep the device running between stimuli (see MobileDevice.launch_session)
+        self._is_using_device_session = self.qoeval_config.coordinator_device_session.get()
         self.netem = None
         self.analysis = None
         self.output_filename = None
         self.stats_filepath = None
+        self._delay_bias = None
+        self._recorded_time = None  # time span [s] actually recorded (shorter than the capture time if stopped early)
+        self._is_stopped_early = False
+        self._start_offsets = None  # offsets [s] of the recording components from their common start
         self._type_id = None
         self._table_id = None
         self._entry_id = None
+        self.estimate = None  # CampaignEstimate to which finished steps are reported (optional)
+        # locks serializing the post-processing of alternative entries: (type_id, table_id): {entry_id: lock}
+        self._group_locks = {}
+        self._group_locks_lock = threading.Lock()
+
+    def _load_parameter_table(self):
+        if not self._is_parameter_table_given:
+            self.parameter_table = load_parameter_file(self.qoeval_config.parameter_file.get())
+            with self._group_locks_lock:
+                self._group_locks = {}
 
     def _get_bpf_rule(self) -> str:
         filter_rule = ""
@@ -97,88 +150,138 @@ class Coordinator:
         return filter_rule
 
     def _get_uc_type(self) -> UseCaseType:
-        if self._type_id.startswith("VS"):
-            return UseCaseType.YOUTUBE
-        elif self._type_id.startswith("WB"):
-            return UseCaseType.WEB_BROWSING
-        elif self._type_id.startswith("AL"):
-            return UseCaseType.APP_LAUNCH
-        raise RuntimeError(f'Use-case type of \"{self._type_id}\" is unknown.')
+        return get_uc_type(self._type_id)
 
     def _get_uc_orientation(self) -> MobileDeviceOrientation:
-        if self._get_uc_type() == UseCaseType.YOUTUBE:
-            return MobileDeviceOrientation.LANDSCAPE
-        else:
-            return MobileDeviceOrientation.PORTRAIT
+        return get_device_setup(self._type_id)[0]
+
+    def _prepare(self, type_id: str, table_id: str, entry_id: str, phase: str = PHASE_DEVICE):
+        """
+        Prepares the recording of a stimulus, starting from the given phase (PHASE_DEVICE or PHASE_USE_CASE)
 
-    def _prepare(self, type_id: str, table_id: str, entry_id: str):
+        The steps are run as a task graph (see run_task_graph): setting up the network emulation overlaps with
+        measuring the delay bias and with preparing the use-case. The use-case is prepared after the delay bias has
+        been measured, since its traffic would distort the measurement.
+        """
         if self._is_prepared:
             raise RuntimeError(
                 f"Coordinator is already prepared - cannot prepare again before finish has been called.")
+        tasks = []
+        if phase == PHASE_DEVICE:
+            self._prepare_device(type_id, table_id, entry_id)
+            tasks += [Task("launch", bind(self._launch_device, "prepare.launch")),
+                      Task("rtt", bind(self._measure_delay_bias, "prepare.rtt"), ["launch"])]
+        tasks += [Task("netem", bind(self._prepare_netem, "prepare.netem"), ["launch"]),
+                  Task("use_case", bind(self._prepare_use_case, "prepare.use_case"), ["rtt"])]
+        with span("prepare"):
+            run_task_graph(tasks, thread_name_prefix=f"{self.name}_prepare")
+        # the emulated delays are reduced by the delay bias which is only known now
+        self.netem.dul = self._params['dul'] - self._delay_bias
+        self.netem.ddl = self._params['ddl'] - self._delay_bias
+        self._gen_log.flush()
+        self._is_prepared = True
 
+    def _prepare_device(self, type_id: str, table_id: str, entry_id: str):
+        """Loads the parameters of the stimulus and opens the generation log (PHASE_DEVICE)"""
         self._gen_log = open(gen_log_file(self.qoeval_config), "a+")
 
         self._type_id = type_id
         self._table_id = table_id
         self._entry_id = entry_id
-        self._params = get_parameters(self._type_id, self._table_id, self._entry_id)
+        try:
+            self._params = self.parameter_table.parameters(self._type_id, self._table_id, self._entry_id)
+        except ValueError as err:
+            raise PermanentError(f"Invalid parameters: {err}")
         log.debug(f"Preparing {type_id}-{table_id}-{entry_id} with parameters: {self._params}")
         self.output_filename = get_video_id(self.qoeval_config, self._type_id, self._table_id, self._entry_id)
         time_string = time.strftime("%d.%m.%y %H:%M:%S", time.localtime())
         self._gen_log.write(f"{time_string} {self.output_filename} {self._params} ")
+
+    def _launch_device(self):
+        """Launches the device (PHASE_DEVICE)"""
         # self.emulator.delete_vd()  # delete/reset virtual device - should be avoided
         # if use-case requires play services
-        self.emulator.launch(orientation=self._get_uc_orientation())
+        if self._is_using_device_session:
+            orientation, playstore = get_device_setup(self._type_id)
+            self.emulator.launch_session(orientation=orientation, playstore=playstore)
+        else:
+            self.emulator.launch(orientation=self._get_uc_orientation())
+
+    def _measure_delay_bias(self):
+        """Measures the delay bias of the device (PHASE_DEVICE)"""
         try:
-            delay_bias_ul_dl = \
-                (self.emulator.measure_rtt() + PROCESSING_BIAS) / 2  # can only measure RTT, assume 50%/50% ul vs. dl
+            measured_rtt = self.emulator.measure_rtt()
+            delay_bias_ul_dl = (measured_rtt + PROCESSING_BIAS) / 2  # can only measure RTT, assume 50%/50% ul vs. dl
+            self._delay_bias = delay_bias_ul_dl
         except RuntimeError as rte:
             self._gen_log.write(f" measuring delay bias failed - canceled. ")
             log.error(" measuring delay bias failed - check if you have Internet connectivity!")
             raise rte
         if delay_bias_ul_dl > self._params['dul'] or delay_bias_ul_dl > self._params['ddl']:
             self._gen_log.write(f" delay bias of {delay_bias_ul_dl}ms too high - canceled. ")
-            raise RuntimeError(
+            raise TransientError(
                 f"Delay bias of {delay_bias_ul_dl}ms exceeds delay parameter of {self._params['ddl']}ms! "
-                f"Cannot emulate.")
+                f"Cannot emulate.", PHASE_DEVICE)
+
+    def _prepare_netem(self):
+        """
+        Sets up the network emulation (PHASE_USE_CASE)
 
+        The emulated delays are set by _prepare once the delay bias is known - until the emulation is enabled, the
+        traffic of the device is not affected.
+        """
         if self._params['dynamic'] and len(self._params['dynamic']) > 0:
             dynamic_parameter_variant = self._params['dynamic']
-            dynamic_parameter_file = os.path.join(self.qoeval_config.dynamic_parameter_path.get(),
-                                                  f"{dynamic_parameter_variant}_{int(self._params['rdl'])}.csv")
+            trace_file = find_trace_file(self.qoeval_config.dynamic_parameter_path.get(), dynamic_parameter_variant,
+                                         self._params['rdl'])
+            if trace_file is None:
+                raise PermanentError(f"Dynamic parameter file of {dynamic_parameter_variant} for "
+                                     f"{int(self._params['rdl'])} kbit/s does not exist in "
+                                     f"{self.qoeval_config.dynamic_parameter_path.get()}.")
+            dynamic_parameter_file, scaled_rate = trace_file
             log.debug(f"Dynamic connection parameters are active, using parameter file:{dynamic_parameter_file}")
-            adaptive_params = DynamicParametersSetup.from_csv(dynamic_parameter_file, verbose=False)
-
-            self.netem = Connection("coord1", self.qoeval_config.net_device_name.get(), t_init=self._params['t_init'],
-                                    rul=self._params['rul'], rdl=self._params['rdl'],
-                                    dul=(self._params['dul'] - delay_bias_ul_dl),
-                                    ddl=(self._params['ddl'] - delay_bias_ul_dl),
-                                    android_ip=self.emulator.get_ip_address(),
-                                    # note: only valid, if not in host-ap mode
-                                    exclude_ports=self.qoeval_config.excluded_ports.get(),
-                                    # exclude ports, e.g. as used for ssh control
-                                    dynamic_parameters_setup=adaptive_params)  # set of dynamic connection parameters
+            # parsed traces are shared by all stimuli using them
+            adaptive_params = get_trace_store().get(dynamic_parameter_file, rate=scaled_rate, verbose=False)
+
+            self.netem = self._connection_type(self.name, self.qoeval_config.net_device_name.get(),
+                                               t_init=self._params['t_init'],
+                                               rul=self._params['rul'], rdl=self._params['rdl'],
+                                               android_ip=self.emulator.get_ip_address(),
+                                               # note: only valid, if not in host-ap mode
+                                               # exclude ports, e.g. as used for ssh control
+                                               exclude_ports=self.qoeval_config.excluded_ports.get(),
+                                               # set of dynamic connection parameters
+                                               dynamic_parameters_setup=adaptive_params,
+                                               tc_backend=self.qoeval_config.net_em_tc_backend.get())
         else:
             # connection parameters are static, no dynamic_parameters_setup required
-            self.netem = Connection("coord1", self.qoeval_config.net_device_name.get(), t_init=self._params['t_init'],
-                                    rul=self._params['rul'], rdl=self._params['rdl'],
-                                    dul=(self._params['dul'] - delay_bias_ul_dl),
-                                    ddl=(self._params['ddl'] - delay_bias_ul_dl),
-                                    android_ip=self.emulator.get_ip_address(),
-                                    # note: only valid, if not in host-ap mode
-                                    exclude_ports=self.qoeval_config.excluded_ports.get())  # exclude ports, e.g. as used for ssh
-
-        url = f"{get_link(self._type_id, self._table_id, self._entry_id)}"
+            self.netem = self._connection_type(self.name, self.qoeval_config.net_device_name.get(),
+                                               t_init=self._params['t_init'],
+                                               rul=self._params['rul'], rdl=self._params['rdl'],
+                                               android_ip=self.emulator.get_ip_address(),
+                                               # note: only valid, if not in host-ap mode
+                                               # exclude ports, e.g. as used for ssh
+                                               exclude_ports=self.qoeval_config.excluded_ports.get(),
+                                               tc_backend=self.qoeval_config.net_em_tc_backend.get())
+
+    def _prepare_use_case(self):
+        """Prepares the use-case (PHASE_USE_CASE)"""
+        type_id = self._type_id
+        table_id = self._table_id
+        entry_id = self._entry_id
+        delay_bias_ul_dl = self._delay_bias
+
+        url = f"{self.parameter_table.link(self._type_id, self._table_id, self._entry_id)}"
         if len(url) < 7:
-            raise RuntimeError(f"Invalid Url: {url}")
+            raise PermanentError(f"Invalid Url: {url}")
 
         # create and prepare use-case
         if self._get_uc_type() == UseCaseType.YOUTUBE:
-            start_time = convert_to_seconds(get_start(self._type_id, self._table_id, self._entry_id))
+            start_time = convert_to_seconds(self.parameter_table.start(type_id, table_id, entry_id))
             start_time = start_time - VIDEO_PRE_START
             self.ui_control.set_use_case(UseCaseType.YOUTUBE, url=url, t=start_time,
-                                         resolution=get_codec(self._type_id, self._table_id, self._entry_id))
-            duration = convert_to_seconds(get_end(self._type_id, self._table_id, self._entry_id)) - start_time
+                                         resolution=self.parameter_table.codec(type_id, table_id, entry_id))
+            duration = convert_to_seconds(self.parameter_table.end(type_id, table_id, entry_id)) - start_time
         elif self._get_uc_type() == UseCaseType.WEB_BROWSING:
             self.ui_control.set_use_case(UseCaseType.WEB_BROWSING, url=url)
             duration = 60.0  # maximum length of web-browsing use-case
@@ -187,12 +290,10 @@ class Coordinator:
                                          activity=url.partition("/")[2])
             duration = 30.0  # maximum length of app-launch use-case
         else:
-            raise RuntimeError("Not a valid use case")
+            raise PermanentError("Not a valid use case")
 
         self._gen_log.write(f"delay bias: {delay_bias_ul_dl}ms; url: {url}; len: {duration}s ")
         self.ui_control.prepare_use_case()
-        self._gen_log.flush()
-        self._is_prepared = True
 
     def _execute(self, capture_time: str = '00:00:30'):
         if not self._is_prepared:
@@ -208,6 +309,7 @@ class Coordinator:
         self.qoeval_config.save_to_file(cfg_log)
 
         # initialize traffic analysis - if enabled
+        self.analysis = None
         if self.qoeval_config.traffic_analysis_live.get() or self.qoeval_config.traffic_analysis_plot.get():
             self.stats_filepath = os.path.join(self.qoeval_config.video_capture_path.get(),
                                                f"{self.output_filename}_stats")
@@ -219,73 +321,157 @@ class Coordinator:
 
         # optional sanity check (can be disbled in configuration file)
         if self.qoeval_config.net_em_sanity_check.get():
-            if self._params['rul'] < DELAY_MEASUREMENT_BW_THRESH or self._params['rdl']:
-                log.warning("delay measurement in low-bandwidth situation - using higher relative tolerance")
-                delay_tol_rel = DELAY_TOLERANCE_REL_LOWBW
-            else:
-                delay_tol_rel = DELAY_TOLERANCE_REL_NORMAL
-            self.netem.enable_netem(consider_t_init=False)
-            log.debug("network emulation sanity check - measuring delay while emulation is active...")
-            measured_rtt_during_emulation = self.emulator.measure_rtt()
-            max_allowed_rtt_during_emulation = (self._params['dul'] + self._params['ddl'] +
-                                                max(DELAY_TOLERANCE_MIN,
-                                                    delay_tol_rel * (self._params['dul'] + self._params['ddl'])))
-            self._gen_log.write(
-                f" emu rtt: {measured_rtt_during_emulation}ms max rtt: {max_allowed_rtt_during_emulation}ms ")
-            if measured_rtt_during_emulation > max_allowed_rtt_during_emulation:
-                self._gen_log.write(f" network emulation sanity check failed - too high - canceled. ")
-                raise RuntimeError(
-                    f"Measured RTT of {measured_rtt_during_emulation}ms exceeds maximum allowed RTT of "
-                    f"{max_allowed_rtt_during_emulation}ms! Sanity check failed.")
-            if measured_rtt_during_emulation < self._params['dul'] + self._params['ddl']:
-                self._gen_log.write(f" network emulation sanity check failed - too low - canceled. ")
-                raise RuntimeError(
-                    f"Measured RTT of {measured_rtt_during_emulation}ms is lower than the minimum allowed RTT of "
-                    f"{self._params['dul'] + self._params['ddl']}ms! Sanity check failed.")
-
-        # execute concurrently in separate threads
-        ui_control_thread = threading.Thread(target=self.ui_control.execute_use_case, args=(uc_duration,))
-        capture_thread = threading.Thread(target=self.capture.start_recording,
-                                          args=(self.output_filename, capture_time))
-
+            with span("execute.sanity_check"):
+                if self._params['rul'] < DELAY_MEASUREMENT_BW_THRESH or self._params['rdl']:
+                    log.warning("delay measurement in low-bandwidth situation - using higher relative tolerance")
+                    delay_tol_rel = DELAY_TOLERANCE_REL_LOWBW
+                else:
+                    delay_tol_rel = DELAY_TOLERANCE_REL_NORMAL
+                self.netem.enable_netem(consider_t_init=False)
+                log.debug("network emulation sanity check - measuring delay while emulation is active...")
+                measured_rtt_during_emulation = self.emulator.measure_rtt()
+                max_allowed_rtt_during_emulation = (self._params['dul'] + self._params['ddl'] +
+                                                    max(DELAY_TOLERANCE_MIN,
+                                                        delay_tol_rel * (self._params['dul'] + self._params['ddl'])))
+                self._gen_log.write(
+                    f" emu rtt: {measured_rtt_during_emulation}ms max rtt: {max_allowed_rtt_during_emulation}ms ")
+                if measured_rtt_during_emulation > max_allowed_rtt_during_emulation:
+                    self._gen_log.write(f" network emulation sanity check failed - too high - canceled. ")
+                    raise TransientError(
+                        f"Measured RTT of {measured_rtt_during_emulation}ms exceeds maximum allowed RTT of "
+                        f"{max_allowed_rtt_during_emulation}ms! Sanity check failed.", PHASE_EXECUTE)
+                if measured_rtt_during_emulation < self._params['dul'] + self._params['ddl']:
+                    self._gen_log.write(f" network emulation sanity check failed - too low - canceled. ")
+                    raise TransientError(
+                        f"Measured RTT of {measured_rtt_during_emulation}ms is lower than the minimum allowed RTT of "
+                        f"{self._params['dul'] + self._params['ddl']}ms! Sanity check failed.", PHASE_EXECUTE)
+
+        # log the applied network conditions of the recording (aligned with the video and the traffic statistics)
+        self.netem.set_change_log(change_log_file(self.qoeval_config.video_capture_path.get(), self.output_filename))
+
+        # execute concurrently in separate threads which start at the same instant
+        frame_tap = self._create_frame_tap()
+        start_barrier = StartBarrier(["netem", "ui_control", "capture"] + (["analysis"] if self.analysis else []))
         is_using_dynamic_params = self._params['dynamic'] and (len(self._params['dynamic']) > 0)
-
-        self.netem.enable_netem(consider_t_init=True, consider_dynamic_parameters=is_using_dynamic_params)
-        # input("netem active - check conditions on mobile device and press enter to continue...")
-
-        if self.qoeval_config.traffic_analysis_live.get() or self.qoeval_config.traffic_analysis_plot.get():
-            self.analysis.start()
+        # a component failing before the start releases the others (see StartBarrier.run)
+        netem_thread = threading.Thread(target=start_barrier.run, name="netem_start",
+                                        args=(self.netem.enable_netem,),
+                                        kwargs={'consider_t_init': True,
+                                                'consider_dynamic_parameters': is_using_dynamic_params,
+                                                'start_barrier': start_barrier})
+        # the threads add their spans to the timer of this stimulus
+        ui_control_thread = threading.Thread(target=bind(start_barrier.run),
+                                             args=(self._execute_use_case, uc_duration, start_barrier))
+        capture_thread = threading.Thread(target=bind(start_barrier.run),
+                                          args=(self.capture.start_recording, self.output_filename, capture_time),
+                                          kwargs={'frame_tap': frame_tap, 'start_barrier': start_barrier})
 
         live_plot = None
         if self.qoeval_config.traffic_analysis_live.get():
             live_plot = analysis.LivePlot(self.analysis, analysis.PACKETS, analysis.ALL)
 
-        ui_control_thread.start()
-        capture_thread.start()
-
-        if live_plot:
-            log.debug("Showing live plot - close window to continue processing when use-case has finished.")
-            live_plot.show()
-
-        capture_thread.join()
-        ui_control_thread.join()
+        with span("execute.recording"):
+            netem_thread.start()
+            ui_control_thread.start()
+            capture_thread.start()
+            if self.analysis:
+                try:
+                    # the traffic statistics start at the same instant as the video
+                    start_barrier.wait("analysis")
+                    self.analysis.start(start_barrier.wall_epoch)
+                    start_barrier.started("analysis")
+                except threading.BrokenBarrierError:
+                    log.error("Traffic analysis not started - start of the recording failed")
+            if frame_tap:
+                threading.Thread(target=self._stop_on_frame_tap, args=(frame_tap, ui_control_thread),
+                                 name="earlystop", daemon=True).start()
+
+            if live_plot and not start_barrier.is_broken:
+                log.debug("Showing live plot - close window to continue processing when use-case has finished.")
+                live_plot.show()
+
+            netem_thread.join()
+            capture_thread.join()
+            ui_control_thread.join()
+        if start_barrier.is_broken:
+            self.netem.disable_netem()
+            raise TransientError(f"Start of the recording of {self.output_filename} failed - components did not "
+                                 f"start together ({start_barrier})", PHASE_EXECUTE)
+        log.info(f"Start offsets of the recording components: {start_barrier}")
+        self._gen_log.write(f" start offsets: {start_barrier} ")
+        self._start_offsets = start_barrier.get_offsets()
+        self.netem.change_log.record_component_starts(start_barrier.epoch, start_barrier.wall_epoch,
+                                                      self._start_offsets)
+        self._recorded_time = min(time.monotonic() - start_barrier.epoch, convert_to_seconds(capture_time))
+
+        if frame_tap and frame_tap.is_aborted():
+            self.netem.disable_netem()
+            # a black or frozen window indicates a problem of the device
+            raise TransientError(f"Recording of {self.output_filename} aborted: {frame_tap.stop_reason}", PHASE_DEVICE)
 
         if self.qoeval_config.traffic_analysis_plot.get():
             self.analysis.wait_until_completed()
-            for plot_setting in self.qoeval_config.traffic_analysis_plot_settings.get():
-                plot = analysis.Plot(self.stats_filepath, 0, convert_to_seconds(capture_time), analysis.BYTES,
-                                     plot_setting["directions"], plot_setting["protocols"], plot_setting["kind"])
-                name = f'{self.stats_filepath}_{plot_setting["kind"]}'
-                for direction in plot_setting["directions"]:
-                    name = f'{name}_{direction}'
-                for protocol in plot_setting["protocols"]:
-                    name = f'{name}_{protocol}'
-                plot.save_pdf(name)
-                plot.save_png(name)
+            with span("execute.traffic_plot"):
+                for plot_setting in self.qoeval_config.traffic_analysis_plot_settings.get():
+                    plot = analysis.Plot(self.stats_filepath, 0, self._recorded_time, analysis.BYTES,
+                                         plot_setting["directions"], plot_setting["protocols"], plot_setting["kind"])
+                    name = f'{self.stats_filepath}_{plot_setting["kind"]}'
+                    for direction in plot_setting["directions"]:
+                        name = f'{name}_{direction}'
+                    for protocol in plot_setting["protocols"]:
+                        name = f'{name}_{protocol}'
+                    plot.save_pdf(name)
+                    plot.save_png(name)
 
         self.netem.disable_netem()
+        self.netem.set_change_log(None)
+
+    def _execute_use_case(self, duration: float, start_barrier: StartBarrier):
+        start_barrier.wait("ui_control")
+        start_barrier.started("ui_control")
+        with span("execute.use_case"):
+            self.ui_control.execute_use_case(duration)
+
+    def _create_frame_tap(self) -> Optional[FrameTap]:
+        """Returns the FrameTap for stopping the recording early or None if it is disabled or not supported"""
+        if not self.qoeval_config.capture_early_stop.get() or not self.capture.supports_frame_tap:
+            return None
+        trigger_image_end = os.path.join(self.qoeval_config.trigger_image_path.get(),
+                                         f"{self._type_id}-{self._table_id}_end.png")
+        if not os.path.isfile(trigger_image_end):
+            log.warning(f"Trigger image {trigger_image_end} not found - recording is not stopped early")
+            trigger_image_end = None
+        # post-processing uses the recording after the end trigger for some use-cases
+        grace_period = self.qoeval_config.capture_early_stop_grace_period.get()
+        if self._get_uc_type() == UseCaseType.APP_LAUNCH:
+            grace_period += self.qoeval_config.app_launch_additional_recording_duration.get()
+        elif self._get_uc_type() == UseCaseType.WEB_BROWSING:
+            grace_period += self.qoeval_config.web_browse_additional_recording_duration.get()
+        # static content is expected for web browsing and app launch, so only a frozen video is regarded as failure
+        frozen_timeout = self.qoeval_config.capture_frozen_timeout.get() \
+            if self._get_uc_type() == UseCaseType.YOUTUBE else 0.0
+        return FrameTap(trigger_image_end, grace_period, self.qoeval_config.capture_black_timeout.get(),
+                        frozen_timeout)
+
+    def _stop_on_frame_tap(self, frame_tap: FrameTap, ui_control_thread: threading.Thread):
+        """Stops use-case, traffic analysis and capture as soon as the frame tap detects a reason to stop"""
+        reason = frame_tap.wait_for_stop()
+        if reason is None:
+            return
+        self._is_stopped_early = True
+        self.ui_control.stop_use_case()
+        if reason == STOP_END_TRIGGER:
+            # the use-case might still show something which is part of the stimulus (e.g. the video resolution)
+            ui_control_thread.join()
+        if self.analysis:
+            self.analysis.stop()
+        self.capture.stop_recording()
 
     def _finish(self):
+        with span("finish"):
+            self._finish_campaign()
+
+    def _finish_campaign(self):
         if not self._is_prepared:
             log.warning("finish called for a campaign which is not prepared")
         if self._gen_log:
@@ -301,258 +487,434 @@ class Coordinator:
                 self.ui_control.shutdown_use_case()
             except RuntimeError as rte:
                 log.error(f"exception during ui shutdown: {rte}")
-        if self.emulator:
+        if self.emulator and not self._is_using_device_session:
             self.emulator.shutdown()
         self._is_prepared = False
 
-    def _generate_stimuli(self, type_id, table_id, ids_to_generate, overwrite: bool = False):
-        self._export_parameter_table(type_id, table_id)
-        for entry_id in ids_to_generate:
-            if not overwrite and is_stimuli_available(self.qoeval_config, type_id, table_id, entry_id, "0"):
-                print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
-                      f"skipped (already available). ")
-                continue
-
-            alternative_stimuli = \
-                get_stimuli_path(self.qoeval_config, type_id, table_id, entry_id, "0", True)
+    def _end_device_session(self):
+        if self.emulator and self._is_using_device_session:
+            self.emulator.end_session()
 
-            if not overwrite and alternative_stimuli is not None:
-                print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
-                      f"skipped ({alternative_stimuli} was generated with the same relevant parameters "
-                      f"and can be re-used). ")
-                continue
+    def _generate_stimuli(self, type_id, table_id, ids_to_generate, overwrite: bool = False,
+                          max_retries: int = MAX_RETRIES) -> CampaignPlan:
+        self._export_parameter_table(type_id, table_id)
+        plan = plan_campaign(self.parameter_table, self.journal, type_id, table_id, ids_to_generate, overwrite)
+        for entry_id in plan.skipped_ids:
+            print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
+                  f"skipped (already available). ")
+        print(plan)
+
+        for recording in plan.recordings:
+            if not recording.is_available:
+                with self._timed(self.qoeval_config, type_id, table_id, recording.entry_id, "0"):
+                    self._record_stimulus(type_id, table_id, recording.entry_id, max_retries)
+            link_recording(self.qoeval_config, self.journal, type_id, table_id, recording)
+        return plan
+
+    def _record_stimulus(self, type_id, table_id, entry_id, max_retries: int = MAX_RETRIES):
+        """
+        Records a single stimulus (P0)
 
-            retry_counter = 0
-            is_successful_or_canceled = False
-            while not is_successful_or_canceled:
+        Permanent errors fail immediately, other errors are retried up to max_retries times with an exponential
+        backoff (see RetryPolicy). A retry restarts from the phase which failed, e.g. a failed sanity check of the
+        network emulation is repeated without re-launching the device.
+        """
+        journal_parameters = self._get_journal_parameters(type_id, table_id, entry_id)
+        policy = self._get_retry_policy(max_retries)
+        retry_counter = 0
+        phase = PHASE_DEVICE
+        self.journal.start(type_id, table_id, entry_id, "0", journal_parameters)
+        try:
+            while True:
                 try:
-                    self._prepare(type_id, table_id, entry_id)
-                    wait_countdown(SHORT_WAITING)
-                    excerpt_duration = (convert_to_seconds(get_end(type_id, table_id, entry_id)) -
-                                        convert_to_seconds(get_start(type_id, table_id, entry_id)))
-                    # estimate timespan to be recorded - to be careful we double the duration
-                    execution_time = excerpt_duration * 2.0 + 40
-                    if self._get_uc_type() == UseCaseType.YOUTUBE:
-                        # for youtube we add three minutes (assumed maximum time for youtube to adapt playback to rate)
-                        # and add some extra time during which e.g. the overflow can be shown
-                        execution_time = execution_time + 180 + 20
+                    if phase in [PHASE_DEVICE, PHASE_USE_CASE]:
+                        if phase == PHASE_DEVICE:
+                            self._delay_bias = None
+                        self._prepare(type_id, table_id, entry_id, phase)
+                        wait_countdown(SHORT_WAITING)
+                    self._recorded_time = None
+                    self._is_stopped_early = False
+                    self._start_offsets = None
+                    execution_time = get_capture_duration(self.parameter_table, type_id, table_id, entry_id)
                     time_str = convert_to_timestr(execution_time)
                     self._execute(time_str)
                     wait_countdown(SHORT_WAITING)
-                    is_successful_or_canceled = True
+                    self.journal.complete(type_id, table_id, entry_id, "0",
+                                          {'delay_bias': self._delay_bias, 'capture_time': execution_time,
+                                           'recorded_time': self._recorded_time,
+                                           'stopped_early': self._is_stopped_early,
+                                           'start_offsets': self._start_offsets})
+                    return
                 except RuntimeError as err:
+                    self.journal.fail(type_id, table_id, entry_id, "0", err)
                     traceback.print_exc()
                     print(f"RuntimeError while generating stimuli : {type_id}-{table_id}-{entry_id}")
                     print(f"Error : {err}")
-                    if retry_counter < MAX_RETRIES:
-                        print(f"Retrying in a few seconds ({MAX_RETRIES - retry_counter} attempt(s) left)")
-                        wait_countdown(LONG_WAITING)
-                        retry_counter = retry_counter + 1
-                    else:
-                        # uncomment the following lines to allow manual retries - TODO: should be a flag
-                        # input_text = input(f"Maximum number of retries reached - try again? (y/N)")
-                        # if not (input_text == "y" or input_text == "Y"):
-                        if True:
-                            raise
-                finally:
-                    self._finish()
-                    log.info(f"{FINISH_CAMPAIGN_LOG}{get_video_id(self.qoeval_config, type_id, table_id, entry_id)}")
+                    if not policy.should_retry(err, retry_counter):
+                        if is_permanent(err):
+                            print("Error is permanent - not retrying.")
+                        raise
+                    phase = get_retry_phase(err)
+                    self._reset_phase(phase)
+                    delay = policy.get_delay(retry_counter)
+                    retry_counter = retry_counter + 1
+                    print(f"Retrying from phase \"{phase}\" in {delay:.0f} s "
+                          f"({max_retries - retry_counter + 1} attempt(s) left)")
+                    with span("retry.wait"):
+                        wait_countdown(int(delay))
+                    self.journal.start(type_id, table_id, entry_id, "0", journal_parameters)
+        except RuntimeError:
+            # the device might be in an undefined state, so the next stimulus starts with a new session
+            self._end_device_session()
+            raise
+        finally:
+            self._finish()
+            log.info(f"{FINISH_CAMPAIGN_LOG}{get_video_id(self.qoeval_config, type_id, table_id, entry_id)}")
+
+    def _get_retry_policy(self, max_retries: int) -> RetryPolicy:
+        return RetryPolicy(max_retries, self.qoeval_config.coordinator_retry_delay.get(),
+                           self.qoeval_config.coordinator_retry_max_delay.get())
+
+    def _reset_phase(self, phase: str):
+        """Undoes the steps of the given phase (and all later phases) of a failed recording, so it can be retried"""
+        if self.analysis:
+            self.analysis.stop()
+            self.analysis = None
+        if phase == PHASE_EXECUTE:
+            if self.netem:
+                self.netem.disable_netem()
+        elif phase == PHASE_USE_CASE:
+            if self.netem:
+                self.netem.cleanup()
+                self.netem = None
+            if self.ui_control:
+                try:
+                    self.ui_control.shutdown_use_case()
+                except RuntimeError as rte:
+                    log.error(f"exception during ui shutdown: {rte}")
+            self._is_prepared = False
+        else:
+            self._finish()
+            # the device might be in an undefined state, so the retry starts with a new session
+            self._end_device_session()
 
     def _perform_postprocessing(self, type_id, table_id, ids_to_process, overwrite: bool = False):
         self._export_parameter_table(type_id, table_id)
-        trigger_dir = self.qoeval_config.trigger_image_path.get()
         self._type_id = type_id
         self._table_id = table_id
         for entry_id in ids_to_process:
             self._entry_id = entry_id
-            video_id_in = get_video_id(self.qoeval_config, type_id, table_id, entry_id, "0")
-            video_id_out = get_video_id(self.qoeval_config, type_id, table_id, entry_id, "1")
-            if not overwrite and is_stimuli_available(self.qoeval_config, type_id, table_id, entry_id, "1"):
-                print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
-                      f"post-processed file exists - skipped. ")
-                continue
-
-            alternative_stimuli = \
-                get_stimuli_path(self.qoeval_config, type_id, table_id, entry_id, "1", True)
+            try:
+                self._postprocess_entry(self.qoeval_config, type_id, table_id, entry_id, overwrite)
+            except RuntimeError as err:
+                self.journal.fail(type_id, table_id, entry_id, "1", err)
+                raise
 
-            # we can re-use the existing post-processed file for VSB if an alternative stimuli exists
-            # (since VSB use-cases might only differ in the buffer-generating parameters)
-            if type_id == "VSB" and alternative_stimuli is not None:
-                print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
-                      f"post-processed file exists ({alternative_stimuli} was generated "
-                      f"with the same relevant parameters and can be re-used). ")
-                continue
+    def _postprocess_entry(self, qoeval_config: QoEvalConfiguration, type_id, table_id, entry_id,
+                           overwrite: bool = False):
+        """
+        Post-processes (P1) a single recorded stimulus
 
-            cfg_log = os.path.join(self.qoeval_config.video_capture_path.get(), f"{video_id_out}.cfg")
+        Only the given ids and configuration are used (not the state of the current recording), so that this can run
+        in parallel to the recording of the next stimulus (see _run_pipelined).
+        """
+        if not overwrite and self.journal.is_completed(type_id, table_id, entry_id, "1"):
+            print(f"Stimuli {get_video_id(qoeval_config, type_id, table_id, entry_id)} "
+                  f"post-processed file exists - skipped. ")
+            return
 
-            if os.path.isfile(cfg_log):
-                log.debug(f"Found an existing configuration - loading {cfg_log}")
-                self.qoeval_config.read_from_file(cfg_log)
-            else:
-                # store a copy of the qoeval configuration used for post-processing (to be reproducible)
-                self.qoeval_config.save_to_file(cfg_log)
-
-            postprocessor = PostProcessor(self.qoeval_config)
-            print(f"Processing: {video_id_in}")
-            # print("Semi-manual post-processing starts... ")
-            # print("Please use a video player of your choice to answer the following questions.")
-            # print("")
-            # t_init_buf = str(
-            #    input(f"Time until playback starts (T_init + time to fill playback buffer) [hh:mm:ss.xxx]: "))
-            # t_raw_start = str(input(f"Time when relevant section starts in raw stimuli video [hh:mm:ss.xxx]: "))
-            # d_start_to_end = int(input(f"Duration from t_start to t_end in seconds [s]: "))
-
-            # auto-detect video t_init_buf, t_raw_start, t_raw_end
-            unprocessed_video_path = f"{os.path.join(self.qoeval_config.video_capture_path.get(), video_id_in)}.avi"
-
-            if not os.path.isfile(unprocessed_video_path):
-                # try to find alternative unprocessed input file
-                alternative_stimuli = \
-                    get_stimuli_path(self.qoeval_config, type_id, table_id, entry_id, "0", True)
-                if alternative_stimuli:
-                    log.debug(f"Unprocessed video file {unprocessed_video_path} does not exist but found a valid "
-                              f"alternative: {alternative_stimuli}")
-                else:
-                    log.error(f"Unprocessed video file {unprocessed_video_path} does not exist and there are no"
-                              f"alternatives to be used. Cannot continue.")
-                    raise RuntimeError(f"Video file {unprocessed_video_path} does not exist.")
-                unprocessed_video_path = alternative_stimuli
+        alternative_stimuli = \
+            get_stimuli_path(qoeval_config, self.parameter_table, type_id, table_id, entry_id, "1", True)
 
-            if not os.path.isfile(unprocessed_video_path):
-                log.error(f"Cannot open unprocessed video file {unprocessed_video_path}")
-                raise RuntimeError(f"Video file {unprocessed_video_path} does not exist.")
+        # we can re-use the existing post-processed file for VSB if an alternative stimuli exists
+        # (since VSB use-cases might only differ in the buffer-generating parameters)
+        if type_id == "VSB" and alternative_stimuli is not None:
+            print(f"Stimuli {get_video_id(qoeval_config, type_id, table_id, entry_id)} "
+                  f"post-processed file exists ({alternative_stimuli} was generated "
+                  f"with the same relevant parameters and can be re-used). ")
+            return
 
-            trigger_image_start = os.path.join(trigger_dir, f"{type_id}-{table_id}_start.png")
-            trigger_image_end = os.path.join(trigger_dir, f"{type_id}-{table_id}_end.png")
-            if self._get_uc_type() == UseCaseType.APP_LAUNCH:
-                # for the app launch use-case, the relevant section starts right at the capturing start time
-                start_frame_nr = 0
-                t_raw_start = 0
+        self.journal.start(type_id, table_id, entry_id, "1", self._get_journal_parameters(type_id, table_id, entry_id))
+        with self._timed(qoeval_config, type_id, table_id, entry_id, "1"):
+            self._postprocess_recording(qoeval_config, type_id, table_id, entry_id)
+
+    def _postprocess_recording(self, qoeval_config: QoEvalConfiguration, type_id, table_id, entry_id):
+        """Detects the relevant section of the recording of a stimulus and cuts it (the actual post-processing)"""
+        trigger_dir = qoeval_config.trigger_image_path.get()
+        uc_type = get_uc_type(type_id)
+        video_id_in = get_video_id(qoeval_config, type_id, table_id, entry_id, "0")
+        video_id_out = get_video_id(qoeval_config, type_id, table_id, entry_id, "1")
+        cfg_log = os.path.join(qoeval_config.video_capture_path.get(), f"{video_id_out}.cfg")
+
+        if os.path.isfile(cfg_log):
+            log.debug(f"Found an existing configuration - loading {cfg_log}")
+            qoeval_config.read_from_file(cfg_log)
+        else:
+            # store a copy of the qoeval configuration used for post-processing (to be reproducible)
+            qoeval_config.save_to_file(cfg_log)
+
+        postprocessor = PostProcessor(qoeval_config)
+        print(f"Processing: {video_id_in}")
+        # print("Semi-manual post-processing starts... ")
+        # print("Please use a video player of your choice to answer the following questions.")
+        # print("")
+        # t_init_buf = str(
+        #    input(f"Time until playback starts (T_init + time to fill playback buffer) [hh:mm:ss.xxx]: "))
+        # t_raw_start = str(input(f"Time when relevant section starts in raw stimuli video [hh:mm:ss.xxx]: "))
+        # d_start_to_end = int(input(f"Duration from t_start to t_end in seconds [s]: "))
+
+        # auto-detect video t_init_buf, t_raw_start, t_raw_end
+        unprocessed_video_path = f"{os.path.join(qoeval_config.video_capture_path.get(), video_id_in)}.avi"
+
+        if not os.path.isfile(unprocessed_video_path):
+            # try to find alternative unprocessed input file
+            alternative_stimuli = \
+                get_stimuli_path(qoeval_config, self.parameter_table, type_id, table_id, entry_id, "0", True)
+            if alternative_stimuli:
+                log.debug(f"Unprocessed video file {unprocessed_video_path} does not exist but found a valid "
+                          f"alternative: {alternative_stimuli}")
             else:
-                print("Detecting start of stimuli video section... ", end='')
+                log.error(f"Unprocessed video file {unprocessed_video_path} does not exist and there are no"
+                          f"alternatives to be used. Cannot continue.")
+                raise RuntimeError(f"Video file {unprocessed_video_path} does not exist.")
+            unprocessed_video_path = alternative_stimuli
+
+        if not os.path.isfile(unprocessed_video_path):
+            log.error(f"Cannot open unprocessed video file {unprocessed_video_path}")
+            raise RuntimeError(f"Video file {unprocessed_video_path} does not exist.")
+
+        trigger_image_start = os.path.join(trigger_dir, f"{type_id}-{table_id}_start.png")
+        trigger_image_end = os.path.join(trigger_dir, f"{type_id}-{table_id}_end.png")
+        if uc_type == UseCaseType.APP_LAUNCH:
+            # for the app launch use-case, the relevant section starts right at the capturing start time
+            start_frame_nr = 0
+            t_raw_start = 0
+        else:
+            print("Detecting start of stimuli video section... ", end='')
+            with span("postprocessing.trigger_detection"):
                 start_frame_nr = determine_frame(unprocessed_video_path, trigger_image_start)
                 t_raw_start = frame_to_time(unprocessed_video_path, start_frame_nr)
-                print(f"{t_raw_start} s")
+            print(f"{t_raw_start} s")
 
-            t_init_buf_manual = self.qoeval_config.vid_init_buffer_time_manual.get()
+        t_init_buf_manual = qoeval_config.vid_init_buffer_time_manual.get()
 
-            # only some of the use-case types require a detection of the initialization phase (t-init)
-            if self._get_uc_type() == UseCaseType.YOUTUBE:
-                is_normalizing_audio = True
-                if t_init_buf_manual:
-                    is_detecting_t_init = False
-                else:
-                    is_detecting_t_init = True
-            else:
+        # only some of the use-case types require a detection of the initialization phase (t-init)
+        if uc_type == UseCaseType.YOUTUBE:
+            is_normalizing_audio = True
+            if t_init_buf_manual:
                 is_detecting_t_init = False
-                is_normalizing_audio = False
-
-            # check: if a fixed-codec is used, auto-detection of t_init_buf does not work reliably
-            if is_detecting_t_init and \
-                    get_codec(self._type_id, self._table_id, self._entry_id) and \
-                    get_codec(self._type_id, self._table_id, self._entry_id).lower() != _AUTO_CODEC and \
-                    "" != get_codec(self._type_id, self._table_id, self._entry_id) and \
-                    not t_init_buf_manual:
-                log.warning(f"Stimuli uses a fixed codec but does not specify a manual "
-                            f"buffer initialization time (VidInitBufferTimeManual)! This is NOT RECOMMENDED and "
-                            f"might lead to invalid stimuli since auto-detection does not work reliably in "
-                            f"this situation. Please specify VidInitBufferTimeManual in the configuration file"
-                            f"of this stimuli.")
-
-            if not t_init_buf_manual and is_detecting_t_init and not self._type_id == "VSB":
-                t_detect_start = max(0, t_raw_start - (2.5 * VIDEO_PRE_START))
-                print(f"Detecting start of video playback (search starts at: {t_detect_start} s) ... ", end='')
-                t_init_buf = determine_video_start(self.qoeval_config, unprocessed_video_path, t_detect_start)
-                if not t_init_buf:
-                    print(f"failed. (Is the input video \"{unprocessed_video_path}\" correct?)")
-                    continue
-                print(f"{t_init_buf} s")
             else:
-                if t_init_buf_manual:
-                    print(f"Auto-detection disabled - manually specified start of buffering-phase "
-                          f"(VidInitBufferTimeManual): {t_init_buf_manual} s")
-                    t_init_buf = t_init_buf_manual
-                else:
-                    t_init_buf = 0.0
+                is_detecting_t_init = True
+        else:
+            is_detecting_t_init = False
+            is_normalizing_audio = False
+
+        # check: if a fixed-codec is used, auto-detection of t_init_buf does not work reliably
+        codec = self.parameter_table.codec(type_id, table_id, entry_id)
+        if is_detecting_t_init and \
+                codec and \
+                codec.lower() != _AUTO_CODEC and \
+                "" != codec and \
+                not t_init_buf_manual:
+            log.warning(f"Stimuli uses a fixed codec but does not specify a manual "
+                        f"buffer initialization time (VidInitBufferTimeManual)! This is NOT RECOMMENDED and "
+                        f"might lead to invalid stimuli since auto-detection does not work reliably in "
+                        f"this situation. Please specify VidInitBufferTimeManual in the configuration file"
+                        f"of this stimuli.")
+
+        if not t_init_buf_manual and is_detecting_t_init and not type_id == "VSB":
+            t_detect_start = max(0, t_raw_start - (2.5 * VIDEO_PRE_START))
+            print(f"Detecting start of video playback (search starts at: {t_detect_start} s) ... ", end='')
+            with span("postprocessing.video_start_detection"):
+                t_init_buf = determine_video_start(qoeval_config, unprocessed_video_path, t_detect_start)
+            if not t_init_buf:
+                print(f"failed. (Is the input video \"{unprocessed_video_path}\" correct?)")
+                self.journal.fail(type_id, table_id, entry_id, "1", "Detecting start of video playback failed.")
+                return
+            print(f"{t_init_buf} s")
+        else:
+            if t_init_buf_manual:
+                print(f"Auto-detection disabled - manually specified start of buffering-phase "
+                      f"(VidInitBufferTimeManual): {t_init_buf_manual} s")
+                t_init_buf = t_init_buf_manual
+            else:
+                t_init_buf = 0.0
 
-            if t_init_buf > t_raw_start:
-                if t_init_buf - t_raw_start > VIDEO_T_INIT_TOLERANCE:
-                    raise RuntimeError(
-                        f"Detected end of buffer initialization (t_init_buf, start of video playback) at {t_init_buf}s "
-                        f"is later than start of stimuli at {t_raw_start}s ! Check detection thresholds.")
-                else:
-                    log.warning(
-                        "Detected end of t_init phase is later than detected stimuli start - but within tolerance.")
-                    t_init_buf = t_raw_start
+        if t_init_buf > t_raw_start:
+            if t_init_buf - t_raw_start > VIDEO_T_INIT_TOLERANCE:
+                raise RuntimeError(
+                    f"Detected end of buffer initialization (t_init_buf, start of video playback) at {t_init_buf}s "
+                    f"is later than start of stimuli at {t_raw_start}s ! Check detection thresholds.")
+            else:
+                log.warning(
+                    "Detected end of t_init phase is later than detected stimuli start - but within tolerance.")
+                t_init_buf = t_raw_start
 
-            print("Detecting end of stimuli video section... ", end='')
+        print("Detecting end of stimuli video section... ", end='')
+        with span("postprocessing.trigger_detection"):
             t_raw_end = frame_to_time(unprocessed_video_path,
                                       determine_frame(unprocessed_video_path, trigger_image_end, start_frame_nr))
-            print(f"{t_raw_end} s")
-            d_start_to_end = t_raw_end - t_raw_start
-
-            if self._get_uc_type() == UseCaseType.APP_LAUNCH:
-                d_start_to_end = d_start_to_end + self.qoeval_config.app_launch_additional_recording_duration.get()
-            elif self._get_uc_type() == UseCaseType.WEB_BROWSING:
-                d_start_to_end = d_start_to_end + self.qoeval_config.web_browse_additional_recording_duration.get()
+        print(f"{t_raw_end} s")
+        d_start_to_end = t_raw_end - t_raw_start
 
-            if t_raw_start > t_raw_end:
-                raise RuntimeError(
-                    f"Detected start of stimuli section at {t_raw_start}s is later than the detected end "
-                    f"at {t_raw_end}s ! Check trigger images and verify that they are part of the recorded stimuli.")
-
-            if self._get_uc_type() == UseCaseType.APP_LAUNCH and \
-                    self.qoeval_config.app_launch_vid_erase_box.get() is not None:
-                # for the app launch use-case, we use a different default erase box
-                erase_box = self.qoeval_config.app_launch_vid_erase_box.get()
-            elif self._get_uc_type() == UseCaseType.WEB_BROWSING and \
-                    self.qoeval_config.web_browse_vid_erase_box.get() is not None:
-                erase_box = self.qoeval_config.app_launch_vid_erase_box.get()
-            else:
-                # use default value for all other use-case types
-                erase_box = self.qoeval_config.vid_erase_box.get()
+        if uc_type == UseCaseType.APP_LAUNCH:
+            d_start_to_end = d_start_to_end + qoeval_config.app_launch_additional_recording_duration.get()
+        elif uc_type == UseCaseType.WEB_BROWSING:
+            d_start_to_end = d_start_to_end + qoeval_config.web_browse_additional_recording_duration.get()
 
-            print("Cutting and merging video stimuli...")
-            postprocessor.process(video_id_in, video_id_out, t_init_buf, t_raw_start, d_start_to_end,
-                                  normalize_audio=is_normalizing_audio,
-                                  erase_audio=self.qoeval_config.audio_erase_start_stop.get(),
-                                  erase_box = erase_box)
-            print(f"{FINISH_POST_LOG}{video_id_in} ==> {video_id_out}")
+        if t_raw_start > t_raw_end:
+            raise RuntimeError(
+                f"Detected start of stimuli section at {t_raw_start}s is later than the detected end "
+                f"at {t_raw_end}s ! Check trigger images and verify that they are part of the recorded stimuli.")
+
+        if uc_type == UseCaseType.APP_LAUNCH and \
+                qoeval_config.app_launch_vid_erase_box.get() is not None:
+            # for the app launch use-case, we use a different default erase box
+            erase_box = qoeval_config.app_launch_vid_erase_box.get()
+        elif uc_type == UseCaseType.WEB_BROWSING and \
+                qoeval_config.web_browse_vid_erase_box.get() is not None:
+            erase_box = qoeval_config.app_launch_vid_erase_box.get()
+        else:
+            # use default value for all other use-case types
+            erase_box = qoeval_config.vid_erase_box.get()
+
+        print("Cutting and merging video stimuli...")
+        postprocessor.process(video_id_in, video_id_out, t_init_buf, t_raw_start, d_start_to_end,
+                              normalize_audio=is_normalizing_audio,
+                              erase_audio=qoeval_config.audio_erase_start_stop.get(),
+                              erase_box = erase_box)
+        self.journal.complete(type_id, table_id, entry_id, "1",
+                              {'t_init_buf': t_init_buf, 't_raw_start': t_raw_start, 't_raw_end': t_raw_end,
+                               'd_start_to_end': d_start_to_end})
+        print(f"{FINISH_POST_LOG}{video_id_in} ==> {video_id_out}")
+
+    def _get_journal_parameters(self, type_id, table_id, entry_id) -> Optional[dict]:
+        try:
+            return self.parameter_table.parameters(type_id, table_id, entry_id)
+        except ValueError:
+            return None
+
+    def _run_journaled(self, type_id, table_id, entry_id, phase: str, function: Callable[[str, str, str], None]):
+        """Runs the processing step phase of the given stimulus and records it in the journal"""
+        self.journal.start(type_id, table_id, entry_id, phase,
+                           self._get_journal_parameters(type_id, table_id, entry_id))
+        with self._timed(self.qoeval_config, type_id, table_id, entry_id, phase):
+            try:
+                function(type_id, table_id, entry_id)
+            except RuntimeError as err:
+                self.journal.fail(type_id, table_id, entry_id, phase, err)
+                raise
+            self.journal.complete(type_id, table_id, entry_id, phase)
+
+    @contextlib.contextmanager
+    def _timed(self, qoeval_config: QoEvalConfiguration, type_id, table_id, entry_id, step: str):
+        """
+        Measures the processing step of the given stimulus (see qoeval_pkg.timing)
 
+        The spans of the step are written to "{video_id}_timing.json" and added to the metrics of the campaign, the
+        step is regarded as completed if it has been completed in the journal.
+        """
+        timer = StimulusTimer(get_video_id(qoeval_config, type_id, table_id, entry_id, step), step)
+        features = get_stimulus_features(self.parameter_table, type_id, table_id, entry_id)
+        timer.features = asdict(features) if features else None
+        is_completed = False
+        try:
+            with timer.activate():
+                yield timer
+            is_completed = self.journal.is_completed(type_id, table_id, entry_id, step)
+        finally:
+            timer.finish(STATUS_COMPLETED if is_completed else STATUS_FAILED)
+            try:
+                timer.save(qoeval_config.video_capture_path.get())
+            except OSError as err:
+                log.error(f"Cannot save timing of {timer.video_id}: {err}")
+            get_campaign_metrics(qoeval_config).add(timer)
+            if self.estimate:
+                self.estimate.complete(timer.video_id)
+                print(f"Campaign progress: {self.estimate.get_progress()}")
 
     def _add_generated_buffering(self, type_id, table_id, ids_to_process, overwrite: bool = False):
         self._type_id = type_id
         self._table_id = table_id
-        generator = BufferingGenerator(self.qoeval_config)
+        generator = BufferingGenerator(self.qoeval_config, self.parameter_table)
         for entry_id in ids_to_process:
             self._entry_id = entry_id
-            if not overwrite and is_stimuli_available(self.qoeval_config, type_id, table_id, entry_id, "2"):
+            if not overwrite and self.journal.is_completed(type_id, table_id, entry_id, "2"):
                 print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
                       f"post-processed file (P2: generated_buffering) exists - skipped. ")
                 continue
-            generator.generate(type_id, table_id, entry_id)
+            self._run_journaled(type_id, table_id, entry_id, "2", generator.generate)
         for entry_id in ids_to_process:
             self._entry_id = entry_id
-            if not overwrite and is_stimuli_available(self.qoeval_config, type_id, table_id, entry_id, "3"):
+            if not overwrite and self.journal.is_completed(type_id, table_id, entry_id, "3"):
                 print(f"Stimuli {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
                       f"post-processed file (P3: generated_buffering with setpts) exists - skipped. ")
                 continue
-            generator.recode_setpts(type_id, table_id, entry_id)
+            self._run_journaled(type_id, table_id, entry_id, "3", generator.recode_setpts)
+
+    def _run_pipelined(self, type_id, table_id, ids_to_evaluate, postprocessing_workers: int, overwrite: bool = False):
+        """
+        Records the stimuli one after another and hands each recording to a pool of post-processing threads
+
+        Post-processing (and generating the buffering for VSB) of a stimulus runs while the next stimulus is being
+        recorded. Alternative entries (which re-use the results of each other) are post-processed one after another.
+        """
+        self._export_parameter_table(type_id, table_id)
+        futures = collections.OrderedDict()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=postprocessing_workers,
+                                                   thread_name_prefix="postprocessing") as executor:
+            for entry_id in ids_to_evaluate:
+                self._generate_stimuli(type_id, table_id, [entry_id], overwrite)
+                futures[entry_id] = executor.submit(self.postprocess, type_id, table_id, entry_id, overwrite)
+
+        failed_ids = []
+        for entry_id, future in futures.items():
+            err = future.exception()
+            if err is not None:
+                log.error(f"Post-processing of {get_video_id(self.qoeval_config, type_id, table_id, entry_id)} "
+                          f"failed: {err}")
+                failed_ids.append(entry_id)
+        if failed_ids:
+            raise RuntimeError(f"Post-processing failed for {type_id}-{table_id} entries: {', '.join(failed_ids)}")
+
+    def _get_group_lock(self, type_id, table_id, entry_id) -> threading.Lock:
+        """Returns the lock serializing the post-processing of the entry and its alternatives"""
+        with self._group_locks_lock:
+            entry_locks = self._group_locks.get((type_id, table_id))
+            if entry_locks is None:
+                alternative_groups = self.parameter_table.query().alternative_groups(type_id, table_id, "1")
+                entry_ids = self.parameter_table.query().filter(type_id=type_id, table_id=table_id)['entry_id']
+                group_locks = {group: threading.Lock() for group in set(alternative_groups)}
+                entry_locks = {str(other_id): group_locks[group]
+                               for other_id, group in zip(entry_ids, alternative_groups)}
+                self._group_locks[(type_id, table_id)] = entry_locks
+            # the lock of an entry with invalid parameters is not shared (post-processing it will fail anyway)
+            return entry_locks.setdefault(str(entry_id), threading.Lock())
+
+    def _postprocess_entry_pipelined(self, type_id, table_id, entry_id, lock: threading.Lock, overwrite: bool):
+        # post-processing might load the configuration of an existing stimulus, so it must not use the configuration
+        # of the ongoing recording
+        qoeval_config = self.qoeval_config.copy()
+        with lock:
+            try:
+                self._postprocess_entry(qoeval_config, type_id, table_id, entry_id, overwrite)
+            except RuntimeError as err:
+                self.journal.fail(type_id, table_id, entry_id, "1", err)
+                raise
+            if type_id == "VSB":
+                generator = BufferingGenerator(qoeval_config, self.parameter_table)
+                if overwrite or not self.journal.is_completed(type_id, table_id, entry_id, "2"):
+                    self._run_journaled(type_id, table_id, entry_id, "2", generator.generate)
+                if overwrite or not self.journal.is_completed(type_id, table_id, entry_id, "3"):
+                    self._run_journaled(type_id, table_id, entry_id, "3", generator.recode_setpts)
 
     def _export_parameter_table(self, type_id, table_id):
-        output_file = f"{type_id}-{table_id}"
-        output_path = f"{os.path.join(self.qoeval_config.video_capture_path.get(), output_file)}.csv"
-        export_entries(type_id, table_id, output_path, compact=False)
-        output_path = f"{os.path.join(self.qoeval_config.video_capture_path.get(), output_file)}_compact.csv"
-        export_entries(type_id, table_id, output_path, compact=True)
+        self.parameter_table.export_tables(self.qoeval_config.video_capture_path.get(), [(type_id, table_id)])
+
+    def export_all_parameter_tables(self, force: bool = False):
+        self._load_parameter_table()
+        self.parameter_table.export_tables(self.qoeval_config.video_capture_path.get(), force=force)
 
-    def export_all_parameter_tables(self):
-        load_parameter_file(self.qoeval_config.parameter_file.get())
-        all_type_ids = get_type_ids()
-        for type_id in all_type_ids:
-            all_table_ids = get_table_ids(type_id)
-            for table_id in all_table_ids:
-                self._export_parameter_table(type_id, table_id)
 
 
         """
@@ -574,20 +936,31 @@ class Coordinator:
             Specify if new stimuli should be generated/recorded
         postprocessing : bool
             Specify if postprocessing should be applied
+        postprocessing_workers : int
+            Number of threads post-processing already recorded stimuli while the next ones are recorded,
+            0 to record all stimuli before post-processing them (default: CoordinatorPostprocessingWorkers)
         """
 
     def start(self, type_ids: List[str], table_ids: List[str], entry_ids: List[str] = None,
-              generate_stimuli: bool = True, postprocessing: bool = True, overwrite: bool = False):
+              generate_stimuli: bool = True, postprocessing: bool = True, overwrite: bool = False,
+              postprocessing_workers: int = None):
 
-        load_parameter_file(self.qoeval_config.parameter_file.get())
+        self._load_parameter_table()
 
-        type_id = type_ids[0]  # TODO: extend to process all elements
-        table_id = table_ids[0]
+        if len(type_ids) != len(table_ids):
+            raise RuntimeError(f"Number of type ids {type_ids} does not match number of table ids {table_ids}")
 
+        stimuli = []
+        for type_id, table_id in zip(type_ids, table_ids):
+            stimuli.extend((type_id, table_id, entry_id)
+                           for entry_id in self._get_ids_to_evaluate(type_id, table_id, entry_ids))
+        self.start_batch(stimuli, generate_stimuli, postprocessing, overwrite, postprocessing_workers)
+
+    def _get_ids_to_evaluate(self, type_id: str, table_id: str, entry_ids: List[str] = None) -> List[str]:
         if entry_ids is None:
-            ids_to_evaluate = get_entry_ids(type_id, table_id)
+            ids_to_evaluate = self.parameter_table.entry_ids(type_id, table_id)
         else:
-            ids_available = get_entry_ids(type_id, table_id)
+            ids_available = self.parameter_table.entry_ids(type_id, table_id)
             len_ei = len(entry_ids)
             ids_ok = any(entry_ids == ids_available[i:len_ei + i] for i in range(len(ids_available) - len_ei + 1))
             if not ids_ok:
@@ -595,30 +968,177 @@ class Coordinator:
                     f"Not all stimuli ids {entry_ids} are available in \"{self.qoeval_config.parameter_file.get()}\"")
             ids_to_evaluate = entry_ids
 
-        # ids_to_evaluate =  ['1'] #,'5','4','3','2','1']
-
         if ids_to_evaluate is None or len(ids_to_evaluate) < 1:
             raise RuntimeError(f"No Stimuli-IDs to evaluate for {type_id}-{table_id} - "
                                f"check parameter file \"{self.qoeval_config.parameter_file.get()}\"")
+        return ids_to_evaluate
+
+    def start_batch(self, stimuli: List[Tuple[str, str, str]], generate_stimuli: bool = True,
+                    postprocessing: bool = True, overwrite: bool = False,
+                    postprocessing_workers: int = None) -> List[str]:
+        """
+        Processes stimuli of several tables in one run.
+
+        The parameter file is loaded and the tables are exported only once. Stimuli which require the same device
+        setup (orientation and Play Store setting, see get_device_setup) are processed one after another, so that
+        the device does not need to be re-configured between them (if CoordinatorDeviceSession is enabled, it is not
+        even restarted). Otherwise, the given order is kept. If processing a table fails, the remaining tables are
+        processed nevertheless.
+
+        Parameter
+        ----------
+        stimuli : List[Tuple[str, str, str]]
+            (type_id, table_id, entry_id) of all stimuli to be processed, e.g. [("VS", "A", "1"), ("AL", "D", "2")]
+        generate_stimuli : bool
+            Specify if new stimuli should be generated/recorded
+        postprocessing : bool
+            Specify if postprocessing should be applied
+        overwrite : bool
+            Process stimuli even if they are already available
+        postprocessing_workers : int
+            Number of threads post-processing already recorded stimuli while the next ones are recorded,
+            0 to record all stimuli before post-processing them (default: CoordinatorPostprocessingWorkers)
+
+        Returns
+        -------
+        List[str]
+            Tables ("{type_id}-{table_id}") which could not be processed completely
+        """
+        self._load_parameter_table()
 
+        batches = self._group_by_device_setup(stimuli)
+        if len(batches) < 1:
+            raise RuntimeError(f"No Stimuli-IDs to evaluate - "
+                               f"check parameter file \"{self.qoeval_config.parameter_file.get()}\"")
+        for type_id, table_id, entry_ids in batches:
+            missing_ids = [entry_id for entry_id in entry_ids
+                           if entry_id not in self.parameter_table.entry_ids(type_id, table_id)]
+            if missing_ids:
+                raise RuntimeError(f"Stimuli ids {missing_ids} of {type_id}-{table_id} are not available in "
+                                   f"\"{self.qoeval_config.parameter_file.get()}\"")
+        self.parameter_table.export_tables(self.qoeval_config.video_capture_path.get(),
+                                           [(type_id, table_id) for type_id, table_id, _ in batches])
+
+        if postprocessing_workers is None:
+            postprocessing_workers = self.qoeval_config.coordinator_postprocessing_workers.get()
+        is_pipelined = generate_stimuli and postprocessing and postprocessing_workers > 0
+
+        failed_tables = []
         try:
-            if generate_stimuli:
-                self._generate_stimuli(type_id, table_id, ids_to_evaluate, overwrite)
+            # stimuli of all tables are recorded before post-processing, so the device setup is changed rarely
+            if is_pipelined:
+                self._process_batches(batches, failed_tables, lambda type_id, table_id, entry_ids: self._run_pipelined(
+                    type_id, table_id, entry_ids, postprocessing_workers, overwrite))
+            else:
+                if generate_stimuli:
+                    self._process_batches(batches, failed_tables, lambda type_id, table_id, entry_ids:
+                                          self._generate_stimuli(type_id, table_id, entry_ids, overwrite))
+                if postprocessing:
+                    self._process_batches(batches, failed_tables, lambda type_id, table_id, entry_ids:
+                                          self._perform_postprocessing(type_id, table_id, entry_ids, overwrite))
+
+            self._process_batches([batch for batch in batches if batch[0] == "VSB"], failed_tables,
+                                  lambda type_id, table_id, entry_ids:
+                                  self._add_generated_buffering(type_id, table_id, entry_ids, overwrite))
+        finally:
+            self._end_device_session()
+        if failed_tables:
+            print(f"Processing failed for: {', '.join(failed_tables)}")
+        return failed_tables
+
+    def generate(self, type_id: str, table_id: str, entry_ids: List[str], overwrite: bool = False,
+                 max_retries: int = MAX_RETRIES) -> CampaignPlan:
+        """
+        Generates the stimuli (P0) of the given entries of one table
 
-            if postprocessing:
-                self._perform_postprocessing(type_id, table_id, ids_to_evaluate, overwrite)
+        Only one entry of each group of alternative entries is recorded, the recording is linked to the others (see
+        plan_campaign). Used by the CampaignScheduler and the workers of a distributed campaign, which retry failed
+        entries on any device themselves (max_retries=0).
 
-            if type_id == "VSB":
-                self._add_generated_buffering(type_id, table_id, ids_to_evaluate, overwrite)
-
-        except RuntimeError as err:
-            traceback.print_exc()
-            print(
-                "*****************************************************************************************************")
-            print(f"RuntimeError occured: {err}")
-            print(f"Coordinated qoeval run canceled.")
-            print(
-                "*****************************************************************************************************")
+        Parameter
+        ----------
+        type_id : str
+            Specifies parameter stimuli type id, e.g. "VS"
+        table_id : str
+            Specifies parameter stimuli table id, e.g. "A"
+        entry_ids : List[str]
+            Entries to be generated
+        overwrite : bool
+            Generate stimuli even if they (or alternatives) are already available
+        max_retries : int
+            Number of retries of a failing recording on this device
+
+        Returns
+        -------
+        CampaignPlan
+            The recordings which have been made and the entries linked to them
+        """
+        self._load_parameter_table()
+        return self._generate_stimuli(type_id, table_id, entry_ids, overwrite, max_retries)
+
+    def postprocess(self, type_id: str, table_id: str, entry_id: str, overwrite: bool = False):
+        """
+        Post-processes (P1, for VSB also P2 and P3) a single recorded stimulus
+
+        Alternative entries (which re-use each other's results) are post-processed one after another, even if this is
+        called by several threads. Some failures are only recorded in the journal (see is_postprocessed), e.g. if the
+        start of the video playback cannot be detected.
+        """
+        self._load_parameter_table()
+        self._postprocess_entry_pipelined(type_id, table_id, entry_id,
+                                          self._get_group_lock(type_id, table_id, entry_id), overwrite)
+
+    def is_postprocessed(self, type_id: str, table_id: str, entry_id: str) -> bool:
+        """Returns True if all post-processing steps (P1, for VSB also P2 and P3) of the entry have been completed"""
+        is_completed = self.journal.is_completed(type_id, table_id, entry_id, "1")
+        if type_id != "VSB":
+            return is_completed
+        # a VSB entry might re-use the post-processed file of an alternative (see _postprocess_entry)
+        if not is_completed and get_stimuli_path(self.qoeval_config, self.parameter_table, type_id, table_id,
+                                                 entry_id, "1", True) is None:
+            return False
+        return all(self.journal.is_completed(type_id, table_id, entry_id, phase) for phase in ["2", "3"])
+
+    def close(self):
+        """Ends the device session (see CoordinatorDeviceSession) and closes the journal"""
+        self._end_device_session()
+        self.journal.close()
+
+    @staticmethod
+    def _process_batches(batches: List[Tuple[str, str, List[str]]], failed_tables: List[str],
+                         function: Callable[[str, str, List[str]], None]):
+        """Calls function for all batches of tables which have not failed before, failing tables are added"""
+        for type_id, table_id, entry_ids in batches:
+            table_name = f"{type_id}-{table_id}"
+            if table_name in failed_tables:
+                continue
+            try:
+                function(type_id, table_id, entry_ids)
+            except RuntimeError as err:
+                traceback.print_exc()
+                print("*********************************************************************************************"
+                      "********")
+                print(f"RuntimeError occured: {err}")
+                print(f"Coordinated qoeval run canceled for {table_name}.")
+                print("*********************************************************************************************"
+                      "********")
+                failed_tables.append(table_name)
+
+    @staticmethod
+    def _group_by_device_setup(stimuli: List[Tuple[str, str, str]]) -> List[Tuple[str, str, List[str]]]:
+        """
+        Combines the stimuli to (type_id, table_id, entry_ids) batches ordered by the required device setup
+
+        Setups and tables are ordered by their first appearance, entries keep their order within a table.
+        """
+        setups = {}
+        for type_id, table_id, entry_id in stimuli:
+            tables = setups.setdefault(get_device_setup(type_id), {})
+            entry_ids = tables.setdefault((type_id, table_id), [])
+            if str(entry_id) not in entry_ids:
+                entry_ids.append(str(entry_id))
+        return [(type_id, table_id, entry_ids) for tables in setups.values()
+                for (type_id, table_id), entry_ids in tables.items()]
 
 
 def main():
@@ -0,0 +1,373 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Cost model and ETA of campaigns
+
+The duration of each processing step (P0: recording, P1: post-processing, ...) of a stimulus is predicted from the
+timings of earlier stimuli ("{video_id}_timing.json" in the video capture path, see qoeval_pkg.timing). For each step
+and use-case type, the duration is modeled as a linear function of the excerpt length and of the inverse download
+bandwidth, fitted by least squares. If there are too few samples for a fit, the heuristic estimate (based on the
+capture duration, see planner.get_capture_duration) is scaled by the ratio observed for the samples available. The
+phases of a step (e.g. capture.record) are predicted by their average share of the step.
+
+A CampaignEstimate holds the predicted steps of a campaign. While the campaign runs, completed steps are reported to
+it, so that it can provide an ETA which is corrected by the progress observed so far.
+"""
+
+import glob
+import json
+import logging as log
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.errors import PermanentError
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.parser.parser import ParameterTable
+from qoeval_pkg.planner import estimate_capture_duration, plan_campaign, PlannedRecording, RECORDING_OVERHEAD
+from qoeval_pkg.timing import TIMING_FILE_SUFFIX, STATUS_COMPLETED
+from qoeval_pkg.uicontrol.usecase import UseCaseType, get_uc_type
+from qoeval_pkg.utils import convert_to_seconds, get_video_id
+
+COST_MODEL_MIN_SAMPLES = 5  # minimum number of samples of a step and use-case for fitting the linear model
+# duration of a step relative to the heuristic estimate of the recording if there are no samples of the step
+DEFAULT_STEP_FACTORS = {"0": 1.0, "1": 0.5, "2": 0.5, "3": 0.5}
+DOMINANT_PHASES = 3  # number of phases reported as dominating a campaign
+
+_VIDEO_ID_PATTERN = re.compile(r"^(?P<type_id>[^-_]+)-(?P<table_id>[^-_]+)-(?P<entry_id>[^_]+)_")
+
+
+@dataclass
+class StimulusFeatures:
+    """Parameters of a stimulus on which the processing durations depend"""
+    use_case: str  # name of the use-case type, e.g. "YOUTUBE"
+    excerpt_duration: float  # [s]
+    bandwidth: float  # download data rate [kbit/s]
+
+    def get_heuristic_duration(self) -> float:
+        """Returns the heuristic estimate [s] of the recording (see planner.get_capture_duration)"""
+        return estimate_capture_duration(self.excerpt_duration, UseCaseType[self.use_case]) + RECORDING_OVERHEAD
+
+
+def get_stimulus_features(parameter_table: ParameterTable, type_id: str, table_id: str,
+                          entry_id: str) -> Optional[StimulusFeatures]:
+    """Returns the features of the given entry or None if its parameters are invalid"""
+    try:
+        excerpt_duration = (convert_to_seconds(parameter_table.end(type_id, table_id, entry_id)) -
+                            convert_to_seconds(parameter_table.start(type_id, table_id, entry_id)))
+        bandwidth = float(parameter_table.parameters(type_id, table_id, entry_id)['rdl'])
+        return StimulusFeatures(get_uc_type(type_id).name, excerpt_duration, bandwidth)
+    except (ValueError, TypeError, KeyError, AttributeError, PermanentError):
+        return None
+
+
+@dataclass
+class TimingSample:
+    """Measured duration of a processing step of a stimulus"""
+    step: str
+    features: StimulusFeatures
+    duration: float  # [s]
+    phases: Dict[str, float] = field(default_factory=dict)  # phase: duration [s]
+
+
+def load_timing_samples(directory: str, parameter_table: ParameterTable = None) -> List[TimingSample]:
+    """
+        Loads the timings of all completed steps in the directory
+
+        Timings written before the features were recorded are only used if their entry is found in the parameter
+        table.
+        """
+    samples = []
+    for file_path in glob.glob(os.path.join(directory, f"*{TIMING_FILE_SUFFIX}")):
+        try:
+            with open(file_path) as f:
+                content = json.load(f)
+        except (OSError, ValueError) as err:
+            log.warning(f"Cannot read timing {file_path}: {err}")
+            continue
+        if content.get('status') != STATUS_COMPLETED or not content.get('duration'):
+            continue
+        features = None
+        if content.get('features'):
+            try:
+                features = StimulusFeatures(**content['features'])
+            except TypeError:
+                features = None
+            if features is not None and features.use_case not in UseCaseType.__members__:
+                features = None
+        elif parameter_table is not None:
+            match = _VIDEO_ID_PATTERN.match(content.get('video_id', ""))
+            if match:
+                features = get_stimulus_features(parameter_table, match.group('type_id'), match.group('table_id'),
+                                                 match.group('entry_id'))
+        if features is None:
+            continue
+        samples.append(TimingSample(str(content.get('step')), features, float(content['duration']),
+                                    content.get('phases', {})))
+    return samples
+
+
+def _get_regressors(features: StimulusFeatures) -> List[float]:
+    return [1.0, features.excerpt_duration, 1000.0 / max(features.bandwidth, 1.0)]
+
+
+class CostModel:
+    """
+        Predicts the duration of the processing steps of stimuli
+
+        Attributes
+        ----------
+        samples : List[TimingSample]
+            Measured durations the model has been learned from
+        """
+
+    def __init__(self, samples: List[TimingSample]):
+        self.samples = samples
+        self._coefficients = {}  # (step, use_case): coefficients of the linear model
+        self._ratios = {}  # (step, use_case) or step: average ratio of the duration to the heuristic estimate
+        self._phase_shares = {}  # (step, use_case) or step: phase: share of the duration of the step
+        groups = {}
+        for sample in samples:
+            groups.setdefault((sample.step, sample.features.use_case), []).append(sample)
+            groups.setdefault(sample.step, []).append(sample)
+        for key, group in groups.items():
+            self._ratios[key] = (sum(sample.duration for sample in group) /
+                                 sum(sample.features.get_heuristic_duration() for sample in group))
+            total = sum(sample.duration for sample in group)
+            shares = {}
+            for sample in group:
+                for phase, duration in sample.phases.items():
+                    shares[phase] = shares.get(phase, 0.0) + duration / total
+            self._phase_shares[key] = shares
+            if isinstance(key, tuple) and len(group) >= COST_MODEL_MIN_SAMPLES:
+                regressors = np.array([_get_regressors(sample.features) for sample in group])
+                durations = np.array([sample.duration for sample in group])
+                self._coefficients[key] = np.linalg.lstsq(regressors, durations, rcond=None)[0]
+
+    @classmethod
+    def from_history(cls, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable = None) -> 'CostModel':
+        """Returns the model learned from the timings in the video capture path"""
+        samples = load_timing_samples(qoeval_config.video_capture_path.get(), parameter_table)
+        log.debug(f"Cost model learned from {len(samples)} timings")
+        return cls(samples)
+
+    def predict(self, features: StimulusFeatures, step: str) -> float:
+        """Returns the predicted duration [s] of the processing step of a stimulus with the given features"""
+        key = (step, features.use_case)
+        if key in self._coefficients:
+            duration = float(np.dot(self._coefficients[key], _get_regressors(features)))
+            # the linear model is not used for extrapolating to implausible durations
+            if duration > 0:
+                return duration
+        ratio = self._ratios.get(key, self._ratios.get(step, DEFAULT_STEP_FACTORS.get(step, 1.0)))
+        return ratio * features.get_heuristic_duration()
+
+    def predict_phases(self, features: StimulusFeatures, step: str) -> Dict[str, float]:
+        """Returns the predicted duration [s] of each phase of the processing step (empty if there are no samples)"""
+        duration = self.predict(features, step)
+        shares = self._phase_shares.get((step, features.use_case), self._phase_shares.get(step, {}))
+        return {phase: share * duration for phase, share in shares.items()}
+
+
+@dataclass
+class StepEstimate:
+    """Predicted duration of a processing step of a stimulus"""
+    video_id: str
+    type_id: str
+    table_id: str
+    entry_id: str
+    step: str
+    duration: float  # [s]
+    phases: Dict[str, float] = field(default_factory=dict)  # phase: duration [s]
+
+
+class CampaignEstimate:
+    """
+        Predicted duration of the steps of a campaign and its progress
+
+        Attributes
+        ----------
+        steps : List[StepEstimate]
+            Steps to be processed
+        workers : int
+            Number of devices working in parallel
+        """
+
+    def __init__(self, steps: List[StepEstimate], workers: int = 1):
+        self.steps = steps
+        self.workers = max(1, workers)
+        self.start_time = None
+        self._completed = set()  # video ids of the finished steps
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> float:
+        """Returns the sum [s] of the durations of all steps"""
+        return sum(step.duration for step in self.steps)
+
+    def get_stimulus_durations(self) -> Dict[Tuple[str, str, str], float]:
+        """Returns the predicted duration [s] of all steps of each stimulus (type_id, table_id, entry_id)"""
+        durations = {}
+        for step in self.steps:
+            key = (step.type_id, step.table_id, step.entry_id)
+            durations[key] = durations.get(key, 0.0) + step.duration
+        return durations
+
+    def get_wall_time(self) -> float:
+        """Returns the predicted wall-clock time [s] if the stimuli are distributed longest-first to the workers"""
+        loads = [0.0] * self.workers
+        for duration in sorted(self.get_stimulus_durations().values(), reverse=True):
+            loads[loads.index(min(loads))] += duration
+        return max(loads)
+
+    def get_dominant_phases(self, count: int = DOMINANT_PHASES) -> List[Tuple[str, float]]:
+        """Returns the phases with the longest total duration [s]"""
+        phases = {}
+        for step in self.steps:
+            for phase, duration in step.phases.items():
+                phases[phase] = phases.get(phase, 0.0) + duration
+        return sorted(phases.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def start(self):
+        self.start_time = time.time()
+
+    def complete(self, video_id: str):
+        """Records that a step has been finished (successfully or not)"""
+        with self._lock:
+            self._completed.add(video_id)
+
+    def update_from_journal(self, journal: CampaignJournal):
+        """Records the steps which have been completed in the journal (e.g. by another process)"""
+        completed = [step.video_id for step in self.steps
+                     if journal.is_completed(step.type_id, step.table_id, step.entry_id, step.step)]
+        with self._lock:
+            self._completed.update(completed)
+
+    def get_eta(self) -> float:
+        """
+            Returns the estimated time [s] until all steps have been finished
+
+            Once steps have been finished, the predicted duration of the remaining steps is scaled by the ratio of the
+            elapsed time to the predicted duration of the finished steps.
+            """
+        with self._lock:
+            finished = sum(step.duration for step in self.steps if step.video_id in self._completed)
+            remaining = sum(step.duration for step in self.steps if step.video_id not in self._completed)
+        if self.start_time is not None and finished > 0:
+            return remaining * (time.time() - self.start_time) / finished
+        return remaining / self.workers
+
+    def get_eta_str(self) -> str:
+        """Returns the ETA and the time of day at which all steps are finished, e.g. 0:12:00 (at 14:30)"""
+        eta = self.get_eta()
+        return f"{_format_duration(eta)} (at {time.strftime('%H:%M', time.localtime(time.time() + eta))})"
+
+    def get_progress(self) -> str:
+        with self._lock:
+            finished = sum(1 for step in self.steps if step.video_id in self._completed)
+        return f"{finished}/{len(self.steps)} steps finished - ETA {self.get_eta_str()}"
+
+    def __str__(self):
+        text = f"Estimated duration of {len(self.steps)} steps of {len(self.get_stimulus_durations())} stimuli: " \
+               f"{_format_duration(self.total)}"
+        if self.workers > 1:
+            text += f", wall-clock time with {self.workers} devices: {_format_duration(self.get_wall_time())}"
+        dominant_phases = self.get_dominant_phases()
+        if dominant_phases and self.total > 0:
+            text += " - dominating phases: " + ", ".join(f"{phase} {duration * 100.0 / self.total:.0f}%"
+                                                         for phase, duration in dominant_phases)
+        return text
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def estimate_campaign(cost_model: CostModel, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable,
+                      stimuli: List[Tuple[str, str, str]], generate_stimuli: bool = True, postprocessing: bool = True,
+                      overwrite: bool = False, workers: int = 1) -> CampaignEstimate:
+    """
+        Predicts the steps of a campaign which are not completed yet
+
+        Parameters
+        ----------
+        cost_model : CostModel
+            Model predicting the duration of the steps
+        qoeval_config : QoEvalConfiguration
+            Configuration of the campaign
+        parameter_table : ParameterTable
+            Parameter table holding the entries
+        stimuli : List[Tuple[str, str, str]]
+            (type_id, table_id, entry_id) of all stimuli to be processed
+        generate_stimuli : bool
+            Recordings are made
+        postprocessing : bool
+            The recordings are post-processed
+        overwrite : bool
+            Steps are processed even if they have been completed before
+        workers : int
+            Number of devices working in parallel
+
+        Returns
+        -------
+        CampaignEstimate
+            The predicted steps
+        """
+    journal = CampaignJournal(qoeval_config)
+    try:
+        recorded = set()  # stimuli which are recorded (and not linked to an alternative)
+        if generate_stimuli:
+            tables = {}
+            for type_id, table_id, entry_id in stimuli:
+                tables.setdefault((type_id, table_id), []).append(str(entry_id))
+            for (type_id, table_id), entry_ids in tables.items():
+                plan = plan_campaign(parameter_table, journal, type_id, table_id, entry_ids, overwrite)
+                recorded.update((type_id, table_id, recording.entry_id) for recording in plan.recordings
+                                if not recording.is_available)
+
+        steps = []
+        for type_id, table_id, entry_id in stimuli:
+            entry_id = str(entry_id)
+            features = get_stimulus_features(parameter_table, type_id, table_id, entry_id)
+            if features is None:
+                continue
+            stimulus_steps = ["0"] if (type_id, table_id, entry_id) in recorded else []
+            if postprocessing:
+                stimulus_steps += ["1", "2", "3"] if type_id == "VSB" else ["1"]
+            for step in stimulus_steps:
+                if step != "0" and not overwrite and journal.is_completed(type_id, table_id, entry_id, step):
+                    continue
+                steps.append(StepEstimate(get_video_id(qoeval_config, type_id, table_id, entry_id, step), type_id,
+                                          table_id, entry_id, step, cost_model.predict(features, step),
+                                          cost_model.predict_phases(features, step)))
+    finally:
+        journal.close()
+    return CampaignEstimate(steps, workers)
+
+
+def sort_longest_first(cost_model: CostModel, parameter_table: ParameterTable, type_id: str, table_id: str,
+                       recordings: List[PlannedRecording]) -> List[PlannedRecording]:
+    """
+        Returns the planned recordings ordered by their predicted duration, longest first
+
+        Workers taking the recordings in this order finish close together. Available recordings (which are only
+        linked) are put last.
+        """
+    def get_duration(recording: PlannedRecording) -> float:
+        features = get_stimulus_features(parameter_table, type_id, table_id, recording.entry_id)
+        if recording.is_available or features is None:
+            return 0.0
+        return cost_model.predict(features, "0")
+
+    return sorted(recordings, key=get_duration, reverse=True)
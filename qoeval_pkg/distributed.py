@@ -0,0 +1,273 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Distributed generation of stimuli by several worker processes
+
+distribute_campaign publishes the recordings (one job per group of alternative entries, see plan_campaign) and the
+post-processing (one job per group of entries re-using each other's post-processing results) of a campaign to the
+JobQueue in the video capture path. Worker processes ("qoeval worker", see QueueWorker), e.g. one per capture host or
+device, claim and run the jobs. All processes must use the same video capture path and parameter file - on several
+hosts, a network file system with POSIX file locks (see JobQueue). A post-processing job is only claimed after the
+recordings it depends on have been completed. A job is only regarded as completed if the journal holds all of its
+steps as completed. The recordings are published longest first (as predicted by the CostModel), so that the workers
+finish close together.
+"""
+
+import logging as log
+import os
+import socket
+import threading
+import time
+import traceback
+from typing import List
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.coordinator import Coordinator, MAX_RETRIES
+from qoeval_pkg.cost_model import CampaignEstimate, CostModel, sort_longest_first
+from qoeval_pkg.job_queue import JobQueue, Job, JOB_GENERATE, JOB_POSTPROCESS, STATUS_COMPLETED, STATUS_FAILED, \
+    STATUS_LEASED, STATUS_QUEUED
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.parser.parser import ParameterTable
+from qoeval_pkg.planner import plan_campaign
+from qoeval_pkg.retry import RetryPolicy
+from qoeval_pkg.scheduler import CampaignSummary
+from qoeval_pkg.utils import get_video_id
+
+QUEUE_POLL_INTERVAL = 2.0  # time between two attempts of a worker to claim a job and between progress reports [s]
+HEARTBEATS_PER_LEASE = 4  # number of heartbeats sent by a worker within the lease duration
+
+
+def distribute_campaign(qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable, type_id: str,
+                        table_id: str, entry_ids: List[str] = None, overwrite: bool = False,
+                        generate_stimuli: bool = True, postprocessing: bool = True,
+                        estimate: CampaignEstimate = None) -> CampaignSummary:
+    """
+        Publishes the jobs of a campaign and blocks until the workers have processed all of them
+
+        Parameters
+        ----------
+        qoeval_config : QoEvalConfiguration
+            Configuration of the campaign (its video capture path holds the job queue)
+        parameter_table : ParameterTable
+            Parameter table holding the entries to be processed
+        type_id : str
+            Type of the stimuli, e.g. "VS"
+        table_id : str
+            Table of the stimuli, e.g. "A"
+        entry_ids : List[str], optional
+            Entries to be processed, all entries of the table if not given
+        overwrite : bool
+            Process stimuli even if they are already available
+        generate_stimuli : bool
+            Publish the recordings of the stimuli
+        postprocessing : bool
+            Publish the post-processing (for VSB including the generated buffering) of the stimuli
+        estimate : CampaignEstimate, optional
+            Estimate of the campaign, its ETA is reported with the progress
+
+        Returns
+        -------
+        CampaignSummary
+            Number of generated, skipped and failed stimuli and the achieved throughput
+        """
+    if entry_ids is None:
+        entry_ids = parameter_table.entry_ids(type_id, table_id)
+    if len(entry_ids) < 1:
+        raise RuntimeError(f"No Stimuli-IDs to evaluate for {type_id}-{table_id}")
+    entry_ids = [str(entry_id) for entry_id in entry_ids]
+
+    # exported once, before the workers start, so that they do not write the same files concurrently
+    parameter_table.export_tables(qoeval_config.video_capture_path.get(), [(type_id, table_id)])
+
+    summary = CampaignSummary()
+    start_time = time.time()
+    campaign = f"{type_id}-{table_id}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    queue = JobQueue(qoeval_config)
+    journal = CampaignJournal(qoeval_config)
+    try:
+        generate_jobs = {}  # entry id: id of the job recording it
+        recordings = {}  # job id: recording planned for the job
+        if generate_stimuli:
+            plan = plan_campaign(parameter_table, journal, type_id, table_id, entry_ids, overwrite)
+            print(plan)
+            summary.skipped = len(plan.skipped_ids)
+            # jobs are claimed in the order of publishing
+            cost_model = CostModel.from_history(qoeval_config, parameter_table)
+            for recording in sort_longest_first(cost_model, parameter_table, type_id, table_id, plan.recordings):
+                group = ([] if recording.is_available else [recording.entry_id]) + recording.linked_entry_ids
+                job_id = queue.publish(campaign, JOB_GENERATE, type_id, table_id, group, overwrite,
+                                       max_attempts=MAX_RETRIES + 1)
+                generate_jobs.update((entry_id, job_id) for entry_id in group)
+                recordings[job_id] = recording
+
+        if postprocessing:
+            for group in _get_postprocessing_groups(parameter_table, type_id, table_id, entry_ids):
+                depends_on = sorted(set(generate_jobs[entry_id] for entry_id in group if entry_id in generate_jobs))
+                queue.publish(campaign, JOB_POSTPROCESS, type_id, table_id, group, overwrite, depends_on,
+                              max_attempts=MAX_RETRIES + 1)
+
+        log.info(f"Published campaign {campaign} to {queue.file_path}")
+        print(f"Published campaign {campaign} - waiting for workers (start them by \"qoeval worker\")")
+        if estimate:
+            estimate.start()
+        counts = queue.counts(campaign)
+        while counts.get(STATUS_QUEUED, 0) + counts.get(STATUS_LEASED, 0) > 0:
+            progress = ""
+            if estimate:
+                estimate.update_from_journal(journal)
+                progress = f" - {estimate.get_progress()}"
+            print(f"Campaign {campaign}: {counts.get(STATUS_QUEUED, 0)} jobs queued, "
+                  f"{counts.get(STATUS_LEASED, 0)} running, {counts.get(STATUS_COMPLETED, 0)} completed, "
+                  f"{counts.get(STATUS_FAILED, 0)} failed{progress}")
+            time.sleep(QUEUE_POLL_INTERVAL)
+            counts = queue.counts(campaign)
+
+        for job in queue.jobs(campaign, STATUS_COMPLETED):
+            if job.kind == JOB_GENERATE:
+                # an available recording has only been linked to its alternatives
+                summary.generated += 0 if recordings[job.job_id].is_available else 1
+                summary.linked += len(recordings[job.job_id].linked_entry_ids)
+        failed_ids = []
+        for job in queue.jobs(campaign, STATUS_FAILED):
+            failed_ids.extend(entry_id for entry_id in job.entry_ids if entry_id not in failed_ids)
+        summary.failed_ids = [get_video_id(qoeval_config, type_id, table_id, entry_id) for entry_id in failed_ids]
+    finally:
+        queue.close()
+        journal.close()
+    summary.duration = time.time() - start_time
+    log.info(f"Campaign {campaign} finished: {summary}")
+    print(summary)
+    return summary
+
+
+def _get_postprocessing_groups(parameter_table: ParameterTable, type_id: str, table_id: str,
+                               entry_ids: List[str]) -> List[List[str]]:
+    """Returns the entries to be post-processed, entries re-using each other's results are combined in one group"""
+    alternative_groups = parameter_table.query().alternative_groups(type_id, table_id, "1")
+    table_entry_ids = parameter_table.query().filter(type_id=type_id, table_id=table_id)['entry_id']
+    entry_groups = {str(entry_id): group for entry_id, group in zip(table_entry_ids, alternative_groups)}
+    groups = {}
+    for entry_id in entry_ids:
+        # an entry with invalid parameters is not grouped (post-processing it will fail anyway)
+        groups.setdefault(entry_groups.get(entry_id, f"entry {entry_id}"), []).append(entry_id)
+    return list(groups.values())
+
+
+class QueueWorker:
+    """
+        Worker process claiming and running the jobs of the JobQueue
+
+        The worker owns one Coordinator (and therefore one device, capture and network emulation connection). While a
+        job runs, its lease is renewed by a heartbeat thread. A failed job is returned to the queue (to be retried by
+        any worker) according to the retry policy of the configuration.
+
+        Attributes
+        ----------
+        qoeval_config : QoEvalConfiguration
+            Configuration of the worker (e.g. selecting its device)
+        parameter_table : ParameterTable
+            Parameter table of the campaigns
+        name : str
+            Name of the worker, must be unique among all workers of the queue
+        """
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable, name: str = None):
+        self.qoeval_config = qoeval_config
+        self.parameter_table = parameter_table
+        self.name = name if name else f"{socket.gethostname()}-{os.getpid()}"
+        self.retry_policy = RetryPolicy(MAX_RETRIES, qoeval_config.coordinator_retry_delay.get(),
+                                        qoeval_config.coordinator_retry_max_delay.get())
+        self.queue = JobQueue(qoeval_config)
+        self.coordinator = Coordinator(qoeval_config, parameter_table, name=self.name)
+
+    def run(self, follow: bool = False) -> int:
+        """
+            Processes jobs until the queue does not hold any open jobs (or forever if follow is set)
+
+            Returns
+            -------
+            int
+                Number of jobs processed successfully
+            """
+        completed = 0
+        log.info(f"Worker {self.name} started on queue {self.queue.file_path}")
+        try:
+            while True:
+                job = self.queue.claim(self.name)
+                if job is None:
+                    # jobs of other workers might fail and be re-queued, or depend on jobs still running
+                    if not follow and self.queue.is_finished():
+                        break
+                    time.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+                if self._run_job(job):
+                    completed += 1
+        finally:
+            self.coordinator.close()
+            self.queue.close()
+        log.info(f"Worker {self.name} finished after completing {completed} jobs")
+        return completed
+
+    def _run_job(self, job: Job) -> bool:
+        print(f"Worker {self.name}: {job.kind} {job.type_id}-{job.table_id} {job.entry_ids} "
+              f"(job {job.job_id}, attempt {job.attempts})")
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._send_heartbeats, args=(job, stop_heartbeat),
+                                     name=f"heartbeat{job.job_id}", daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            if job.kind == JOB_GENERATE:
+                # retries are handled by the queue, so that another worker can retry the entries
+                self.coordinator.generate(job.type_id, job.table_id, job.entry_ids, job.overwrite, max_retries=0)
+            elif job.kind == JOB_POSTPROCESS:
+                for entry_id in job.entry_ids:
+                    self.coordinator.postprocess(job.type_id, job.table_id, entry_id, job.overwrite)
+            else:
+                raise RuntimeError(f"Unknown job type {job.kind} of job {job.job_id}")
+        except Exception as err:
+            traceback.print_exc()
+            log.error(f"Worker {self.name} failed to run job {job.job_id}: {err}")
+            error = err
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        if error is None:
+            # a failing step might only be recorded in the journal (e.g. if the video playback was not detected)
+            incomplete_ids = self._get_incomplete_ids(job)
+            if incomplete_ids:
+                error = RuntimeError(f"Job {job.job_id} did not complete {', '.join(incomplete_ids)}")
+                log.error(f"Worker {self.name} failed to run job {job.job_id}: {error}")
+
+        if error is None:
+            if not self.queue.complete(job.job_id, self.name):
+                log.warning(f"Worker {self.name} lost the lease on job {job.job_id}, its result is not recorded")
+                return False
+            return True
+        retry_counter = job.attempts - 1
+        if self.retry_policy.should_retry(error, retry_counter):
+            self.queue.fail(job.job_id, self.name, error, self.retry_policy.get_delay(retry_counter))
+        else:
+            self.queue.fail(job.job_id, self.name, error)
+        return False
+
+    def _get_incomplete_ids(self, job: Job) -> List[str]:
+        """Returns the stimuli of the job which have not been completed according to the journal"""
+        if job.kind == JOB_GENERATE:
+            return [get_video_id(self.qoeval_config, job.type_id, job.table_id, entry_id, "0")
+                    for entry_id in job.entry_ids
+                    if not self.coordinator.journal.is_completed(job.type_id, job.table_id, entry_id, "0")]
+        return [get_video_id(self.qoeval_config, job.type_id, job.table_id, entry_id, "1")
+                for entry_id in job.entry_ids
+                if not self.coordinator.is_postprocessed(job.type_id, job.table_id, entry_id)]
+
+    def _send_heartbeats(self, job: Job, stop: threading.Event):
+        while not stop.wait(self.queue.lease_duration / HEARTBEATS_PER_LEASE):
+            if not self.queue.heartbeat(job.job_id, self.name):
+                log.warning(f"Worker {self.name} lost the lease on job {job.job_id}")
+                return
@@ -136,7 +136,7 @@ class GenymotionEmulator(MobileDevice):
 
     def get_ip_address(self) -> ipaddress:
         output = subprocess.run(shlex.split(
-            f"{adb_name()} shell ifconfig wlan0"),
+            f"{adb_name(self.qoeval_config)} shell ifconfig wlan0"),
             stdout=subprocess.PIPE,
             universal_newlines=True)
         # log.debug(output.stdout)
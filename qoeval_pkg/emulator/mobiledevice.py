@@ -19,6 +19,7 @@ import socket
 import time
 
 from qoeval_pkg.configuration import MobileDeviceOrientation, QoEvalConfiguration
+from qoeval_pkg.errors import TransientError, PHASE_DEVICE
 
 
 def adb_name(qoeval_config: QoEvalConfiguration):
@@ -53,6 +54,8 @@ class MobileDevice:
         self.config = None
         self.envOk = False
         self.ip_address = None
+        # (orientation, playstore) of the running device if a session is active, see launch_session
+        self._session_setup = None
 
     def check_env(self):
         """Checks if the environment is prepared to execute the emulator. Needs to be overriden by subclasses."""
@@ -203,7 +206,7 @@ class MobileDevice:
             log.debug(f"measured RTT avg: {avg_delay}ms  min: {match.group(1)}ms   max: {match.group(3)}ms")
         else:
             log.error(output.stdout)
-            raise RuntimeError("Measuring RTT failed.")
+            raise TransientError("Measuring RTT failed.", PHASE_DEVICE)
         return float(avg_delay)
 
     def generate_udp_traffic(self, packet_size: int = 128, packet_rate=10, duration: float = 10, port: int = 4711):
@@ -241,3 +244,60 @@ class MobileDevice:
         Shutdown the device
         """
         log.error("Shutting down the emulator is not implemented for the Emulator base class")
+
+    def is_session_active(self) -> bool:
+        return self._session_setup is not None
+
+    def launch_session(self, orientation=MobileDeviceOrientation.PORTRAIT, playstore=None):
+        """
+        Launch the device for a session of several stimuli or re-use the device which is already running
+
+        The running device is only re-launched if the orientation or the playstore setting changes or if it fails
+        the health check. Otherwise, it is only reset to a defined state.
+
+        :param orientation: Orientation to be used
+        :param playstore: should the playstore be enabled? (None: default setting of the device)
+        :return:
+        """
+        session_setup = (orientation, playstore)
+        if self._session_setup is not None:
+            if self._session_setup == session_setup and self.is_healthy():
+                log.debug("Re-using the running device of the session")
+                self.reset()
+                return
+            log.info("Device setup changed or device is not healthy - re-launching device")
+            self.end_session()
+        if playstore is None:
+            self.launch(orientation=orientation)
+        else:
+            self.launch(orientation=orientation, playstore=playstore)
+        self._session_setup = session_setup
+
+    def end_session(self):
+        """
+        Shutdown the device of the session (if a session is active)
+        """
+        if self._session_setup is not None:
+            self._session_setup = None
+            self.shutdown()
+
+    def is_healthy(self) -> bool:
+        """
+        Checks if the device is still connected via adb and has a valid ip address
+        """
+        output = subprocess.run(shlex.split(f"{adb_name(self.qoeval_config)} get-state"), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+        if output.returncode != 0 or output.stdout.strip() != "device":
+            log.warning(f"Device health check failed - adb state: {output.stdout.strip()} {output.stderr.strip()}")
+            return False
+        if self.get_ip_address() is None:
+            log.warning("Device health check failed - device has no ip address")
+            return False
+        return True
+
+    def reset(self):
+        """
+        Cheap reset of a running device between two stimuli: unlock the device and return to the home screen
+        """
+        self.unlock_device()
+        self.input_keyevent(3)  # HOME
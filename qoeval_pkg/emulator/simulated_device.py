@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+"""
+    Simulated mobile device
+
+    Used to run campaigns without an emulator or a physical device (see qoeval --simulate), e.g. to test the
+    orchestration of the coordinator or to benchmark the software pipeline itself.
+"""
+import ipaddress
+import itertools
+import logging as log
+import threading
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.emulator.mobiledevice import MobileDevice, MobileDeviceOrientation
+from qoeval_pkg.netem.netem import get_simulated_delay
+
+SIMULATED_RTT = 20.0  # RTT [ms] of the simulated device without network emulation
+SIMULATED_PROCESSING_DELAY = 3.0  # additional delay [ms] of a packet passing the emulated network
+SIMULATED_IP_ADDRESS = ipaddress.ip_address("10.0.2.15")  # ip address of the first simulated device
+
+_device_counter = itertools.count()
+_device_counter_lock = threading.Lock()
+
+
+class SimulatedDevice(MobileDevice):
+    def __init__(self, qoeval_config: QoEvalConfiguration):
+        super().__init__(qoeval_config)
+        # each simulated device has its own ip address, so that several devices can be simulated in parallel
+        with _device_counter_lock:
+            self.ip_address = SIMULATED_IP_ADDRESS + next(_device_counter)
+        self._orientation = MobileDeviceOrientation.PORTRAIT
+        self._is_running = False
+
+    def is_device_available(self, name: str) -> bool:
+        return True
+
+    def is_template_available(self, name: str) -> bool:
+        return True
+
+    def is_device_ready(self, name: str) -> bool:
+        return self._is_running
+
+    def get_orientation(self) -> MobileDeviceOrientation:
+        return self._orientation
+
+    def set_orientation(self, orientation: MobileDeviceOrientation):
+        self._orientation = orientation
+
+    def input_keyevent(self, keyevent: int):
+        log.debug(f"simulated device: key event {keyevent}")
+
+    def get_ip_address(self) -> ipaddress:
+        return self.ip_address
+
+    def measure_rtt(self) -> float:
+        delay = get_simulated_delay(self.ip_address)
+        if delay > 0:
+            return SIMULATED_RTT + delay + SIMULATED_PROCESSING_DELAY
+        return SIMULATED_RTT
+
+    def generate_udp_traffic(self, packet_size: int = 128, packet_rate=10, duration: float = 10, port: int = 4711):
+        pass
+
+    def launch(self, orientation=MobileDeviceOrientation.PORTRAIT, playstore=False):
+        log.info(f"Launching simulated device {self.ip_address} (orientation: {orientation.value})")
+        self._orientation = orientation
+        self._is_running = True
+
+    def shutdown(self):
+        log.info(f"Shutting down simulated device {self.ip_address}")
+        self._is_running = False
+
+    def is_healthy(self) -> bool:
+        return self._is_running
+
+    def reset(self):
+        pass
@@ -7,7 +7,9 @@
 """
     Emulator control for the emulator which is part of the standard Android SDK
 """
+import re
 import time
+from typing import Optional
 
 from qoeval_pkg.emulator.mobiledevice import check_ext, MobileDevice, MobileDeviceOrientation, adb_name
 from qoeval_pkg.configuration import QoEvalConfiguration
@@ -28,6 +30,17 @@ VD_MANAGER_NAME = "avdmanager"
 SDK_MANAGER_NAME = "sdkmanager"
 
 
+def get_vd_name(qoeval_config: QoEvalConfiguration) -> str:
+    """Returns the name of the AVD (option AVDName, default: VD_NAME)"""
+    return qoeval_config.vd_name.get() if qoeval_config.vd_name.get() else VD_NAME
+
+
+def get_emulator_port(qoeval_config: QoEvalConfiguration) -> Optional[int]:
+    """Returns the console port of the emulator given by AdbDeviceSerial ("emulator-<port>"), None if not given"""
+    match = re.fullmatch(r"emulator-(\d+)", qoeval_config.adb_device_serial.get())
+    return int(match.group(1)) if match else None
+
+
 def avd_ini_file(qoeval_config: QoEvalConfiguration):
     return f"{qoeval_config.vd_path.get()}/config.ini"
 
@@ -42,7 +55,8 @@ def is_avd_config_readable(qoeval_config: QoEvalConfiguration) -> bool:
 class StandardEmulator(MobileDevice):
     def __init__(self, qoeval_config: QoEvalConfiguration):
         super().__init__(qoeval_config)
-        self.vd_name = VD_NAME
+        # devices used in parallel have AVDs of their own
+        self.vd_name = get_vd_name(qoeval_config)
 
     def __write_avd_config(self):
         log.debug("Writing updated AVD config file")
@@ -216,8 +230,11 @@ class StandardEmulator(MobileDevice):
             self.create_device(playstore=playstore)
         if not self.is_acceleration_available():
             log.warning("Accelerated emulation is NOT available, emulation will be too slow.")
+        port = get_emulator_port(self.qoeval_config)
+        # started on the port of its serial, so that adb (and the capture) select this emulator
+        port_option = f"-port {port} " if port else ""
         output = subprocess.Popen(shlex.split(
-            f"{EMU_NAME} -avd {self.vd_name} -accel auto -gpu host "),
+            f"{EMU_NAME} -avd {self.vd_name} {port_option}-accel auto -gpu host "),
             stdout=subprocess.PIPE,
             universal_newlines=True)
         while output.poll() is None and self.get_ip_address() is None:
@@ -0,0 +1,40 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Classified errors raised while generating stimuli
+
+Both error classes are RuntimeErrors, so code catching RuntimeError keeps working. The class decides if generating a
+stimulus is retried (see qoeval_pkg.retry.RetryPolicy), the phase from which the retry starts.
+"""
+
+# phases of the recording of a stimulus - a retry restarts from the phase in which the error occurred
+PHASE_DEVICE = "device"  # launching the device and measuring the delay bias
+PHASE_USE_CASE = "use-case"  # setting up the network emulation and preparing the use-case
+PHASE_EXECUTE = "execute"  # sanity check of the network emulation and recording
+
+
+class StimulusError(RuntimeError):
+    """
+        Error while generating a stimulus
+
+        Attributes
+        ----------
+        phase : str
+            Phase from which a retry has to restart (PHASE_DEVICE, PHASE_USE_CASE, PHASE_EXECUTE), None: unknown
+        """
+
+    def __init__(self, message: str, phase: str = None):
+        super().__init__(message)
+        self.phase = phase
+
+
+class PermanentError(StimulusError):
+    """Error which will occur again if retried, e.g. invalid parameters, an invalid URL or a missing view"""
+
+
+class TransientError(StimulusError):
+    """Error which might not occur again if retried, e.g. a failed RTT measurement or a device which is not ready"""
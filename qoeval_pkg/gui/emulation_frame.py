@@ -54,6 +54,11 @@ class EmulationFrame(tk.Frame):
                                                     config_variable=self.gui.qoeval_config.show_device_frame)
         self.show_device_frame_frame.pack(fill=tk.BOTH, expand=False, side="top", padx=5, pady=2)
 
+        # CaptureEarlyStop
+        self.capture_early_stop_frame = BooleanFrame(self, self.gui,
+                                                     config_variable=self.gui.qoeval_config.capture_early_stop)
+        self.capture_early_stop_frame.pack(fill=tk.BOTH, expand=False, side="top", padx=5, pady=2)
+
         # ShowDeviceScreenMirrorFrame
         self.show_device_screen_mirror_frame = BooleanFrame(self, self.gui,
                                                             config_variable=self.gui.qoeval_config.show_device_screen_mirror)
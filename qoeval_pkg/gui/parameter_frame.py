@@ -14,7 +14,7 @@ import tkinter.ttk as ttk
 from tkinter.filedialog import askopenfilename
 from qoeval_pkg.configuration import QoEvalConfiguration
 import qoeval_pkg
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
 if TYPE_CHECKING:
     from qoeval_pkg.gui.gui import Gui
 
@@ -32,6 +32,8 @@ class ParameterFrame(tk.Frame):
         self.gui: Gui = gui
 
         self.gui.updatable_elements.append(self)
+        # snapshot of the currently opened parameter file (replaced as a whole when a file is opened)
+        self.parameter_table: Optional[parser.ParameterTable] = None
 
         # buttons
         self.button_frame = tk.Frame(self, background="#DCDCDC", bd=1, relief="sunken")
@@ -104,7 +106,7 @@ class ParameterFrame(tk.Frame):
     def open_file(self, filename, path_from_config=False):
         """Open a file and update the treeview"""
         try:
-            parser.load_parameter_file(filename)
+            parameter_table = parser.load_parameter_file(filename)
         except FileNotFoundError:
             self.gui.qoeval_config.parameter_file.set(self.parameter_file.get())
             if path_from_config:
@@ -113,6 +115,13 @@ class ParameterFrame(tk.Frame):
             else:
                 messagebox.showerror(f"Error", f"Parameter file \"{filename}\" not found")
             return
+        except RuntimeError as err:
+            # malformed structured (.json) parameter file
+            self.gui.qoeval_config.parameter_file.set(self.parameter_file.get())
+            messagebox.showerror(f"Error", f"Parameter file \"{filename}\" cannot be loaded:\n{err}")
+            return
+
+        self.parameter_table = parameter_table
 
         if filename != self.gui.qoeval_config.parameter_file.get():
             self.gui.qoeval_config.parameter_file.set(filename)
@@ -121,21 +130,25 @@ class ParameterFrame(tk.Frame):
         for i in self.tree.get_children():
             self.tree.delete(i)
 
-        for i, type_id in enumerate(parser.get_type_ids()):
+        for i, type_id in enumerate(parameter_table.type_ids()):
             try:  # in case the entry already exists we get a tk.TclError
                 self.tree.insert(parent="", index=i, text=type_id, iid=type_id)
             except tk.TclError:
                 pass
-            for j, table_id in enumerate(parser.get_table_ids(type_id)):
+            for j, table_id in enumerate(parameter_table.table_ids(type_id)):
                 try:  # in case the entry already exists we get a tk.TclError
                     self.tree.insert(parent=type_id, index=j, text=table_id, iid=f"{type_id}:{table_id}")
                 except tk.TclError:
                     pass
-                for k in parser.get_entry_ids(type_id, table_id):
-                    data = list(parser.get_parameters(type_id, table_id, k).values())
-                    data.extend([parser.get_link(type_id, table_id, k),
-                                 parser.get_start(type_id, table_id, k),
-                                 parser.get_end(type_id, table_id, k)])
+                for k in parameter_table.entry_ids(type_id, table_id):
+                    try:
+                        data = list(parameter_table.parameters(type_id, table_id, k).values())
+                    except ValueError:
+                        # entries with invalid parameters cannot be recorded, they are listed in the warning below
+                        continue
+                    data.extend([parameter_table.link(type_id, table_id, k),
+                                 parameter_table.start(type_id, table_id, k),
+                                 parameter_table.end(type_id, table_id, k)])
                     try:  # in case the entry already exists we get a tk.TclError
                         self.tree.insert(parent=f"{type_id}:{table_id}", text=k, index=k,
                                          iid=f"{type_id}:{table_id}:{k}",
@@ -164,6 +177,10 @@ class ParameterFrame(tk.Frame):
                 self.tree.item(f"{type_id}", tags=['checked'])
 
         self.parameter_file.set(self.gui.qoeval_config.parameter_file.get())
+        if not parameter_table.is_correct():
+            messagebox.showwarning(f"Warning", f"Parameter file \"{filename}\" is not fully parsable - entries with "
+                                               f"invalid parameters are not shown:\n"
+                                               + "\n".join(parameter_table.errors))
         return
 
     def get_checked_entries(self):
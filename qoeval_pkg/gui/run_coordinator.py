@@ -5,27 +5,24 @@
 # License:  LGPL 3.0 - see LICENSE file for details
 from qoeval_pkg.configuration import *
 from qoeval_pkg.coordinator import Coordinator
+from qoeval_pkg.parser.parser import load_parameter_file
 
 
 def main():
     """Loads the current GUI config and starts the coordinator with its options"""
     qoeval_config = QoEvalConfiguration()
     qoeval_config.read_from_file(qoeval_config.gui_current_config_file.get())
-    coord = Coordinator(qoeval_config)
+    coord = Coordinator(qoeval_config, load_parameter_file(qoeval_config.parameter_file.get()))
 
-    if qoeval_config.coordinator_generate_stimuli.get():
-        for entry in qoeval_config.gui_coordinator_stimuli.get():
-            coord.start([entry["type_id"]], [entry["table_id"]], [entry["entry_id"]],
-                        qoeval_config.coordinator_generate_stimuli,
-                        False,
-                        qoeval_config.coordinator_overwrite)
-
-    if qoeval_config.coordinator_postprocessing.get():
-        for entry in qoeval_config.gui_coordinator_stimuli.get():
-            coord.start([entry["type_id"]], [entry["table_id"]], [entry["entry_id"]],
-                        False,
-                        qoeval_config.coordinator_postprocessing,
-                        qoeval_config.coordinator_overwrite)
+    # all checked stimuli are processed in one batch (grouped by the required device setup)
+    stimuli = [(entry["type_id"], entry["table_id"], entry["entry_id"])
+               for entry in qoeval_config.gui_coordinator_stimuli.get()]
+    if len(stimuli) > 0 and (qoeval_config.coordinator_generate_stimuli.get() or
+                             qoeval_config.coordinator_postprocessing.get()):
+        coord.start_batch(stimuli,
+                          qoeval_config.coordinator_generate_stimuli.get(),
+                          qoeval_config.coordinator_postprocessing.get(),
+                          qoeval_config.coordinator_overwrite.get())
 
 
 if __name__ == '__main__':
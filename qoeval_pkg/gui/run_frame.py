@@ -18,7 +18,10 @@ import psutil
 import qoeval_pkg.netem.netem as netem
 
 import qoeval_pkg.gui.gui
-from qoeval_pkg.coordinator import Coordinator, FINISH_CAMPAIGN_LOG, FINISH_POST_LOG
+from qoeval_pkg.coordinator import Coordinator
+from qoeval_pkg.cost_model import CampaignEstimate, CostModel, estimate_campaign
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.utils import get_video_id
 import threading
 from typing import Callable, List, Optional
 from qoeval_pkg.gui.subframes import *
@@ -31,6 +34,8 @@ RUN_COORDINATOR_STR = "Run Coordinator"
 STOP_COORDINATOR_STR = "Stop Coordinator"
 CAMPAIGNS_STR = "Campaigns: "
 POST_STR = "Post: "
+ETA_STR = "ETA: "
+PROGRESS_UPDATE_INTERVAL = 1000  # interval for reading the progress from the campaign journal [ms]
 
 
 class RunFrame(tk.Frame):
@@ -47,6 +52,10 @@ class RunFrame(tk.Frame):
         self.campaigns_finished = None
         self.post_processing_finished = None
         self.coordinator_is_running = False
+        self.journal: Optional[CampaignJournal] = None
+        self.estimate: Optional[CampaignEstimate] = None
+        self._campaign_video_ids = []
+        self._post_processing_video_ids = []
 
         self.logger = getLogger()
 
@@ -89,6 +98,11 @@ class RunFrame(tk.Frame):
                                    textvariable=self.post_processing_finished_str, width=10, anchor="w")
         self.post_label.pack(fill=tk.BOTH, expand=0, side="left")
 
+        # Estimated time until the campaign is finished
+        self.eta_str = tk.StringVar(None, ETA_STR)
+        self.eta_label = tk.Label(master=self.button_frame, textvariable=self.eta_str, width=30, anchor="w")
+        self.eta_label.pack(fill=tk.BOTH, expand=0, side="left")
+
         # Log Box
         self.listbox = tk.Text(self)
         self.listbox.pack(fill=tk.BOTH, expand=1, side="left")
@@ -125,10 +139,16 @@ class RunFrame(tk.Frame):
             self.listbox.insert(tk.END, "No Parameters are selected\n")
             return
         self.total_stimuli = len(entries)
-        self.campaigns_finished = 0
-        self.post_processing_finished = 0
-        self.campaigns_finished_str.set(f"{CAMPAIGNS_STR}{self.campaigns_finished}/{self.total_stimuli}")
-        self.post_processing_finished_str.set(f"{POST_STR}{self.post_processing_finished}/{self.total_stimuli}")
+        qoeval_config = self.gui.qoeval_config
+        self._campaign_video_ids = [get_video_id(qoeval_config, entry["type_id"], entry["table_id"],
+                                                 entry["entry_id"], "0") for entry in entries]
+        self._post_processing_video_ids = [get_video_id(qoeval_config, entry["type_id"], entry["table_id"],
+                                                        entry["entry_id"], "1") for entry in entries]
+        if self.journal:
+            self.journal.close()
+        self.journal = CampaignJournal(qoeval_config)
+        self.estimate = self._estimate_campaign(entries)
+        self.update_progress()
 
         log.info("Starting coordinator")
         self.listbox.insert(tk.END, "Starting coordinator\n")
@@ -142,17 +162,41 @@ class RunFrame(tk.Frame):
         self.coordinator_is_running = True
         self.update_thread = threading.Thread(target=self.monitor_coordinator, daemon=True)
         self.update_thread.start()
+        self.after(PROGRESS_UPDATE_INTERVAL, self.update_progress)
+
+    def _estimate_campaign(self, entries) -> Optional[CampaignEstimate]:
+        """Predict the duration of the selected stimuli from the timings of earlier stimuli"""
+        parameter_table = self.gui.parameter_frame.parameter_table
+        if parameter_table is None:
+            return None
+        qoeval_config = self.gui.qoeval_config
+        cost_model = CostModel.from_history(qoeval_config, parameter_table)
+        estimate = estimate_campaign(cost_model, qoeval_config, parameter_table,
+                                     [(entry["type_id"], entry["table_id"], entry["entry_id"]) for entry in entries],
+                                     generate_stimuli=qoeval_config.coordinator_generate_stimuli.get(),
+                                     postprocessing=qoeval_config.coordinator_postprocessing.get(),
+                                     overwrite=qoeval_config.coordinator_overwrite.get())
+        self.listbox.insert(tk.END, f"{estimate}\n")
+        estimate.start()
+        return estimate
+
+    def update_progress(self):
+        """Read the number of recorded and post-processed stimuli from the campaign journal"""
+        if not self.journal:
+            return
+        self.campaigns_finished = self.journal.count_completed(self._campaign_video_ids)
+        self.post_processing_finished = self.journal.count_completed(self._post_processing_video_ids)
+        self.campaigns_finished_str.set(f"{CAMPAIGNS_STR}{self.campaigns_finished}/{self.total_stimuli}")
+        self.post_processing_finished_str.set(f"{POST_STR}{self.post_processing_finished}/{self.total_stimuli}")
+        if self.estimate:
+            self.estimate.update_from_journal(self.journal)
+            self.eta_str.set(f"{ETA_STR}{self.estimate.get_eta_str()}")
+        if self.coordinator_is_running:
+            self.after(PROGRESS_UPDATE_INTERVAL, self.update_progress)
 
     def monitor_coordinator(self):
         """Thread to monitor the console output of the coordinator process and display it"""
         for line in self.coordinator_process.stdout:
-            if FINISH_CAMPAIGN_LOG.encode("UTF-8") in line:
-                self.campaigns_finished += 1
-                self.campaigns_finished_str.set(f"{CAMPAIGNS_STR}{self.campaigns_finished}/{self.total_stimuli}")
-            if FINISH_POST_LOG.encode("UTF-8") in line:
-                self.post_processing_finished += 1
-                self.post_processing_finished_str.set(
-                    f"{POST_STR}{self.post_processing_finished}/{self.total_stimuli}")
             self.listbox.insert(tk.END, line)
             self.listbox.yview(tk.END)
         self.enable_interface_after_coordinator()
@@ -183,4 +227,5 @@ class RunFrame(tk.Frame):
             child.configure(state='normal')
         self.campaigns_finished_str.set(CAMPAIGNS_STR)
         self.post_processing_finished_str.set(POST_STR)
+        self.eta_str.set(ETA_STR)
 
@@ -17,13 +17,34 @@ def add_tooltips(qoeval_config: QoEvalConfiguration):
     qoeval_config.coordinator_generate_stimuli.tooltip = 'Check to genereate new stimuli videos'
     qoeval_config.coordinator_postprocessing.tooltip = 'Check to postprocess stimuli videos'
     qoeval_config.coordinator_overwrite.tooltip = 'Check to overwrite existing files'
+    qoeval_config.coordinator_workers.tooltip = 'Devices used in parallel - one dict of option values ' \
+                                                '(e.g. AdbDeviceSerial, NetDeviceName) per device'
+    qoeval_config.coordinator_postprocessing_workers.tooltip = 'Number of threads post-processing recorded stimuli ' \
+                                                               'while the next ones are recorded (0: disabled)'
+    qoeval_config.coordinator_device_session.tooltip = 'Check to keep the device running between stimuli (only ' \
+                                                       're-launched if orientation or Play Store setting changes)'
+    qoeval_config.coordinator_retry_delay.tooltip = 'Delay [s] before the first retry of a failed recording, doubled ' \
+                                                    'for each further retry'
+    qoeval_config.coordinator_retry_max_delay.tooltip = 'Maximum delay [s] before retrying a failed recording'
+    qoeval_config.queue_lease_duration.tooltip = 'Time [s] after which a job of a distributed campaign is handed to ' \
+                                                 'another worker if its worker stopped sending heartbeats'
 
     qoeval_config.net_device_name.tooltip = 'name of network interface connecting us to the Internet'
     qoeval_config.excluded_ports.tooltip = 'Ports not affected by netem'
+    qoeval_config.net_em_tc_backend.tooltip = 'Applying netem parameter changes: batch (persistent tc process) or ' \
+                                              'subprocess (one tc process per change)'
     qoeval_config.traffic_analysis_bin_sizes.tooltip = 'Bin size thresholds [B] for packet size histogram data'
     qoeval_config.emulator_type.tooltip = 'Emulator Type'
     qoeval_config.show_device_screen_mirror.tooltip = 'for real device: Mirror the device screen while recording'
     qoeval_config.show_device_frame.tooltip = 'for Emulator: show device frame'
+    qoeval_config.capture_early_stop.tooltip = 'for Emulator: stop recording when the end trigger image is detected ' \
+                                               'while recording'
+    qoeval_config.capture_early_stop_grace_period.tooltip = 'time [s] the recording is continued after the end ' \
+                                                            'trigger image has been detected'
+    qoeval_config.capture_black_timeout.tooltip = 'abort recording if the window is black for the given time [s] ' \
+                                                  '(0: disabled, requires CaptureEarlyStop)'
+    qoeval_config.capture_frozen_timeout.tooltip = 'abort recording of a video if the window does not change for the ' \
+                                                   'given time [s] (0: disabled, requires CaptureEarlyStop)'
     qoeval_config.adb_device_serial.tooltip = 'ADB Device Serial Number - determine your device/emulator serial by using the ' \
                                        'command "adb devices" \n\n' \
                                        '1131FDD4003EW: serial number of a Pixel 5 real hardware device'
@@ -32,7 +53,11 @@ def add_tooltips(qoeval_config: QoEvalConfiguration):
     qoeval_config.dynamic_parameter_path.tooltip = 'Path to dynamic parameter files'
     qoeval_config.trigger_image_path.tooltip = 'Path to trigger images for detecting start/end of relevant stimuli section'
     qoeval_config.video_capture_path.tooltip = 'Path where captured video files are stored (default: "~/stimuli")'
+    qoeval_config.metrics_textfile_path.tooltip = 'Directory of the Prometheus textfile (qoeval.prom) with the timing ' \
+                                                  'metrics of a campaign (default: video capture path)'
     qoeval_config.vd_path.tooltip = 'Path where Android virtual devices (avd) files are stored (default: "~/qoeval_avd")'
+    qoeval_config.vd_name.tooltip = 'Name of the Android virtual device of the standard emulator (default: ' \
+                                    'qoeval_pixel_android_30_x86) - must differ for each device used in parallel'
     qoeval_config.traffic_analysis_plot.tooltip = 'Enable data collection and plot creation for traffic analysis'
     qoeval_config.traffic_analysis_live.tooltip = 'Enable live traffic analysis'
     qoeval_config.net_em_sanity_check.tooltip = 'Perform additional check to detect invalid network emulation situations'
@@ -0,0 +1,259 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Job queue of a distributed campaign
+
+A coordinator publishes the processing steps of a campaign as jobs (JOB_GENERATE: recording a group of alternative
+entries, JOB_POSTPROCESS: post-processing entries) in a SQLite database in the video capture path. Worker processes
+(see qoeval_pkg.distributed) claim a job by taking a lease on it, renew the lease by heartbeats while the job runs
+and report the result. The lease of a worker which stops sending heartbeats (e.g. because it crashed) expires, so the
+job is claimed again by another worker. A job is only claimed when all jobs it depends on (e.g. the recording of the
+entries to be post-processed) have been completed.
+
+The database uses SQLite's rollback journal (not WAL, which requires shared memory of the processes and thus a single
+host), so the queue can be shared by the capture hosts via a network file system - provided that it supports POSIX
+file locks (e.g. NFSv4 or NFSv3 with lockd), which SQLite uses for its transactions.
+"""
+
+import contextlib
+import json
+import logging as log
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.journal import JOURNAL_MODE
+
+JOB_QUEUE_FILE_NAME = "qoeval_queue.sqlite"
+JOB_QUEUE_TIMEOUT = 30  # time to wait for a lock held by another process [s]
+
+JOB_GENERATE = "generate"
+JOB_POSTPROCESS = "postprocess"
+
+STATUS_QUEUED = "queued"
+STATUS_LEASED = "leased"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+Job = namedtuple("Job", "job_id campaign kind type_id table_id entry_ids overwrite attempts")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        type_id TEXT NOT NULL,
+        table_id TEXT NOT NULL,
+        entry_ids TEXT NOT NULL,
+        overwrite INTEGER NOT NULL DEFAULT 0,
+        depends_on TEXT NOT NULL DEFAULT '[]',
+        status TEXT NOT NULL,
+        worker TEXT,
+        lease_expires REAL,
+        available_at REAL NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 1,
+        error TEXT,
+        created REAL,
+        finished REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+"""
+_JOB_COLUMNS = "job_id, campaign, kind, type_id, table_id, entry_ids, overwrite, attempts"
+
+
+def job_queue_file(qoeval_config: QoEvalConfiguration) -> str:
+    return os.path.join(qoeval_config.video_capture_path.get(), JOB_QUEUE_FILE_NAME)
+
+
+class JobQueue:
+    """
+        Job queue shared by the coordinator publishing a campaign and the workers processing it
+
+        Every method is a single transaction, so several processes (and the threads of one process) can use the
+        queue at the same time.
+
+        Attributes
+        ----------
+        file_path : str
+            Path of the SQLite database
+        lease_duration : float
+            Time [s] a claimed job is reserved for a worker without a heartbeat
+        """
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, file_path: str = None):
+        self.file_path = file_path if file_path else job_queue_file(qoeval_config)
+        self.lease_duration = qoeval_config.queue_lease_duration.get()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        # transactions are started explicitly (see _transaction)
+        self._connection = sqlite3.connect(self.file_path, timeout=JOB_QUEUE_TIMEOUT, check_same_thread=False,
+                                           isolation_level=None)
+        with self._lock:
+            # also converts queues created in WAL mode (requires that no other process uses the queue)
+            journal_mode = self._connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}").fetchone()[0]
+            if journal_mode.upper() != JOURNAL_MODE:
+                log.warning(f"Job queue {self.file_path} uses journal mode {journal_mode} - it cannot be shared via "
+                            f"a network file system")
+            # the whole database is synced at each commit, so a crashed host cannot corrupt the queue
+            self._connection.execute("PRAGMA synchronous=FULL")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # an immediate transaction takes the write lock at its start, so two workers never claim the same job
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def publish(self, campaign: str, kind: str, type_id: str, table_id: str, entry_ids: List[str],
+                overwrite: bool = False, depends_on: List[int] = None, max_attempts: int = 1) -> int:
+        """Adds a job to the queue and returns its id"""
+        with self._transaction():
+            cursor = self._connection.execute(
+                "INSERT INTO jobs (campaign, kind, type_id, table_id, entry_ids, overwrite, depends_on, status, "
+                "max_attempts, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (campaign, kind, type_id, table_id, json.dumps([str(entry_id) for entry_id in entry_ids]),
+                 int(overwrite), json.dumps(depends_on if depends_on else []), STATUS_QUEUED, max_attempts,
+                 time.time()))
+            return cursor.lastrowid
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Leases the next job which can be processed to the given worker, returns None if there is none"""
+        now = time.time()
+        with self._transaction():
+            self._expire_leases(now)
+            rows = self._connection.execute(
+                f"SELECT {_JOB_COLUMNS}, depends_on FROM jobs WHERE status = ? AND available_at <= ? "
+                f"ORDER BY job_id", (STATUS_QUEUED, now)).fetchall()
+            for row in rows:
+                if not self._are_completed(json.loads(row[-1])):
+                    continue
+                self._connection.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ?", (STATUS_LEASED, worker, now + self.lease_duration, row[0]))
+                return self._to_job(row[:-1], attempts=row[7] + 1)
+        return None
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renews the lease of the worker on the job, returns False if the worker does not hold the lease anymore"""
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_duration, job_id, worker, STATUS_LEASED))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str) -> bool:
+        """Records that the worker has completed the job, returns False if the worker did not hold the lease"""
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, error = NULL, finished = ? "
+                "WHERE job_id = ? AND worker = ? AND status = ?",
+                (STATUS_COMPLETED, time.time(), job_id, worker, STATUS_LEASED))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error, retry_delay: float = None) -> bool:
+        """
+            Records that the job has failed on the worker, returns False if the worker did not hold the lease
+
+            If retry_delay is given, the job is queued again and can be claimed after retry_delay [s]. Otherwise it
+            has failed for good, as have all jobs depending on it.
+            """
+        now = time.time()
+        with self._transaction():
+            if retry_delay is not None:
+                cursor = self._connection.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available_at = ?, error = ? "
+                    "WHERE job_id = ? AND worker = ? AND status = ?",
+                    (STATUS_QUEUED, now + retry_delay, str(error), job_id, worker, STATUS_LEASED))
+                return cursor.rowcount == 1
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, error = ?, finished = ? "
+                "WHERE job_id = ? AND worker = ? AND status = ?",
+                (STATUS_FAILED, str(error), now, job_id, worker, STATUS_LEASED))
+            if cursor.rowcount != 1:
+                return False
+            self._fail_dependent_jobs(job_id, now)
+            return True
+
+    def counts(self, campaign: str) -> Dict[str, int]:
+        """Returns the number of jobs of the campaign in each state"""
+        with self._transaction():
+            self._expire_leases(time.time())
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM jobs WHERE campaign = ? GROUP BY status",
+                                            (campaign,)).fetchall()
+        return dict(rows)
+
+    def is_finished(self, campaign: str = None) -> bool:
+        """Returns True if all jobs (of the campaign, if given) have been completed or have failed"""
+        counts = self.counts(campaign) if campaign else self._counts_all()
+        return counts.get(STATUS_QUEUED, 0) == 0 and counts.get(STATUS_LEASED, 0) == 0
+
+    def jobs(self, campaign: str, status: str = None) -> List[Job]:
+        condition = " AND status = ?" if status else ""
+        values = (campaign, status) if status else (campaign,)
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE campaign = ?{condition} "
+                                            f"ORDER BY job_id", values).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def _counts_all(self) -> Dict[str, int]:
+        with self._transaction():
+            self._expire_leases(time.time())
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _expire_leases(self, now: float):
+        """Returns the jobs of workers which stopped sending heartbeats to the queue (or fails them)"""
+        rows = self._connection.execute(
+            "SELECT job_id, worker, attempts, max_attempts FROM jobs WHERE status = ? AND lease_expires < ?",
+            (STATUS_LEASED, now)).fetchall()
+        for job_id, worker, attempts, max_attempts in rows:
+            log.warning(f"Lease of worker {worker} on job {job_id} expired")
+            if attempts < max_attempts:
+                self._connection.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, error = ? WHERE job_id = ?",
+                    (STATUS_QUEUED, f"lease of worker {worker} expired", job_id))
+            else:
+                self._connection.execute(
+                    "UPDATE jobs SET status = ?, lease_expires = NULL, error = ?, finished = ? WHERE job_id = ?",
+                    (STATUS_FAILED, f"lease of worker {worker} expired", now, job_id))
+                self._fail_dependent_jobs(job_id, now)
+
+    def _are_completed(self, job_ids: List[int]) -> bool:
+        for job_id in job_ids:
+            row = self._connection.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] != STATUS_COMPLETED:
+                return False
+        return True
+
+    def _fail_dependent_jobs(self, job_id: int, now: float):
+        rows = self._connection.execute("SELECT job_id, depends_on FROM jobs WHERE status = ?",
+                                        (STATUS_QUEUED,)).fetchall()
+        for dependent_id, depends_on in rows:
+            if job_id in json.loads(depends_on):
+                self._connection.execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE job_id = ?",
+                                         (STATUS_FAILED, f"job {job_id} failed", now, dependent_id))
+                self._fail_dependent_jobs(dependent_id, now)
+
+    @staticmethod
+    def _to_job(row, attempts: int = None) -> Job:
+        return Job(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]), bool(row[6]),
+                   row[7] if attempts is None else attempts)
@@ -0,0 +1,211 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Campaign journal
+
+Records the progress of all stimuli in a SQLite database in the video capture path. For each stimulus and
+processing step (P0: recorded, P1: post-processed, P2: generated buffering, P3: generated buffering with setpts) the
+journal holds the parameters, the detected timestamps, start time, duration and the last failure. The coordinator
+decides if a step is already done by looking it up in the journal instead of probing the file system, so an
+interrupted campaign can be resumed. Several processes (e.g. the coordinator and the GUI) can access the journal
+at the same time. Like the job queue (see qoeval_pkg.job_queue), the journal uses SQLite's rollback journal instead
+of WAL, so the workers of a distributed campaign on different hosts can share it via a network file system.
+
+When a journal is created in a video capture path which already contains stimuli, these are imported once as
+completed steps.
+"""
+
+import json
+import logging as log
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import List, Optional, Set
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.utils import get_video_id
+
+JOURNAL_FILE_NAME = "qoeval_journal.sqlite"
+JOURNAL_TIMEOUT = 30  # time to wait for a lock held by another process [s]
+JOURNAL_MODE = "DELETE"  # rollback journal of the journal and the job queue, works on network file systems (unlike WAL)
+
+PHASES = ["0", "1", "2", "3"]
+STATUS_STARTED = "started"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+JournalRecord = namedtuple("JournalRecord", "video_id type_id table_id entry_id phase status parameters timestamps "
+                                            "started duration attempts error")
+
+_STIMULI_FILE_PATTERN = re.compile(r"^(?P<type_id>[^-_]+)-(?P<table_id>[^-_]+)-(?P<entry_id>\d+)_E1-[A-Z]+-[^_]+"
+                                   r"_P(?P<phase>\d)\.avi$")
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stimuli (
+        video_id TEXT PRIMARY KEY,
+        type_id TEXT NOT NULL,
+        table_id TEXT NOT NULL,
+        entry_id TEXT NOT NULL,
+        phase TEXT NOT NULL,
+        status TEXT NOT NULL,
+        parameters TEXT,
+        timestamps TEXT,
+        started REAL,
+        duration REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS stimuli_table ON stimuli (type_id, table_id, phase, status);
+"""
+
+
+def journal_file(qoeval_config: QoEvalConfiguration) -> str:
+    return os.path.join(qoeval_config.video_capture_path.get(), JOURNAL_FILE_NAME)
+
+
+class CampaignJournal:
+    """
+        Transactional journal of the processing steps of all stimuli in a video capture path.
+
+        A journal object can be shared by the threads of one process. Every state change is committed immediately,
+        so the journal reflects the progress even if the campaign is interrupted.
+
+        Attributes
+        ----------
+        qoeval_config : QoEvalConfiguration
+            Configuration of the campaign (used to determine the ids and the location of the journal)
+        file_path : str
+            Path of the SQLite database
+        """
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, file_path: str = None):
+        self.qoeval_config = qoeval_config
+        self.file_path = file_path if file_path else journal_file(qoeval_config)
+        self._lock = threading.Lock()
+        is_new = not os.path.isfile(self.file_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.file_path, timeout=JOURNAL_TIMEOUT, check_same_thread=False)
+        with self._lock, self._connection:
+            # also converts journals created in WAL mode (requires that no other process uses the journal)
+            journal_mode = self._connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}").fetchone()[0]
+            if journal_mode.upper() != JOURNAL_MODE:
+                log.warning(f"Campaign journal {self.file_path} uses journal mode {journal_mode} - it cannot be "
+                            f"shared via a network file system")
+            # the whole database is synced at each commit, so a crashed host cannot corrupt the journal
+            self._connection.execute("PRAGMA synchronous=FULL")
+            self._connection.executescript(_SCHEMA)
+        if is_new:
+            self._import_existing_stimuli()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def start(self, type_id: str, table_id: str, entry_id: str, phase: str, parameters: dict = None):
+        """Records that processing step phase of the stimulus has been started"""
+        video_id = get_video_id(self.qoeval_config, type_id, table_id, entry_id, phase)
+        with self._lock, self._connection:
+            self._insert_if_missing(video_id, type_id, table_id, entry_id, phase)
+            self._connection.execute(
+                "UPDATE stimuli SET status = ?, parameters = ?, timestamps = NULL, started = ?, duration = NULL, "
+                "attempts = attempts + 1, error = NULL WHERE video_id = ?",
+                (STATUS_STARTED, _to_json(parameters), time.time(), video_id))
+
+    def complete(self, type_id: str, table_id: str, entry_id: str, phase: str, timestamps: dict = None):
+        """Records that processing step phase of the stimulus has been completed, optionally with detected times"""
+        self._finish(type_id, table_id, entry_id, phase, STATUS_COMPLETED, timestamps, None)
+
+    def fail(self, type_id: str, table_id: str, entry_id: str, phase: str, error):
+        """Records that processing step phase of the stimulus has failed"""
+        self._finish(type_id, table_id, entry_id, phase, STATUS_FAILED, None, str(error))
+
+    def _finish(self, type_id: str, table_id: str, entry_id: str, phase: str, status: str,
+                timestamps: Optional[dict], error: Optional[str]):
+        video_id = get_video_id(self.qoeval_config, type_id, table_id, entry_id, phase)
+        now = time.time()
+        with self._lock, self._connection:
+            self._insert_if_missing(video_id, type_id, table_id, entry_id, phase)
+            self._connection.execute(
+                "UPDATE stimuli SET status = ?, timestamps = ?, started = COALESCE(started, ?), "
+                "duration = ? - COALESCE(started, ?), error = ? WHERE video_id = ?",
+                (status, _to_json(timestamps), now, now, now, error, video_id))
+
+    def _insert_if_missing(self, video_id: str, type_id: str, table_id: str, entry_id: str, phase: str):
+        self._connection.execute(
+            "INSERT OR IGNORE INTO stimuli (video_id, type_id, table_id, entry_id, phase, status) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (video_id, type_id, table_id, str(entry_id), phase, STATUS_STARTED))
+
+    def is_completed(self, type_id: str, table_id: str, entry_id: str, phase: str = "0") -> bool:
+        video_id = get_video_id(self.qoeval_config, type_id, table_id, entry_id, phase)
+        with self._lock:
+            row = self._connection.execute("SELECT status FROM stimuli WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None and row[0] == STATUS_COMPLETED
+
+    def completed_entry_ids(self, type_id: str, table_id: str, phase: str = "0") -> Set[str]:
+        """Returns the ids of all entries of the table for which the processing step phase has been completed"""
+        prefix = get_video_id(self.qoeval_config, type_id, table_id, "", phase).partition("_")[2]
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT entry_id, video_id FROM stimuli WHERE type_id = ? AND table_id = ? AND phase = ? "
+                "AND status = ?", (type_id, table_id, phase, STATUS_COMPLETED)).fetchall()
+        # only stimuli of the current device type and version
+        return {entry_id for entry_id, video_id in rows if video_id.partition("_")[2] == prefix}
+
+    def count_completed(self, video_ids: List[str]) -> int:
+        """Returns how many of the given stimuli (video ids including the processing step) have been completed"""
+        count = 0
+        with self._lock:
+            for video_id in video_ids:
+                row = self._connection.execute("SELECT status FROM stimuli WHERE video_id = ?",
+                                               (video_id,)).fetchone()
+                if row is not None and row[0] == STATUS_COMPLETED:
+                    count += 1
+        return count
+
+    def records(self, type_id: str = None, table_id: str = None, phase: str = None) -> List[JournalRecord]:
+        """Returns the journal entries, optionally restricted to a type, table and processing step"""
+        conditions = []
+        values = []
+        for column, value in [('type_id', type_id), ('table_id', table_id), ('phase', phase)]:
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT video_id, type_id, table_id, entry_id, phase, status, parameters, timestamps, started, "
+                f"duration, attempts, error FROM stimuli{where} ORDER BY started", values).fetchall()
+        return [JournalRecord(*row[:6], _from_json(row[6]), _from_json(row[7]), *row[8:]) for row in rows]
+
+    def _import_existing_stimuli(self):
+        """Imports all stimuli files of the video capture path as completed steps"""
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        imported = 0
+        with self._lock, self._connection:
+            for filename in os.listdir(directory):
+                match = _STIMULI_FILE_PATTERN.match(filename)
+                if not match:
+                    continue
+                mtime = os.path.getmtime(os.path.join(directory, filename))
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO stimuli (video_id, type_id, table_id, entry_id, phase, status, started, "
+                    "duration, attempts) VALUES (?, ?, ?, ?, ?, ?, ?, NULL, 0)",
+                    (filename[:-len(".avi")], match.group('type_id'), match.group('table_id'),
+                     match.group('entry_id'), match.group('phase'), STATUS_COMPLETED, mtime))
+                imported += 1
+        if imported > 0:
+            log.info(f"Imported {imported} existing stimuli into the new campaign journal {self.file_path}")
+
+
+def _to_json(value) -> Optional[str]:
+    return None if value is None else json.dumps(value)
+
+
+def _from_json(text: Optional[str]):
+    return None if text is None else json.loads(text)
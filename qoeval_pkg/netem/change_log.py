@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Log of the network emulation conditions actually applied during a recording
+
+A Connection writes each change of its netem qdiscs (start of the emulation, T_init, each step of a dynamic parameter
+trace, disabling) to a NetemChangeLog ("{video_id}_netem.csv" in the video capture path): the time it was intended
+for and the time it was actually applied (time.monotonic()), the wall-clock time and the time tc needed. Whether the
+latter includes the execution of the change depends on the tc backend (column confirmed): the SubprocessTcBackend
+returns when tc has finished, whereas the BatchTcBackend returns when the commands have been written to the pipe of
+its tc process - the change takes effect shortly afterwards and a failure is only reported with the next change. The
+coordinator adds the instants at which the other components of the recording (capture, UI control, traffic analysis)
+started, so the log can be aligned with
+
+- the traffic statistics of the DataCollector, whose time 0 is the common start of all components (see
+  overlay_traffic) and
+- the recorded video, whose time 0 is the start of the capture (see get_video_timeline).
+"""
+
+import csv
+import os
+import threading
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from qoeval_pkg.netem.trace_scheduler import DIRECTION_UPLINK, DIRECTION_DOWNLINK
+
+CHANGE_LOG_SUFFIX = "_netem.csv"
+CHANGE_LOG_COLUMNS = ["event", "direction", "rate", "delay", "intended", "applied", "wall", "tc_latency", "confirmed"]
+
+EVENT_START = "start"  # start of the emulation (common start of the recording components if synchronized)
+EVENT_STATIC = "static"  # static parameters applied
+EVENT_T_INIT = "t_init"  # T_init started
+EVENT_T_INIT_END = "t_init_end"  # T_init ended, the parameters of the connection are applied
+EVENT_TRACE = "trace"  # change of a dynamic parameter trace
+EVENT_CHANGE = "change"  # parameters changed by Connection.change_parameters
+EVENT_DISABLE = "disable"  # emulation disabled
+EVENT_COMPONENT = "component"  # start of a component of the recording (direction: name of the component)
+
+
+def change_log_file(video_capture_path: str, video_id: str) -> str:
+    return os.path.join(video_capture_path, f"{video_id}{CHANGE_LOG_SUFFIX}")
+
+
+class NetemChangeLog:
+    """
+        CSV log of the applied netem changes, written by a Connection (from several threads)
+
+        Attributes
+        ----------
+        file_path : str
+            Path of the CSV file
+        """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._file = open(file_path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CHANGE_LOG_COLUMNS)
+
+    def record(self, event: str, direction: str, rate: float, delay: float, intended: float, applied: float,
+               tc_latency: float = 0.0, wall: float = None, confirmed: bool = True):
+        """
+            Adds a change to the log
+
+            Parameters
+            ----------
+            event : str
+                Kind of change (EVENT_*)
+            direction : str
+                Direction the change applies to (uplink, downlink or empty if it applies to both)
+            rate : float
+                Rate [kbit/s] in effect after the change
+            delay : float
+                Delay [ms] in effect after the change
+            intended : float
+                time.monotonic() instant at which the change was due
+            applied : float
+                time.monotonic() instant at which the change was applied
+            tc_latency : float
+                Time [ms] needed for applying the change (only handing it over to tc if not confirmed)
+            wall : float, optional
+                Wall-clock time (time.time()) of applied, default: derived from the current time
+            confirmed : bool, optional
+                True if tc_latency includes the execution of the change by tc (see TcBackend.is_confirming)
+            """
+        if wall is None:
+            wall = time.time() - (time.monotonic() - applied)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._writer.writerow([event, direction, _format(rate), _format(delay), f"{intended:.6f}",
+                                   f"{applied:.6f}", f"{wall:.6f}", f"{tc_latency:.3f}", int(confirmed)])
+
+    def record_component_starts(self, epoch: float, wall_epoch: float, offsets: Dict[str, float]):
+        """Adds the start of the components of the recording (offsets [s] from the common start, see StartBarrier)"""
+        for component, offset in offsets.items():
+            self.record(EVENT_COMPONENT, component, None, None, epoch, epoch + offset, wall=wall_epoch + offset)
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _format(value) -> str:
+    return "" if value is None else f"{float(value):g}"
+
+
+def load_change_log(file_path: str) -> pd.DataFrame:
+    """
+        Loads a change log
+
+        The returned frame has the additional columns time (instant [s] of the change from the start of the
+        emulation, i.e. the time axis of the traffic statistics) and lateness (time [ms] from the intended to the
+        actual change).
+        """
+    changes = pd.read_csv(file_path, keep_default_na=False, na_values={"rate": [""], "delay": [""]},
+                          dtype={"event": str, "direction": str})
+    starts = changes.loc[changes["event"] == EVENT_START, "applied"]
+    epoch = starts.iloc[0] if len(starts) > 0 else changes["applied"].min()
+    changes["time"] = changes["applied"] - epoch
+    changes["lateness"] = (changes["applied"] - changes["intended"]) * 1000.0
+    changes["confirmed"] = changes["confirmed"].astype(bool)
+    return changes
+
+
+def get_conditions(changes: pd.DataFrame, times: Sequence[float]) -> pd.DataFrame:
+    """
+        Returns the conditions in effect at the given times [s] (from the start of the emulation)
+
+        The frame has the columns time, rul, rdl [kbit/s], dul and ddl [ms] (NaN before the first change of a
+        direction and after the emulation has been disabled).
+        """
+    conditions = pd.DataFrame({"time": np.asarray(times, dtype=np.float64)})
+    order = np.argsort(conditions["time"].values, kind="stable")
+    result = conditions.iloc[order].reset_index()
+    for direction, rate_column, delay_column in [(DIRECTION_UPLINK, "rul", "dul"),
+                                                 (DIRECTION_DOWNLINK, "rdl", "ddl")]:
+        direction_changes = changes.loc[(changes["direction"] == direction) & (changes["event"] != EVENT_COMPONENT),
+                                        ["time", "event", "rate", "delay"]].sort_values("time", kind="stable")
+        disabled = direction_changes["event"] == EVENT_DISABLE
+        direction_changes.loc[disabled, ["rate", "delay"]] = np.nan
+        direction_changes = direction_changes.rename(columns={"rate": rate_column, "delay": delay_column})
+        result = pd.merge_asof(result, direction_changes[["time", rate_column, delay_column]], on="time")
+    return result.sort_values("index").drop(columns="index").reset_index(drop=True)
+
+
+def overlay_traffic(changes: pd.DataFrame, stats_file_path: str) -> pd.DataFrame:
+    """
+        Returns the traffic statistics of a DataCollector ("{stats_file_path}.csv") with the columns of the conditions
+        actually in effect in each interval (see get_conditions)
+        """
+    if not stats_file_path.endswith(".csv"):
+        stats_file_path = f"{stats_file_path}.csv"
+    traffic = pd.read_csv(stats_file_path)
+    conditions = get_conditions(changes, traffic["time"].values)
+    return pd.concat([traffic, conditions.drop(columns="time")], axis=1)
+
+
+def get_video_timeline(changes: pd.DataFrame) -> pd.DataFrame:
+    """
+        Returns the changes of the emulated conditions with the column video_time (instant [s] of the change in the
+        recorded video, negative if before the start of the capture)
+        """
+    capture_starts = changes.loc[(changes["event"] == EVENT_COMPONENT) & (changes["direction"] == "capture"),
+                                 "time"]
+    capture_start = capture_starts.iloc[0] if len(capture_starts) > 0 else 0.0
+    timeline = changes.loc[changes["event"] != EVENT_COMPONENT].copy()
+    timeline["video_time"] = timeline["time"] - capture_start
+    return timeline
@@ -4,23 +4,42 @@
 #           Jan Andreas Krahl <krahl.jan@hm.edu>
 #
 # License:  LGPL 3.0 - see LICENSE file for details
+import contextlib
 import dataclasses
 from dataclasses import dataclass, field
+import fcntl
 import ipaddress
 import logging as log
+import re
 import shlex
 import subprocess
 import threading
 import time
 import math
-from typing import List
+import os
+import tempfile
+from typing import Dict, List
 import csv
-from timeit import default_timer as timer
 
-MAX_CONNECTIONS = 1
-
-USED_DEVICES = []
-IFB_IS_INITIALIZED = False
+from qoeval_pkg.errors import PermanentError
+from qoeval_pkg.netem.change_log import NetemChangeLog, EVENT_START, EVENT_STATIC, EVENT_T_INIT, \
+    EVENT_T_INIT_END, EVENT_TRACE, EVENT_CHANGE, EVENT_DISABLE
+from qoeval_pkg.netem.trace_scheduler import TraceScheduler, Timeline, DIRECTION_UPLINK, DIRECTION_DOWNLINK
+from qoeval_pkg.netem.tc_backend import TcBackend, SubprocessTcBackend, create_tc_backend, TC_BACKEND_BATCH
+from qoeval_pkg.start_barrier import StartBarrier
+
+MAX_CONNECTIONS = 8  # maximum number of concurrent connections per network device (at most 15 prio bands)
+MAX_VIRTUAL_DEVICES = 4 * MAX_CONNECTIONS  # maximum number of virtual (ifb) devices of all connections
+FILTER_PRIORITY_STEP = 100  # tc filter priorities reserved for each connection (excluded ports and its ip address)
+IFB_PREFIX = "qoeifb"  # name prefix of the virtual devices created by the connections
+IFB_ALIAS = "qoeval"  # label of the virtual devices of a connection ("qoeval/<device>/<slot>/<process id>")
+# lock file serializing adding and labeling virtual devices with removing unlabeled ones (by all processes)
+IFB_LOCK_FILE = os.path.join(tempfile.gettempdir(), "qoeval_ifb.lock")
+
+_SHARED_DEVICES = {}  # network devices used by connections (SharedDevice by device name)
+# serializes the setup and cleanup of connections, since these modify _SHARED_DEVICES and the rules of the devices
+_CONNECTION_LOCK = threading.RLock()
+_SIMULATED_DELAYS = {}  # emulated round-trip delay [ms] of the active SimulatedConnections (by ip address)
 CMD_MODPROBE = "sudo modprobe"
 CMD_TC = "sudo tc"
 CMD_IP = "sudo ip"
@@ -54,6 +73,8 @@ class DynamicParametersSetup:
 
     Attributes:
         parameter_sets: the parameters sets to be looped over by dynamic emulation
+        uplink_parameter_sets: if given, the uplink parameters (rul, dul) are looped over independently of the
+            downlink parameters (rdl, ddl) of parameter_sets
         verbose: decides whether netem changes are being logged
 
     Example Usage:
@@ -67,6 +88,7 @@ class DynamicParametersSetup:
 
     """
     parameter_sets: List[ParameterSet] = field(default_factory=list, init=False)
+    uplink_parameter_sets: List[ParameterSet] = field(default_factory=list, init=False)
     verbose: bool = field(default=False)
 
     @staticmethod
@@ -99,6 +121,18 @@ class DynamicParametersSetup:
                 continue
             self.parameter_sets.append(ParameterSet(*parameter_set))
 
+    def __len__(self):
+        return len(self.parameter_sets)
+
+    def get_timelines(self) -> Dict[str, Timeline]:
+        """Returns the timeline of each direction (see TraceScheduler)"""
+        uplink_sets = self.uplink_parameter_sets if self.uplink_parameter_sets else self.parameter_sets
+        return {DIRECTION_UPLINK: Timeline([p.timeframe / 1000.0 for p in uplink_sets], [p.rul for p in uplink_sets],
+                                           [p.dul for p in uplink_sets]),
+                DIRECTION_DOWNLINK: Timeline([p.timeframe / 1000.0 for p in self.parameter_sets],
+                                             [p.rdl for p in self.parameter_sets],
+                                             [p.ddl for p in self.parameter_sets])}
+
     def save_to_csv(self, filename: str):
         """ Saves the ParameterSetup as .csv file"""
         with open(filename, 'w') as file:
@@ -117,10 +151,178 @@ class DynamicParametersSetup:
             self.append_parameter_sets_from_nested_lists(data)
 
 
+class SharedDevice:
+    """
+        Network device shared by the connections emulating the conditions of different ip addresses
+
+        Outgoing traffic is classified by a prio qdisc: band 1 (1:1) holds the traffic which is not emulated, each
+        connection has a band of its own (slot + 1) with a netem leaf. Incoming traffic is redirected to the virtual
+        device of each connection by its filters of the shared ingress qdisc. The filters of a connection use the
+        priorities of its slot, so a connection can be set up and removed without affecting the others.
+
+        The connections can belong to several processes (e.g. "qoeval worker"s on one host): an existing tree of
+        qdiscs is used as it is, a slot is claimed by adding its netem leaf (which fails if another process has
+        claimed it) and the tree is only removed with the last netem leaf. The virtual devices of a connection are
+        labeled with device, slot and process id (IFB_ALIAS), so the rules of a process which has crashed are removed
+        when the device is used again.
+
+        Attributes
+        ----------
+        name : str
+            The name of the network device
+        connections : Dict[int, Connection]
+            The connections of this process using the device by slot (1 ... MAX_CONNECTIONS)
+        """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connections = {}
+        _remove_stale_connections(name)
+        if self._has_shared_qdiscs():
+            log.debug(f"Using shared qdiscs of device: {name}")
+            return
+        _reset_qdiscs(name)
+        log.debug(f"Adding shared qdiscs to device: {name}")
+        try:
+            subprocess.run(shlex.split(
+                f"{CMD_TC} qdisc add dev {name} root handle 1: prio bands {MAX_CONNECTIONS + 1} priomap "
+                f"0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0")).check_returncode()
+            subprocess.run(shlex.split(f"{CMD_TC} qdisc add dev {name} parent 1:1 handle 10: prio")).check_returncode()
+            subprocess.run(shlex.split(f"{CMD_TC} qdisc add dev {name} ingress handle ffff:")).check_returncode()
+        except subprocess.CalledProcessError:
+            # added concurrently by another process
+            if not self._has_shared_qdiscs():
+                raise
+
+    def _has_shared_qdiscs(self) -> bool:
+        output = _show(f"qdisc show dev {self.name}")
+        return re.search(rf"qdisc prio 1: root .*bands {MAX_CONNECTIONS + 1}\b", output) is not None and \
+            re.search(r"qdisc ingress ffff:", output) is not None
+
+    def add(self, connection) -> int:
+        """Returns the slot of a new connection, raises a RuntimeError if it conflicts with the other connections"""
+        emulated_ips = _get_emulated_ips(self.name)
+        if None in emulated_ips or (connection.android_ip is None and len(emulated_ips) > 0):
+            raise RuntimeError(f"Device already in use (a connection without ip address needs it exclusively)")
+        if connection.android_ip is not None and str(connection.android_ip) in emulated_ips:
+            owners = [other.name for other in self.connections.values()
+                      if str(other.android_ip) == str(connection.android_ip)]
+            raise RuntimeError(f"Device already in use for ip address {connection.android_ip} by connection: "
+                               f"'{owners[0] if owners else 'of another process'}'")
+        for slot in range(1, MAX_CONNECTIONS + 1):
+            if slot in self.connections:
+                continue
+            # adding the netem leaf of the band claims the slot (fails if another process uses it)
+            output = subprocess.run(shlex.split(f"{CMD_TC} qdisc add dev {self.name} parent 1:{slot + 1} "
+                                                f"handle {slot + 1}0: netem"), stderr=subprocess.PIPE)
+            if output.returncode == 0:
+                self.connections[slot] = connection
+                return slot
+        raise RuntimeError(f"Device already used by {MAX_CONNECTIONS} connections")
+
+    def remove(self, slot: int):
+        """Removes the rules of the connection using the slot"""
+        _release_slot(self.name, slot)
+        self.connections.pop(slot, None)
+
+    def close(self):
+        """Removes the shared qdiscs (if no process uses the device any more)"""
+        if re.search(r"qdisc netem \w+: parent 1:", _show(f"qdisc show dev {self.name}")):
+            log.debug(f"Keeping shared qdiscs of device {self.name} - it is used by another process")
+            return
+        log.debug(f"Removing tc rules for device: {self.name}")
+        _reset_qdiscs(self.name)
+
+
+def _show(arguments: str, command: str = CMD_TC) -> str:
+    """Returns the output of a tc (or ip) command listing the configuration"""
+    return subprocess.run(shlex.split(f"{command} {arguments}"), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True).stdout
+
+
+def _get_emulated_ips(net_device: str) -> set:
+    """Returns the ip addresses redirected by the connections of all processes (None: all traffic is redirected)"""
+    emulated_ips = set()
+    for match in re.findall(r"match ([0-9a-f]{8})/([0-9a-f]{8}) at (\d+)", _show(f"filter show dev {net_device} "
+                                                                                  f"parent ffff:")):
+        value, mask, offset = match
+        if mask == "ffffffff" and offset == "16":
+            emulated_ips.add(str(ipaddress.IPv4Address(int(value, 16))))
+        elif mask == "00000000":
+            emulated_ips.add(None)
+    return emulated_ips
+
+
+def _release_slot(net_device: str, slot: int):
+    """Removes the filters and the netem leaf of the connection using the slot"""
+    priorities = range(slot * FILTER_PRIORITY_STEP, (slot + 1) * FILTER_PRIORITY_STEP)
+    for parent in ["ffff:", "1:"]:
+        used = {int(priority) for priority in re.findall(r"\bpref (\d+)\b",
+                                                         _show(f"filter show dev {net_device} parent {parent}"))}
+        for priority in sorted(used.intersection(priorities)):
+            subprocess.run(shlex.split(f"{CMD_TC} filter del dev {net_device} parent {parent} priority {priority}"),
+                           stderr=subprocess.PIPE)
+    subprocess.run(shlex.split(f"{CMD_TC} qdisc del dev {net_device} parent 1:{slot + 1}"), stderr=subprocess.PIPE)
+
+
+def _get_virtual_devices() -> Dict[str, tuple]:
+    """Returns the virtual devices of the connections of all processes with their labels (device, slot, pid)"""
+    virtual_devices = {}
+    for line in _show("-o link show", CMD_IP).splitlines():
+        match = re.search(rf"^\d+: ({IFB_PREFIX}\d+)[:@]", line)
+        if match:
+            label = re.search(rf"\balias {IFB_ALIAS}/(\S+)/(\d+)/(\d+)", line)
+            virtual_devices[match.group(1)] = (label.group(1), int(label.group(2)), int(label.group(3))) \
+                if label else None
+    return virtual_devices
+
+
+@contextlib.contextmanager
+def _virtual_device_lock():
+    """
+    Holds the lock of the virtual devices of all processes
+
+    A virtual device is added and labeled while holding the lock, so a virtual device without label found while
+    holding it has been left by a process which crashed in between. The lock is released when the process ends.
+    """
+    # flock does not require write access, so the lock file can be shared by processes of different users
+    lock_file = os.open(IFB_LOCK_FILE, os.O_RDONLY | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(lock_file)
+
+
+def _is_process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_stale_connections(net_device: str):
+    """Removes the rules and virtual devices of connections of processes which are not running any more"""
+    released = set()
+    for virtual_device, label in _get_virtual_devices().items():
+        if label is None or label[0] != net_device or _is_process_running(label[2]):
+            continue
+        if label[1] not in released:
+            log.warning(f"Removing rules of slot {label[1]} of device {net_device} left by process {label[2]}")
+            _release_slot(net_device, label[1])
+            released.add(label[1])
+        subprocess.run(shlex.split(f"{CMD_IP} link del dev {virtual_device}"), stderr=subprocess.PIPE)
+
+
 class Connection:
     """
         The Connection object creates a controllable network connection.
 
+        Several connections can use the same device (see SharedDevice) if each of them is limited to its android_ip.
+
         Attributes
         ----------
         name : str
@@ -144,11 +346,15 @@ class Connection:
             download delay in ms of the connection
         android_ip : ipaddress
             IP address of android device (emulator or real device). If specified, emulation is limited to this
-            specific ip address (source and destination).
+            specific ip address (source and destination), otherwise the connection needs the device exclusively.
         exclude_ports : List[int]
             List of ports to be excluded from network emulation (e.g. for an ssh control connection)
         dynamic_parameters_setup: DynamicParametersSetup
-            To emulate dynamic parameters
+            To emulate dynamic parameters (or a trace_store.ThroughputTrace)
+        tc_backend : str
+            Backend applying the parameter changes (see tc_backend.TC_BACKENDS)
+        change_log : NetemChangeLog
+            Log of the applied changes (see set_change_log), None if not logged
         """
 
     __CMD_TC = CMD_TC
@@ -157,8 +363,7 @@ class Connection:
 
     def __init__(self, name, device_name, t_init: float = None, rul: float = None, rdl: float = None, dul: float = None,
                  ddl: float = None, android_ip: ipaddress = None, exclude_ports: List[int] = None,
-                 dynamic_parameters_setup: DynamicParametersSetup = None):
-        global USED_DEVICES
+                 dynamic_parameters_setup: DynamicParametersSetup = None, tc_backend: str = TC_BACKEND_BATCH):
         self.device = device_name
         self.name = name
         self.virtual_device_in = None
@@ -171,11 +376,21 @@ class Connection:
         self.ddl = ddl
         self.exclude_ports = exclude_ports
         self.dynamic_parameters_setup = dynamic_parameters_setup
-        if self.dynamic_parameters_setup and len(self.dynamic_parameters_setup.parameter_sets) == 0:
+        if self.dynamic_parameters_setup is not None and len(self.dynamic_parameters_setup) == 0:
             log.warning(f"DynamicParametersSetup for connection {self.name} is empty")
         self.android_ip = android_ip
         self._dynamic_emulation_thread = None
         self.emulation_is_active = False
+        self._stop_emulation = threading.Event()  # set when the emulation is disabled, ends the wait for T_init
+        # serializes the updates of the emulation thread with disabling the emulation
+        self._emulation_lock = threading.Lock()
+        self._start_barrier = None  # barrier of the recording, until the emulated conditions are in effect
+        self._start_epoch = None  # time.monotonic() instant at which the emulation has been started
+        self._trace_scheduler: TraceScheduler = None  # applies the dynamic parameters
+        self.change_log: NetemChangeLog = None
+        self.tc_backend = tc_backend
+        self._tc: TcBackend = None  # applies the parameter changes, created when the connection is initialized
+        self._slot = None  # slot of the connection on its SharedDevice
 
         if android_ip:
             log.debug(f"network emulation is applied only for IP address: {self.android_ip}")
@@ -194,7 +409,7 @@ class Connection:
             log.error(
                 f"Cannot initialize connection: tc not found - please check if install.sh has modified sudoers "
                 f"correctly.")
-            raise RuntimeError('External component not found.')
+            raise PermanentError('External component not found.')
 
         log.debug(f"locating netem")
         output = subprocess.run(shlex.split("find /lib/modules/ -type f -name '*netem*'"),
@@ -202,7 +417,7 @@ class Connection:
                                 universal_newlines=True)
         if len(output.stdout) == 0:
             log.error(f"Cannot initialize connection: netem not found.")
-            raise RuntimeError('External component not found.')
+            raise PermanentError('External component not found.')
 
         # We should not execute the complete python script with superuser privileges
         # instead, the install.sh script modifies /etc/sudoers to allow us to
@@ -214,19 +429,36 @@ class Connection:
         #     self.device = None
         #     raise RuntimeError('Cannot setup network emulation - missing privileges.')
 
-        self.reset_device()  # should not be necessary when implementation is completed
-
-        output = subprocess.run(['ifconfig'], stdout=subprocess.PIPE,
-                                universal_newlines=True)
-        if device_name not in output.stdout:
-            log.error(f"Cannot initialize connection: '{self.name}': Device does not exist")
-            self.device = None
-        elif device_name in USED_DEVICES:
-            log.error(f"Cannot initialize connection: '{self.name}': Device already in use")
-            self.device = None
-        else:
-            USED_DEVICES.append(device_name)
-            self._init()
+        with _CONNECTION_LOCK:
+            output = subprocess.run(['ifconfig'], stdout=subprocess.PIPE,
+                                    universal_newlines=True)
+            if device_name not in output.stdout:
+                log.error(f"Cannot initialize connection: '{self.name}': Device does not exist")
+                self.device = None
+            else:
+                if device_name not in _SHARED_DEVICES:
+                    _SHARED_DEVICES[device_name] = SharedDevice(device_name)
+                shared_device = _SHARED_DEVICES[device_name]
+                try:
+                    self._slot = shared_device.add(self)
+                except RuntimeError as err:
+                    log.error(f"Cannot initialize connection: '{self.name}': {err}")
+                    self.device = None
+                    if len(shared_device.connections) == 0:
+                        shared_device.close()
+                        del _SHARED_DEVICES[device_name]
+                else:
+                    self._init()
+
+    @property
+    def _band(self) -> int:
+        """Band of the prio qdisc of the device holding the netem leaf for outgoing traffic of this connection"""
+        return self._slot + 1
+
+    def _get_filter_priorities(self) -> range:
+        """Returns the tc filter priorities of this connection (one per excluded port and one for its traffic)"""
+        first = self._slot * FILTER_PRIORITY_STEP
+        return range(first, first + len(self.exclude_ports if self.exclude_ports else []) + 1)
 
     def _get_ifb(self):
         """Tries to set up virtual devices for this connection
@@ -235,33 +467,27 @@ class Connection:
             -------
             bool
                 Returns True if ifb devices could be created False otherwise"""
-        global IFB_IS_INITIALIZED
-        if not IFB_IS_INITIALIZED:
-            self._init_ifb(MAX_CONNECTIONS * 2)
+        self._init_ifb()
 
         log.debug(f"Setting up virtual device for connection: '{self.name}'")
-        output = subprocess.run(['ifconfig'], stdout=subprocess.PIPE,
+        output = subprocess.run(shlex.split(f"{self.__CMD_IP} -o link show"), stdout=subprocess.PIPE,
                                 universal_newlines=True)
-        for i in range(MAX_CONNECTIONS * 2):
-            if f"ifb{i}" not in output.stdout:
-                if self.virtual_device_in is None:
-                    self.virtual_device_in = f"ifb{i}"
-                    log.debug(f"Initializing a new ifb device: ifb{i}")
-                    self._init_ifb_device(i)
-                    continue
-                if self.virtual_device_out is None:
-                    self.virtual_device_out = f"ifb{i}"
-                    log.debug(f"Initializing a new ifb device: ifb{i}")
-                    self._init_ifb_device(i)
-                return True
+        for i in range(MAX_VIRTUAL_DEVICES):
+            virtual_device = f"{IFB_PREFIX}{i}"
+            # devices of other connections exist already (or are created concurrently by another process)
+            if re.search(rf"\b{virtual_device}\b", output.stdout) or not self._init_ifb_device(virtual_device):
+                continue
+            if self.virtual_device_in is None:
+                self.virtual_device_in = virtual_device
+                continue
+            self.virtual_device_out = virtual_device
+            return True
         log.error("Not enough virtual devices available. Could not initialize connection")
         return False
 
     def _redirect_incoming(self):
         """Sets up the tc rules to redirect incoming traffic to the virtual_device_in"""
         log.debug(f"Initializing incoming tc redirection rules for connection: '{self.name}'")
-        output = subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc add dev {self.device} ingress handle ffff:"))
-        output.check_returncode()
 
         if self.android_ip:
             filter_match = f"match ip dst {self.android_ip}/32"
@@ -269,7 +495,7 @@ class Connection:
             filter_match = "match u32 0 0"
 
         # for each excluded port, we add a high(er) prio pass action
-        remaining_prio = 1
+        remaining_prio = self._get_filter_priorities().start
         if self.exclude_ports:
             for p in self.exclude_ports:
                 output = subprocess.run(shlex.split(f"{self.__CMD_TC} filter add dev {self.device} parent ffff: "
@@ -294,7 +520,7 @@ class Connection:
         qdiscs"""
         log.debug(f"Initializing outgoing tc redirection rules for connection: '{self.name}'")
         # for each excluded port, we add a high(er) prio action to handle traffic in 1:1 (no netem)
-        remaining_prio = 1
+        remaining_prio = self._get_filter_priorities().start
         if self.exclude_ports:
             for p in self.exclude_ports:
                 output = subprocess.run(shlex.split(f"{self.__CMD_TC} filter add dev {self.device} parent 1: "
@@ -314,58 +540,76 @@ class Connection:
             log.debug(f"Emulation enabled specifically for IP: {self.android_ip}")
             output = subprocess.run(shlex.split(f"{self.__CMD_TC} filter add dev {self.device} protocol ip "
                                                 f"priority {remaining_prio} parent 1: u32 "
-                                                f"match ip src {self.android_ip}/32 flowid 1:2 action mirred egress "
-                                                f" redirect dev {self.virtual_device_out}"))
+                                                f"match ip src {self.android_ip}/32 flowid 1:{self._band} "
+                                                f"action mirred egress redirect dev {self.virtual_device_out}"))
             output.check_returncode()
         else:
-            # all other traffic is handled in 1:2 by netem
+            # all other traffic is handled in the band of the connection by netem
             output = subprocess.run(shlex.split(
                 f"{self.__CMD_TC} filter add dev {self.device} protocol all priority {remaining_prio} "
-                f"parent 1: u32 match u32 0 0 flowid 1:2 action mirred egress redirect dev {self.virtual_device_out}"))
+                f"parent 1: u32 match u32 0 0 flowid 1:{self._band} action mirred egress redirect dev "
+                f"{self.virtual_device_out}"))
             output.check_returncode()
 
     def _add_netem_qdiscs(self):
         """Add the netem qdiscs to both the device and the virtual_device_in"""
         log.debug(f"Adding netem qdiscs to both devices for connection: '{self.name}'")
 
-        # replace standard qdisc fq_codel (Fair Queueing with Controlled Delay) used by current Linux
-        # versions with a simple prio queue
-        # subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc replace dev {self.device} root pfifo")).check_returncode()
-
-        # setup a simple priority queue - all traffic from emulator will be handled by 1:2 which has netem
-        subprocess.run(shlex.split(
-            f"{self.__CMD_TC} qdisc add dev {self.device} root handle 1: prio bands 2 priomap "
-            f"0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0")).check_returncode()
-        subprocess.run(
-            shlex.split(f"{self.__CMD_TC} qdisc add dev {self.device} parent 1:1 handle 10: prio")).check_returncode()
-        subprocess.run(
-            shlex.split(f"{self.__CMD_TC} qdisc add dev {self.device} parent 1:2 handle 20: netem")).check_returncode()
+        # the prio qdisc of the device is shared (see SharedDevice) - all traffic from the emulator will be handled by
+        # the band of this connection, its netem leaf has been added when the slot was claimed
 
         subprocess.run(
             shlex.split(f"{self.__CMD_TC} qdisc add dev {self.virtual_device_in} root netem")).check_returncode()
 
     def _init(self):
         """Initiates the connection, so that it can be used"""
-        if self._get_ifb():
+        try:
+            if not self._get_ifb():
+                raise RuntimeError('Uable to initialize device.')
             self._redirect_incoming()
             self._add_netem_qdiscs()
             self._redirect_outgoing()
-            log.info(f"Connection: '{self.name}' initialized")
-        else:
-            raise RuntimeError('Uable to initialize device.')
-
-    def _update_outgoing(self, verbose=True):
+        except (RuntimeError, subprocess.CalledProcessError):
+            # the other connections using the device are not affected
+            with _CONNECTION_LOCK:
+                self.cleanup_actual_devices()
+                self.release_ifb_devices()
+            raise
+        self._tc = create_tc_backend(self.__CMD_TC, self.tc_backend)
+        log.info(f"Connection: '{self.name}' initialized (slot {self._slot} of {self.device}, tc backend: "
+                 f"{type(self._tc).__name__})")
+
+    def _apply(self, commands: List[str]):
+        """Applies tc commands (without the leading "tc") by the backend of the connection"""
+        try:
+            self._tc.run(commands)
+        except RuntimeError as err:
+            if isinstance(self._tc, SubprocessTcBackend):
+                raise
+            log.warning(f"tc backend of connection '{self.name}' failed ({err}) - running tc for each command")
+            self._close_tc_backend()
+            self._tc = SubprocessTcBackend(self.__CMD_TC)
+            self._tc.run(commands)
+
+    def _close_tc_backend(self):
+        if self._tc:
+            try:
+                self._tc.close()
+            except RuntimeError as err:
+                log.error(f"Closing tc backend of connection '{self.name}' failed: {err}")
+            self._tc = None
+
+    def _update_outgoing(self, verbose=True, event: str = EVENT_CHANGE, intended: float = None):
         """Updates the netem qdisc for outgoing traffic for this connection"""
 
-        parent_id = "parent 1:2"
+        parent_id = f"parent 1:{self._band}"
 
-        start = timer()
+        start = time.monotonic()
 
         if not self._t_init_active:
-            subprocess.run(
-                shlex.split(f"{self.__CMD_TC} qdisc change dev {self.device} "
-                            f"{parent_id} netem limit {Connection.calculate_netem_limit(self.dul, self.rul)} rate "
-                            f"{self.rul}kbit delay {self.dul}ms loss 0%")).check_returncode()
+            self._apply([f"qdisc change dev {self.device} "
+                         f"{parent_id} netem limit {Connection.calculate_netem_limit(self.dul, self.rul)} rate "
+                         f"{self.rul}kbit delay {self.dul}ms loss 0%"])
         else:
             # Variant 1: emulate T_init by packet loss during T_init
             # subprocess.run(
@@ -373,26 +617,26 @@ class Connection:
             #                f"{parent_id} netem loss 100%")).check_returncode()
             # Variant 2: emulate T_init by delaying packets
             # (should be more realistic since T_init emulates connection setup)
-            subprocess.run(
-                shlex.split(f"{self.__CMD_TC} qdisc change dev {self.device} "
-                            f"{parent_id} netem rate {self.rul}kbit delay {self.t_init}ms loss 0%")).check_returncode()
+            self._apply([f"qdisc change dev {self.device} "
+                         f"{parent_id} netem rate {self.rul}kbit delay {self.t_init}ms loss 0%"])
 
-        end = timer()
+        end = time.monotonic()
 
+        self._record_change(event, DIRECTION_UPLINK, self.rul, self.t_init if self._t_init_active else self.dul,
+                            intended, start, end)
         if verbose:
             delay = (end - start) * 1000.0
             log.debug(f"Changed egress netem qdisc for connection: '{self.name}'. It took {delay:.2f} ms.")
 
-    def _update_incoming(self, verbose=True):
+    def _update_incoming(self, verbose=True, event: str = EVENT_CHANGE, intended: float = None):
         """Updates the netem qdisc for incoming traffic for this connection"""
 
-        start = timer()
+        start = time.monotonic()
 
         if not self._t_init_active:
-            subprocess.run(shlex.split(
-                f"{self.__CMD_TC} qdisc change dev {self.virtual_device_in} "
-                f"root netem limit {Connection.calculate_netem_limit(self.ddl, self.rdl)} rate "
-                f"{self.rdl}kbit delay {self.ddl}ms loss 0%")).check_returncode()
+            self._apply([f"qdisc change dev {self.virtual_device_in} "
+                         f"root netem limit {Connection.calculate_netem_limit(self.ddl, self.rdl)} rate "
+                         f"{self.rdl}kbit delay {self.ddl}ms loss 0%"])
         else:
             # Variant 1: emulate T_init by packet loss during T_init
             # subprocess.run(shlex.split(
@@ -400,15 +644,28 @@ class Connection:
             #     f"root netem loss 100%")).check_returncode()
             # Variant 2: emulate T_init by delaying packets
             # (should be more realistic since T_init emulates connection setup)
-            subprocess.run(shlex.split(
-                f"{self.__CMD_TC} qdisc change dev {self.virtual_device_in} "
-                f"root netem rate {self.rdl}kbit delay {self.t_init}ms loss 0%")).check_returncode()
+            self._apply([f"qdisc change dev {self.virtual_device_in} "
+                         f"root netem rate {self.rdl}kbit delay {self.t_init}ms loss 0%"])
 
-        end = timer()
+        end = time.monotonic()
 
+        self._record_change(event, DIRECTION_DOWNLINK, self.rdl, self.t_init if self._t_init_active else self.ddl,
+                            intended, start, end)
         if verbose:
             delay = (end - start) * 1000.0
-            log.debug(f"Changed egress netem qdisc for connection: '{self.name}'. It took {delay:.2f} ms.")
+            log.debug(f"Changed ingress netem qdisc for connection: '{self.name}'. It took {delay:.2f} ms.")
+
+    def set_change_log(self, file_path: str = None):
+        """Logs the applied changes to the given file (see change_log), closes the current log if None"""
+        if self.change_log:
+            self.change_log.close()
+        self.change_log = NetemChangeLog(file_path) if file_path else None
+
+    def _record_change(self, event: str, direction: str, rate: float, delay: float, intended: float, start: float,
+                       end: float):
+        if self.change_log:
+            self.change_log.record(event, direction, rate, delay, start if intended is None else intended, start,
+                                   (end - start) * 1000.0, confirmed=self._tc is not None and self._tc.is_confirming)
 
     def change_parameters(self, t_init: float = None, rul: float = None, rdl: float = None, dul: float = None,
                           ddl: float = None):
@@ -460,8 +717,22 @@ class Connection:
         # Note: assumed average packet size (use a rather small size since a large limit does not hurt much)
         return math.ceil(((delay * rate) / 128) * 1.5)
 
-    def enable_netem(self, consider_t_init: bool = True, consider_dynamic_parameters: bool = True):
-        """(Re)enables the netem qdiscs for this connection"""
+    def enable_netem(self, consider_t_init: bool = True, consider_dynamic_parameters: bool = True,
+                     start_barrier: StartBarrier = None):
+        """
+        (Re)enables the netem qdiscs for this connection
+
+        If a start_barrier is given, the emulation (including T_init) starts at its epoch, i.e. together with the
+        other components of the recording.
+        """
+        self._start_barrier = None
+        self._stop_emulation.set()  # the emulation thread of a previous call does not apply any further changes
+        self._stop_trace_scheduler()
+        self._start_epoch = time.monotonic()
+        wall_epoch = None
+        if start_barrier:
+            self._start_epoch = start_barrier.wait("netem")
+            wall_epoch = start_barrier.wall_epoch
 
         if self.device is None or self.virtual_device_in is None:
             log.error(f"Cannot enable netem for connection: '{self.name}': It is missing a device")
@@ -473,23 +744,36 @@ class Connection:
 
         log.debug(f"Enabling netem for connection: '{self.name}'")
         self.emulation_is_active = True
+        if self.change_log:
+            self.change_log.record(EVENT_START, "", None, None, self._start_epoch, self._start_epoch, wall=wall_epoch)
         emulate_t_init = self.t_init > 0 and consider_t_init
         emulate_dynamic_parameters = (consider_dynamic_parameters
                                       and self.dynamic_parameters_setup is not None
-                                      and len(self.dynamic_parameters_setup.parameter_sets) > 0)
+                                      and len(self.dynamic_parameters_setup) > 0)
         if consider_dynamic_parameters and not emulate_dynamic_parameters:
             log.warning(f"Dynamic parameters cannot be considered - dynamic parameter setup is not available.")
 
         emulate_dynamically = emulate_t_init or emulate_dynamic_parameters
 
+        self._start_barrier = start_barrier
         if emulate_dynamically:
+            # a new event, so that the thread of a previous emulation which is still waiting is not resumed
+            self._stop_emulation = threading.Event()
             self._dynamic_emulation_thread = threading.Thread(target=self._emulate_dynamically,
-                                                              args=(emulate_t_init, emulate_dynamic_parameters),
+                                                              args=(emulate_t_init, emulate_dynamic_parameters,
+                                                                    self._stop_emulation),
                                                               daemon=True)
             self._dynamic_emulation_thread.start()
         else:
-            self._update_incoming()
-            self._update_outgoing()
+            self._update_incoming(event=EVENT_STATIC, intended=self._start_epoch)
+            self._update_outgoing(event=EVENT_STATIC, intended=self._start_epoch)
+            self._mark_started()
+
+    def _mark_started(self):
+        """Reports the start of the emulation to the start barrier (only the first call after enabling counts)"""
+        if self._start_barrier:
+            self._start_barrier.started("netem")
+            self._start_barrier = None
 
     def disable_netem(self):
         """Disables the netem qdiscs for this connection."""
@@ -499,136 +783,289 @@ class Connection:
             return
 
         log.debug(f"Disabling netem for connection: '{self.name}'")
-        self.emulation_is_active = False
+        self._stop_dynamic_emulation()
         params = "rate 1000Gbit loss 0.0% delay 0ms duplicate 0% reorder 0% 0%"
-        subprocess.run(
-            shlex.split(f"{self.__CMD_TC} qdisc change dev {self.device} parent 1:2 netem {params}")).check_returncode()
-        subprocess.run(shlex.split(
-            f"{self.__CMD_TC} qdisc change dev {self.virtual_device_in} root netem {params}")).check_returncode()
-
-    def _init_ifb(self, numifbs):
-        """
-                Adds the ifb module to the kernel with numifbs devices available
-
-                Parameters
-                ----------
-                numifbs : int
-                    number of ifb's available
-
-                """
+        start = time.monotonic()
+        self._apply([f"qdisc change dev {self.device} parent 1:{self._band} netem {params}",
+                     f"qdisc change dev {self.virtual_device_in} root netem {params}"])
+        end = time.monotonic()
+        for direction in [DIRECTION_UPLINK, DIRECTION_DOWNLINK]:
+            self._record_change(EVENT_DISABLE, direction, None, None, None, start, end)
+        if self.change_log:
+            self.change_log.flush()
+
+    def _init_ifb(self):
+        """Adds the ifb module to the kernel (if not loaded yet) without any devices - each connection adds its own"""
         log.debug("Adding ifb module to kernel")
-        subprocess.run(shlex.split(f"{self.__CMD_MODPROBE} ifb numifbs={numifbs}"))
-        global IFB_IS_INITIALIZED
-        IFB_IS_INITIALIZED = True
+        subprocess.run(shlex.split(f"{self.__CMD_MODPROBE} ifb numifbs=0"))
 
-    def _init_ifb_device(self, ifb_id):
+    def _init_ifb_device(self, virtual_device: str) -> bool:
         """
-                    Adds the ifb device with the specified id
+                    Adds the ifb device with the specified name
 
                     Parameters
                     ----------
-                    ifb_id : int
-                        id of the ifb device to be added
+                    virtual_device : str
+                        name of the ifb device to be added
 
+                    Returns
+                    -------
+                    bool
+                        Returns True if the device has been added, False if it could not be created (e.g. exists)
                     """
-        log.debug(f"Adding ifb{ifb_id}")
-        subprocess.run(shlex.split(f"{self.__CMD_IP} link set dev ifb{ifb_id} up"))
-
-    def _emulate_t_init(self):
-        """Emulate T_init phase where data communication is not possible"""
+        log.debug(f"Adding {virtual_device}")
+        with _virtual_device_lock():
+            output = subprocess.run(shlex.split(f"{self.__CMD_IP} link add {virtual_device} type ifb"),
+                                    stderr=subprocess.PIPE, universal_newlines=True)
+            if output.returncode != 0:
+                log.debug(f"Cannot add {virtual_device}: {output.stderr.strip()}")
+                return False
+            # identifies the rules of this connection if this process does not remove them (see SharedDevice)
+            subprocess.run(shlex.split(f"{self.__CMD_IP} link set dev {virtual_device} alias "
+                                       f"{IFB_ALIAS}/{self.device}/{self._slot}/{os.getpid()}")).check_returncode()
+        subprocess.run(shlex.split(f"{self.__CMD_IP} link set dev {virtual_device} up")).check_returncode()
+        return True
+
+    def _emulate_t_init(self, stop: threading.Event):
+        """Emulate T_init phase where data communication is not possible (ends early if stop is set)"""
         if self._t_init_active:
             raise RuntimeError('T_init emulation already active.')
         if self.t_init <= 0:
             return
         self._t_init_active = True
         log.debug("T_init active")
-        self._update_incoming()
-        self._update_outgoing()
-        time.sleep(self.t_init / 1000.0)
-        self._t_init_active = False
-        self._update_incoming()
-        self._update_outgoing()
+        try:
+            with self._emulation_lock:
+                if not self.emulation_is_active:
+                    return
+                self._update_incoming(event=EVENT_T_INIT, intended=self._start_epoch)
+                self._update_outgoing(event=EVENT_T_INIT, intended=self._start_epoch)
+            self._mark_started()
+            # T_init is measured from the start of the emulation (not from applying the rules)
+            t_init_end = self._start_epoch + self.t_init / 1000.0
+            stop.wait(max(0.0, t_init_end - time.monotonic()))
+        finally:
+            self._t_init_active = False
+        with self._emulation_lock:
+            # the emulation has been disabled (or the connection cleaned up) during T_init
+            if stop.is_set() or not self.emulation_is_active:
+                log.debug("T_init stopped")
+                return
+            self._update_incoming(event=EVENT_T_INIT_END, intended=t_init_end)
+            self._update_outgoing(event=EVENT_T_INIT_END, intended=t_init_end)
         log.debug("T_init done")
 
-    def _emulate_dynamic_parameters(self):
-        """Emulate dynamic change of netem parameters"""
-        next_change = timer()
-
-        while self.emulation_is_active:
-            for parameter_set in self.dynamic_parameters_setup.parameter_sets:
-                if self.emulation_is_active:
-                    if parameter_set.rul >= 0:
-                        self.rul = parameter_set.rul
-                    if parameter_set.rdl >= 0:
-                        self.rdl = parameter_set.rdl
-                    if parameter_set.dul >= 0:
-                        self.dul = parameter_set.dul
-                    if parameter_set.ddl >= 0:
-                        self.ddl = parameter_set.ddl
-                    self._update_incoming(self.dynamic_parameters_setup.verbose)
-                    self._update_outgoing(self.dynamic_parameters_setup.verbose)
-
-                    if parameter_set.timeframe >= 0:
-                        timeframe_in_seconds = parameter_set.timeframe / 1000.0
-                        next_change += timeframe_in_seconds
-                        if self.dynamic_parameters_setup.verbose:
-                            log.debug(
-                                f"[{timer()}] Updated all dynamic connection parameters - next change will occur at "
-                                f"{next_change} in {int((next_change - timer()) * 1000)} ms")
-                        time.sleep(next_change - timer())
-                    else:
-                        return
-
-    def _emulate_dynamically(self, emulate_t_init: bool = True, emulate_dynamic_parameters: bool = True):
-        """Emulate the dynamic conditions of a cellular network"""
+    def _emulate_dynamic_parameters(self, epoch: float, is_initialized: bool):
+        """
+        Emulate dynamic change of netem parameters
+
+        The changes are applied by a TraceScheduler, starting at epoch (time.monotonic()). Parameters which are not
+        set by a change (-1) keep the current parameters of the connection. If is_initialized, the qdiscs hold the
+        current parameters already (e.g. after T_init), so changes to the same parameters are not applied.
+        """
+        initial = {DIRECTION_UPLINK: (self.rul, self.dul),
+                   DIRECTION_DOWNLINK: (self.rdl, self.ddl)}
+        self._trace_scheduler = TraceScheduler(self.dynamic_parameters_setup.get_timelines(), self._apply_trace_change,
+                                               initial, name=self.name, is_applied=is_initialized)
+        self._trace_scheduler.start(epoch)
+
+    def _apply_trace_change(self, direction: str, rate: float, delay: float, due: float):
+        """Applies a change of the parameters of one direction (called by the TraceScheduler)"""
+        verbose = self.dynamic_parameters_setup.verbose
+        if direction == DIRECTION_UPLINK:
+            self.rul, self.dul = rate, delay
+            self._update_outgoing(verbose, EVENT_TRACE, due)
+        else:
+            self.rdl, self.ddl = rate, delay
+            self._update_incoming(verbose, EVENT_TRACE, due)
+        self._mark_started()
+
+    def _stop_trace_scheduler(self):
+        if self._trace_scheduler:
+            self._trace_scheduler.stop()
+            log.info(f"Dynamic parameters of connection '{self.name}': {self._trace_scheduler.statistics}")
+            self._trace_scheduler = None
+
+    def _emulate_dynamically(self, emulate_t_init: bool, emulate_dynamic_parameters: bool, stop: threading.Event):
+        """Emulate the dynamic conditions of a cellular network (until stop is set)"""
         log.debug(f"netem active    emulate_t_init: {emulate_t_init}  "
                   f"emulate_dynamic_parameters: {emulate_dynamic_parameters}")
         if emulate_t_init:
-            self._emulate_t_init()
-        if emulate_dynamic_parameters:
+            self._emulate_t_init(stop)
+        if not emulate_dynamic_parameters:
+            return
+        with self._emulation_lock:
+            if stop.is_set() or not self.emulation_is_active:
+                return
             if self.dynamic_parameters_setup.verbose:
                 verbose_info = "verbose: showing delay for each change"
             else:
                 verbose_info = "verbose is false - not showing delay for each update"
             log.debug(f"netem dynamic parameter updates active ({verbose_info})")
-            self._emulate_dynamic_parameters()
+            # the dynamic parameters start when T_init ends, measured from the start of the emulation
+            epoch = self._start_epoch + (self.t_init / 1000.0 if emulate_t_init else 0.0)
+            self._emulate_dynamic_parameters(epoch, is_initialized=emulate_t_init)
+
+    def _stop_dynamic_emulation(self):
+        """Stops T_init and the dynamic parameters, the emulation thread does not apply any further changes"""
+        self._stop_emulation.set()
+        with self._emulation_lock:
+            self.emulation_is_active = False
+        self._stop_trace_scheduler()
 
     def cleanup_ifb(self):
-        """Removes the ifb module from kernel"""
-        subprocess.run(shlex.split(f"{self.__CMD_MODPROBE} -r ifb"))
-        log.debug("Removed ifb module from kernel")
-        global IFB_IS_INITIALIZED
-        IFB_IS_INITIALIZED = False
+        """Removes the virtual devices of this connection (the ifb module stays loaded for other connections)"""
+        self.release_ifb_devices()
 
     def cleanup_actual_devices(self):
-        """Removes tc rules from all actual devices"""
-        for device in USED_DEVICES:
-            log.debug(f"Removing tc rules for device: {device}")
-            subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc del dev {device} root"))
-            subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc del dev {device} ingress"))
-            USED_DEVICES.remove(device)
+        """Removes the tc rules of this connection from its actual device (and the shared qdiscs if it was the last)"""
+        with _CONNECTION_LOCK:
+            shared_device = _SHARED_DEVICES.get(self.device)
+            if self._slot is None or shared_device is None or shared_device.connections.get(self._slot) is not self:
+                return
+            log.debug(f"Removing tc rules of connection '{self.name}' from device: {self.device}")
+            shared_device.remove(self._slot)
+            self._slot = None
+            if len(shared_device.connections) == 0:
+                shared_device.close()
+                del _SHARED_DEVICES[self.device]
+
+    def release_ifb_devices(self):
+        """Removes the virtual devices of this connection"""
+        for virtual_device in [self.virtual_device_in, self.virtual_device_out]:
+            if virtual_device:
+                subprocess.run(shlex.split(f"{self.__CMD_IP} link del dev {virtual_device}"), stderr=subprocess.PIPE)
+        self.virtual_device_in = None
+        self.virtual_device_out = None
 
     def cleanup(self):
-        """Removes ifb module and all tc rules for actual devices"""
-        self.emulation_is_active = False
-        self.cleanup_actual_devices()
-        self.cleanup_ifb()
-        log.info("Cleaned up all tc rules for actual devices and removed ifb module")
+        """Removes all tc rules and virtual devices of this connection (other connections are not affected)"""
+        self._stop_dynamic_emulation()
+        self._close_tc_backend()
+        self.set_change_log(None)
+        with _CONNECTION_LOCK:
+            self.cleanup_actual_devices()
+            self.release_ifb_devices()
+        log.info(f"Cleaned up all tc rules for connection: '{self.name}'")
 
     def reset_device(self):
-        """Resets all qdiscs and removes all virtual devices"""
-        log.debug(f"Reset device: {self.device}")
-        # delete possibly existing qdiscs but ignore errors - might simply not have qdiscs
-        subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc del dev {self.device} root"), stderr=subprocess.PIPE)
-        subprocess.run(shlex.split(f"{self.__CMD_TC} qdisc del dev {self.device} ingress"), stderr=subprocess.PIPE)
-        self.cleanup_ifb()
+        """Resets all qdiscs of the device (if no connection uses it)"""
+        with _CONNECTION_LOCK:
+            if self.device in _SHARED_DEVICES:
+                log.warning(f"Not resetting device {self.device} - it is used by connections")
+                return
+            _reset_qdiscs(self.device)
 
 
-def reset_device_and_ifb(net_device: str):
+def _reset_qdiscs(net_device: str):
     log.debug(f"Reset device: {net_device}")
+    # delete possibly existing qdiscs but ignore errors - might simply not have qdiscs
     subprocess.run(shlex.split(f"{CMD_TC} qdisc del dev {net_device} root"), stderr=subprocess.PIPE)
     subprocess.run(shlex.split(f"{CMD_TC} qdisc del dev {net_device} ingress"), stderr=subprocess.PIPE)
-    subprocess.run(shlex.split(f"{CMD_MODPROBE} -r ifb"))
-    log.debug("Removed ifb module from kernel")
-    global IFB_IS_INITIALIZED
-    IFB_IS_INITIALIZED = False
+
+
+def reset_device_and_ifb(net_device: str):
+    """
+    Removes the rules of connections which have not been cleaned up (e.g. after a crash) from the device
+
+    The rules of connections of running processes are kept - the device is only reset completely if there are none.
+    """
+    with _CONNECTION_LOCK:
+        if net_device in _SHARED_DEVICES:
+            log.warning(f"Not resetting device {net_device} - it is used by connections")
+            return
+        _remove_stale_connections(net_device)
+        virtual_devices = _get_virtual_devices()
+        if any(label is not None and label[0] == net_device for label in virtual_devices.values()):
+            log.info(f"Not resetting device {net_device} - it is used by connections of another process")
+            return
+        _reset_qdiscs(net_device)
+        # virtual devices without label (listed while holding the lock) have been left by a process which crashed
+        # while adding them - devices which are being added by running processes are labeled already
+        with _virtual_device_lock():
+            for virtual_device, label in _get_virtual_devices().items():
+                if label is None:
+                    subprocess.run(shlex.split(f"{CMD_IP} link del dev {virtual_device}"), stderr=subprocess.PIPE)
+        log.debug(f"Reset device {net_device} and removed unused virtual devices {IFB_PREFIX}*")
+
+
+class SimulatedConnection:
+    """
+        Connection with the interface of Connection which does not modify any network device (see --simulate)
+
+        The emulated delay is not applied to real traffic but reported to the SimulatedDevice with the ip address
+        android_ip, so that the RTT measured by the device (e.g. for the sanity check) includes it.
+        """
+
+    def __init__(self, name, device_name, t_init: float = None, rul: float = None, rdl: float = None, dul: float = None,
+                 ddl: float = None, android_ip: ipaddress = None, exclude_ports: List[int] = None,
+                 dynamic_parameters_setup: DynamicParametersSetup = None, tc_backend: str = TC_BACKEND_BATCH):
+        self.device = device_name
+        self.name = name
+        self.virtual_device_in = None
+        self.virtual_device_out = None
+        self.t_init = t_init
+        self.rul = rul
+        self.rdl = rdl
+        self.dul = dul
+        self.ddl = ddl
+        self.exclude_ports = exclude_ports
+        self.dynamic_parameters_setup = dynamic_parameters_setup
+        self.android_ip = android_ip
+        self.tc_backend = tc_backend
+        self.change_log: NetemChangeLog = None
+        self.emulation_is_active = False
+        log.debug(f"Simulated connection '{self.name}' (no network device is modified)")
+
+    def change_parameters(self, t_init: float = None, rul: float = None, rdl: float = None, dul: float = None,
+                          ddl: float = None):
+        if t_init is not None:
+            self.t_init = t_init
+        if rul is not None:
+            self.rul = rul
+        if rdl is not None:
+            self.rdl = rdl
+        if dul is not None:
+            self.dul = dul
+        if ddl is not None:
+            self.ddl = ddl
+        if self.emulation_is_active:
+            _SIMULATED_DELAYS[self.android_ip] = self.dul + self.ddl
+
+    def enable_netem(self, consider_t_init: bool = True, consider_dynamic_parameters: bool = True,
+                     start_barrier: StartBarrier = None):
+        epoch = start_barrier.wait("netem") if start_barrier else time.monotonic()
+        log.debug(f"Enabling simulated netem for connection: '{self.name}'")
+        self.emulation_is_active = True
+        _SIMULATED_DELAYS[self.android_ip] = self.dul + self.ddl
+        if start_barrier:
+            start_barrier.started("netem")
+        if self.change_log:
+            self.change_log.record(EVENT_START, "", None, None, epoch, epoch,
+                                   wall=start_barrier.wall_epoch if start_barrier else None)
+            self.change_log.record(EVENT_STATIC, DIRECTION_UPLINK, self.rul, self.dul, epoch, time.monotonic())
+            self.change_log.record(EVENT_STATIC, DIRECTION_DOWNLINK, self.rdl, self.ddl, epoch, time.monotonic())
+
+    def disable_netem(self):
+        log.debug(f"Disabling simulated netem for connection: '{self.name}'")
+        self.emulation_is_active = False
+        _SIMULATED_DELAYS.pop(self.android_ip, None)
+        if self.change_log:
+            now = time.monotonic()
+            for direction in [DIRECTION_UPLINK, DIRECTION_DOWNLINK]:
+                self.change_log.record(EVENT_DISABLE, direction, None, None, now, now)
+            self.change_log.flush()
+
+    def set_change_log(self, file_path: str = None):
+        if self.change_log:
+            self.change_log.close()
+        self.change_log = NetemChangeLog(file_path) if file_path else None
+
+    def cleanup(self):
+        self.disable_netem()
+        self.set_change_log(None)
+
+
+def get_simulated_delay(android_ip: ipaddress) -> float:
+    """Returns the round-trip delay [ms] currently emulated by a SimulatedConnection for the given ip address"""
+    return _SIMULATED_DELAYS.get(android_ip, 0.0)
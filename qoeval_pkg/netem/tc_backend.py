@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Backends applying tc commands of a network emulation connection
+
+Changing the netem parameters of a Connection requires two tc commands (one per direction). Forking "sudo tc" for
+each of them takes several milliseconds, which delays every step of a dynamic parameter trace. The BatchTcBackend
+keeps one "tc -batch" process per connection and writes the commands to its stdin, so a change only costs a write to
+a pipe. The SubprocessTcBackend runs each command as a process of its own (as before) and is used if the batch
+process cannot be started or has stopped.
+"""
+
+import logging as log
+import shlex
+import subprocess
+import threading
+from typing import List
+
+TC_BACKEND_BATCH = "batch"
+TC_BACKEND_SUBPROCESS = "subprocess"
+TC_BACKENDS = [TC_BACKEND_BATCH, TC_BACKEND_SUBPROCESS]
+
+BATCH_CLOSE_TIMEOUT = 5.0  # max. time [s] to wait for the tc batch process to finish the remaining commands
+
+
+class TcBackend:
+    """
+        Applies tc commands, e.g. "qdisc change dev eth0 parent 1:2 netem rate 1000kbit"
+
+        Attributes
+        ----------
+        cmd_tc : str
+            Command running tc, e.g. "sudo tc"
+        """
+
+    # True if run() returns after tc has executed the commands, False if it returns once they have been handed over
+    is_confirming = True
+
+    def __init__(self, cmd_tc: str):
+        self.cmd_tc = cmd_tc
+
+    def run(self, commands: List[str]):
+        """Applies the commands (without the leading "tc") in the given order, raises a RuntimeError on failure"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SubprocessTcBackend(TcBackend):
+    """Runs each tc command as a process of its own"""
+
+    def run(self, commands: List[str]):
+        for command in commands:
+            subprocess.run(shlex.split(f"{self.cmd_tc} {command}")).check_returncode()
+
+
+class BatchTcBackend(TcBackend):
+    """
+        Writes tc commands to a persistent "tc -batch -" process
+
+        tc executes each line as soon as it has been read, but does not acknowledge it. Failed commands are reported
+        on stderr (tc continues with the next command due to -force), so an error is raised by the next call of run()
+        or close() after it has been reported.
+        """
+
+    is_confirming = False
+
+    def __init__(self, cmd_tc: str):
+        super().__init__(cmd_tc)
+        self._lock = threading.Lock()
+        self._errors = []
+        self._process = subprocess.Popen(shlex.split(f"{cmd_tc} -force -batch -"), stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True,
+                                         bufsize=1)
+        self._stderr_thread = threading.Thread(target=self._read_errors, name="tc-batch-stderr", daemon=True)
+        self._stderr_thread.start()
+
+    def _read_errors(self):
+        for line in self._process.stderr:
+            line = line.strip()
+            if line:
+                log.error(f"tc batch: {line}")
+                with self._lock:
+                    self._errors.append(line)
+
+    def _check_errors(self):
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise RuntimeError(f"tc batch command failed: {'; '.join(errors)}")
+
+    @property
+    def is_running(self) -> bool:
+        return self._process.poll() is None
+
+    def run(self, commands: List[str]):
+        self._check_errors()
+        if not self.is_running:
+            raise RuntimeError(f"tc batch process has stopped (return code {self._process.returncode})")
+        try:
+            self._process.stdin.write("".join(f"{command}\n" for command in commands))
+            self._process.stdin.flush()
+        except OSError as err:
+            raise RuntimeError(f"Cannot write to tc batch process: {err}")
+
+    def close(self):
+        if self._process.stdin and not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self._process.wait(timeout=BATCH_CLOSE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log.warning("tc batch process did not finish - terminating it")
+            self._process.terminate()
+            self._process.wait()
+        self._stderr_thread.join(timeout=BATCH_CLOSE_TIMEOUT)
+        self._check_errors()
+
+
+def create_tc_backend(cmd_tc: str, backend: str = TC_BACKEND_BATCH) -> TcBackend:
+    """Returns a backend of the given kind (see TC_BACKENDS), falls back to the SubprocessTcBackend"""
+    if backend not in TC_BACKENDS:
+        raise RuntimeError(f"Unknown tc backend \"{backend}\" - supported: {', '.join(TC_BACKENDS)}")
+    if backend == TC_BACKEND_BATCH:
+        try:
+            return BatchTcBackend(cmd_tc)
+        except OSError as err:
+            log.warning(f"Cannot start tc batch process ({err}) - running tc for each command")
+    return SubprocessTcBackend(cmd_tc)
@@ -0,0 +1,236 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Scheduling of dynamic network emulation parameters
+
+A dynamic parameter trace is given as one Timeline per direction (uplink: rul/dul, downlink: rdl/ddl), so both
+directions can change independently. The TraceScheduler keeps the next change of each direction in a heap ordered
+by its due time and applies it on a thread of its own. Due times are computed from the start of the trace (not from
+the previous change), so the time needed for applying a change does not accumulate. A change which is late is applied
+at once; if a later change of the same direction is already due as well, the changes in between are skipped (the
+values they set are merged into the later change). A change which does not modify the current rate and delay of its
+direction is not applied at all. The deviation of each change
+from its due time is recorded as JitterStatistics.
+"""
+
+import heapq
+import logging as log
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence
+
+DIRECTION_UPLINK = "uplink"
+DIRECTION_DOWNLINK = "downlink"
+
+SPIN_THRESHOLD = 0.002  # remaining time [s] until a change which is waited for by busy-waiting instead of sleeping
+SCHEDULER_PRIORITY = 10  # SCHED_FIFO priority of the scheduler thread (if permitted, e.g. by CAP_SYS_NICE)
+
+
+@dataclass
+class Timeline:
+    """
+        Changes of the parameters of one direction
+
+        The i-th change sets the rate and delay for durations[i] seconds. A negative rate or delay leaves the value
+        unchanged, a negative duration keeps the change in effect until the end of the emulation. The sequences can
+        be lists or NumPy arrays.
+        """
+    durations: Sequence[float]  # [s]
+    rates: Sequence[float]  # [kbit/s]
+    delays: Sequence[float]  # [ms]
+    loop: bool = True  # repeat the timeline when its end has been reached
+
+    def __post_init__(self):
+        if not len(self.durations) == len(self.rates) == len(self.delays):
+            raise RuntimeError("Durations, rates and delays of a timeline differ in length")
+        if self.loop and len(self.durations) > 0 and not any(duration > 0 for duration in self.durations):
+            raise RuntimeError("A looping timeline needs a positive duration")
+
+    def __len__(self):
+        return len(self.durations)
+
+
+@dataclass
+class JitterStatistics:
+    """Deviation of the applied changes from their due times"""
+    applied: int = 0  # number of changes applied
+    unchanged: int = 0  # number of changes not applied since they did not modify the parameters
+    skipped: int = 0  # number of changes skipped since a later change of the same direction was due already
+    mean_lateness: float = 0.0  # [s]
+    max_lateness: float = 0.0  # [s]
+    max_apply_duration: float = 0.0  # max. time [s] needed for applying a change
+    _lateness_m2: float = field(default=0.0, repr=False)
+
+    def add(self, lateness: float, apply_duration: float):
+        self.applied += 1
+        # running mean and variance (Welford)
+        delta = lateness - self.mean_lateness
+        self.mean_lateness += delta / self.applied
+        self._lateness_m2 += delta * (lateness - self.mean_lateness)
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.max_apply_duration = max(self.max_apply_duration, apply_duration)
+
+    @property
+    def std_lateness(self) -> float:
+        return math.sqrt(self._lateness_m2 / self.applied) if self.applied > 1 else 0.0
+
+    def __str__(self):
+        return f"{self.applied} changes applied, {self.unchanged} unchanged, {self.skipped} skipped - lateness " \
+               f"mean {self.mean_lateness * 1000.0:.2f} ms, std {self.std_lateness * 1000.0:.2f} ms, " \
+               f"max {self.max_lateness * 1000.0:.2f} ms, max. apply duration {self.max_apply_duration * 1000.0:.2f} ms"
+
+
+class TraceScheduler:
+    """
+        Applies the changes of the timelines of both directions at their due times
+
+        Attributes
+        ----------
+        timelines : Dict[str, Timeline]
+            Timeline of each direction (DIRECTION_UPLINK, DIRECTION_DOWNLINK)
+        apply : Callable[[str, float, float, float], None]
+            Called with direction, rate [kbit/s], delay [ms] and due time (time.monotonic()) for applying a change
+            (rate and delay are not negative, unchanged values are replaced by the values in effect)
+        initial : Dict[str, Tuple[float, float]]
+            Rate and delay of each direction before the first change (used for the values a change does not set)
+        is_applied : bool
+            The initial rate and delay are in effect already (changes to the same values are not applied)
+        statistics : JitterStatistics
+            Deviation of the applied changes from their due times
+        """
+
+    def __init__(self, timelines: Dict[str, Timeline], apply: Callable[[str, float, float, float], None],
+                 initial: Dict[str, tuple] = None, name: str = "trace", is_applied: bool = False):
+        self.timelines = {direction: timeline for direction, timeline in timelines.items() if len(timeline) > 0}
+        self.apply = apply
+        self.initial = initial if initial else {}
+        self.is_applied = is_applied
+        self.name = name
+        self.statistics = JitterStatistics()
+        self.first_change = threading.Event()  # set when the first change has been applied
+        self._current = {}  # direction: (rate, delay) in effect
+        self._values = {}  # direction: (rate, delay) set by the changes so far (or initial)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error = None
+
+    def start(self, epoch: float = None):
+        """Starts applying the changes, the timelines start at epoch (time.monotonic(), default: now)"""
+        if self._thread:
+            raise RuntimeError(f"Trace scheduler {self.name} has already been started")
+        epoch = time.monotonic() if epoch is None else epoch
+        self._thread = threading.Thread(target=self._run, args=(epoch,), name=f"{self.name}-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops applying changes (the parameters in effect are not modified)"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def join(self, timeout: float = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """Returns the error which stopped the scheduler (None if there was none)"""
+        return self._error
+
+    def _run(self, epoch: float):
+        _raise_priority()
+        self._values = dict(self.initial)
+        self._current = dict(self.initial) if self.is_applied else {}
+        # heap of (due time [s], sequence number, direction, index of the change in its timeline)
+        events = [(epoch, sequence, direction, 0) for sequence, direction in enumerate(sorted(self.timelines))]
+        heapq.heapify(events)
+        try:
+            while events and not self._stop.is_set():
+                due, sequence, direction, index = heapq.heappop(events)
+                if not self._wait_until(due):
+                    return
+                # skip changes of this direction which have been overtaken by a later one which is due already
+                timeline = self.timelines[direction]
+                next_event = self._get_next(timeline, index, due)
+                while next_event is not None and next_event[0] <= time.monotonic():
+                    self.statistics.skipped += 1
+                    self._merge(direction, timeline, index)
+                    due, index = next_event
+                    next_event = self._get_next(timeline, index, due)
+                self._apply(direction, timeline, index, due)
+                if next_event is not None:
+                    heapq.heappush(events, (next_event[0], sequence, direction, next_event[1]))
+        except Exception as err:
+            log.error(f"Trace scheduler {self.name} failed: {err}")
+            self._error = err
+        finally:
+            log.debug(f"Trace scheduler {self.name} finished: {self.statistics}")
+
+    @staticmethod
+    def _get_next(timeline: Timeline, index: int, due: float) -> Optional[tuple]:
+        """Returns due time and index of the change following the given one (None if there is none)"""
+        duration = float(timeline.durations[index])
+        if duration < 0:
+            return None
+        if index + 1 < len(timeline):
+            return due + duration, index + 1
+        if not timeline.loop:
+            return None
+        return due + duration, 0
+
+    def _wait_until(self, due: float) -> bool:
+        """Waits until the due time (monotonic), returns False if the scheduler has been stopped"""
+        while True:
+            remaining = due - time.monotonic()
+            if remaining <= 0:
+                return not self._stop.is_set()
+            if remaining > SPIN_THRESHOLD:
+                if self._stop.wait(remaining - SPIN_THRESHOLD):
+                    return False
+            elif self._stop.is_set():
+                return False
+
+    def _merge(self, direction: str, timeline: Timeline, index: int):
+        """Updates the values of the direction by the values set by a change (negative values are not set)"""
+        rate, delay = self._values.get(direction, (-1.0, -1.0))
+        if timeline.rates[index] >= 0:
+            rate = float(timeline.rates[index])
+        if timeline.delays[index] >= 0:
+            delay = float(timeline.delays[index])
+        self._values[direction] = (rate, delay)
+
+    def _apply(self, direction: str, timeline: Timeline, index: int, due: float):
+        self._merge(direction, timeline, index)
+        rate, delay = self._values[direction]
+        if rate < 0 or delay < 0:
+            raise RuntimeError(f"Rate or delay of the {direction} is neither set by the trace nor given initially")
+        if (rate, delay) == self._current.get(direction):
+            self.statistics.unchanged += 1
+            self.first_change.set()
+            return
+        start = time.monotonic()
+        self.apply(direction, rate, delay, due)
+        end = time.monotonic()
+        self._current[direction] = (rate, delay)
+        self.statistics.add(start - due, end - start)
+        self.first_change.set()
+
+
+def _raise_priority():
+    """Runs the calling thread with real-time priority if permitted (Linux only)"""
+    try:
+        os.sched_setscheduler(threading.get_native_id(), os.SCHED_FIFO, os.sched_param(SCHEDULER_PRIORITY))
+        log.debug("Trace scheduler runs with real-time priority")
+    except (AttributeError, OSError) as err:
+        log.debug(f"Trace scheduler runs with normal priority: {err}")
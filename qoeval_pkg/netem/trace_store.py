@@ -0,0 +1,269 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Storage of dynamic parameter traces
+
+A ThroughputTrace holds the parameter sets of a dynamic network emulation as a NumPy array with the columns of the
+CSV files in the DynamicParameterPath (timeframe [ms], rul, rdl [kbit/s], dul, ddl [ms], -1 leaves a parameter
+unchanged), so hour-long traces with a resolution of milliseconds neither need a Python object per parameter set nor
+have to be copied into memory: traces stored as ".npy" files are memory-mapped. The following formats are imported:
+
+- CSV files as written by DynamicParametersSetup.save_to_csv
+- NumPy ".npy" files holding such an array
+- Mahimahi packet delivery traces (".down" and optionally ".up" with the same base name): each line is the time [ms]
+  at which a packet of MAHIMAHI_PACKET_SIZE bytes can be delivered, the rate is computed for bins of
+  MAHIMAHI_BIN_DURATION
+
+The TraceStore caches the traces used recently (keyed by file, modification time and rate), so stimuli using the
+same trace do not parse it again. Imported traces are also stored as ".npy" files in TRACE_CACHE_PATH and
+memory-mapped from then on.
+"""
+
+import collections
+import hashlib
+import logging as log
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from qoeval_pkg.netem.trace_scheduler import Timeline, DIRECTION_UPLINK, DIRECTION_DOWNLINK
+
+TRACE_CACHE_PATH = os.path.join(os.path.expanduser("~/.cache/qoeval/"), "traces")
+TRACE_COLUMNS = ["timeframe", "rul", "rdl", "dul", "ddl"]
+TRACE_CACHE_SIZE = 16  # number of traces kept by the TraceStore
+MAHIMAHI_PACKET_SIZE = 1500  # size [B] of a packet delivery opportunity of a Mahimahi trace
+MAHIMAHI_BIN_DURATION = 100  # time [ms] for which the rate of a Mahimahi trace is computed
+MIN_TRACE_RATE = 1  # min. rate [kbit/s] of a trace (a netem rate of 0 would not limit the rate at all)
+
+_EXTENSION_MAHIMAHI_DOWN = ".down"
+_EXTENSION_MAHIMAHI_UP = ".up"
+
+
+class ThroughputTrace:
+    """
+        Dynamic parameters of a network emulation, usable as dynamic_parameters_setup of a Connection
+
+        Attributes
+        ----------
+        parameters : np.ndarray
+            One row per parameter set with the columns TRACE_COLUMNS
+        uplink_parameters : np.ndarray
+            If given, the uplink parameters (rul, dul) are taken from these rows, independently of parameters
+        verbose : bool
+            Log each change of the parameters
+        """
+
+    def __init__(self, parameters: np.ndarray, uplink_parameters: np.ndarray = None, verbose: bool = False):
+        for array in [parameters, uplink_parameters]:
+            if array is not None and (array.ndim != 2 or array.shape[1] != len(TRACE_COLUMNS)):
+                raise RuntimeError(f"Trace has shape {array.shape} - expected (n, {len(TRACE_COLUMNS)})")
+        self.parameters = parameters
+        self.uplink_parameters = uplink_parameters
+        self.verbose = verbose
+        self._timelines = None
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def get_timelines(self) -> Dict[str, Timeline]:
+        """Returns the timeline of each direction (the rates and delays are views of the trace, not copies)"""
+        if self._timelines is None:
+            uplink = self.uplink_parameters if self.uplink_parameters is not None else self.parameters
+            self._timelines = {DIRECTION_UPLINK: Timeline(uplink[:, 0] / 1000.0, uplink[:, 1], uplink[:, 3]),
+                               DIRECTION_DOWNLINK: Timeline(self.parameters[:, 0] / 1000.0, self.parameters[:, 2],
+                                                            self.parameters[:, 4])}
+        return self._timelines
+
+    def get_duration(self) -> float:
+        """Returns the duration [s] of one pass of the (downlink) trace"""
+        return float(np.sum(self.parameters[:, 0], where=self.parameters[:, 0] > 0)) / 1000.0
+
+    def get_mean_rate(self) -> float:
+        """Returns the time-weighted mean download rate [kbit/s] of the trace"""
+        timeframes = np.clip(self.parameters[:, 0], 0, None)
+        is_set = self.parameters[:, 2] >= 0
+        if not np.any(timeframes[is_set] > 0):
+            return 0.0
+        return float(np.average(self.parameters[is_set, 2], weights=timeframes[is_set]))
+
+    def scaled_to_rate(self, rate: float) -> 'ThroughputTrace':
+        """Returns a copy of the trace whose download rates are scaled to the given mean rate [kbit/s]"""
+        mean_rate = self.get_mean_rate()
+        if mean_rate <= 0:
+            raise RuntimeError("Trace without download rate cannot be scaled")
+        parameters = np.array(self.parameters, dtype=np.float64)
+        is_set = parameters[:, 2] >= 0
+        parameters[is_set, 2] = np.maximum(parameters[is_set, 2] * (rate / mean_rate), MIN_TRACE_RATE)
+        return ThroughputTrace(parameters, self.uplink_parameters, self.verbose)
+
+    def save(self, file_path: str):
+        """Saves the trace as .npy file (the uplink parameters, if any, as "{file_path}.up.npy")"""
+        np.save(file_path, np.ascontiguousarray(self.parameters, dtype=np.float64))
+        if self.uplink_parameters is not None:
+            np.save(_get_uplink_path(file_path), np.ascontiguousarray(self.uplink_parameters, dtype=np.float64))
+
+
+def _get_uplink_path(file_path: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}.up.npy"
+
+
+def load_npy(file_path: str, verbose: bool = False) -> ThroughputTrace:
+    """Loads a trace saved by ThroughputTrace.save (memory-mapped, read-only)"""
+    uplink_path = _get_uplink_path(file_path)
+    uplink = np.load(uplink_path, mmap_mode='r') if os.path.isfile(uplink_path) else None
+    return ThroughputTrace(np.load(file_path, mmap_mode='r'), uplink, verbose)
+
+
+def load_csv(file_path: str, verbose: bool = False) -> ThroughputTrace:
+    """Loads a trace from a CSV file with a header line and the columns TRACE_COLUMNS (missing delays are -1)"""
+    data = np.loadtxt(file_path, delimiter=",", skiprows=1, ndmin=2, dtype=np.float64)
+    if data.shape[0] > 0 and not 3 <= data.shape[1] <= len(TRACE_COLUMNS):
+        raise RuntimeError(f"Trace {file_path} has {data.shape[1]} columns - expected {', '.join(TRACE_COLUMNS)}")
+    parameters = np.full((data.shape[0], len(TRACE_COLUMNS)), -1.0)
+    parameters[:, :data.shape[1]] = data
+    return ThroughputTrace(parameters, verbose=verbose)
+
+
+def _mahimahi_to_parameters(file_path: str, rate_column: int, bin_duration: int) -> np.ndarray:
+    timestamps = np.loadtxt(file_path, dtype=np.int64, ndmin=1)
+    if len(timestamps) == 0:
+        raise RuntimeError(f"Mahimahi trace {file_path} is empty")
+    # the trace repeats after its last timestamp
+    period = max(int(timestamps[-1]), 1)
+    counts = np.bincount(np.minimum(timestamps, period - 1) // bin_duration,
+                         minlength=(period + bin_duration - 1) // bin_duration)
+    parameters = np.full((len(counts), len(TRACE_COLUMNS)), -1.0)
+    parameters[:, 0] = bin_duration
+    parameters[-1, 0] = period - bin_duration * (len(counts) - 1)
+    # bits per ms are kbit/s
+    parameters[:, rate_column] = np.maximum(counts * MAHIMAHI_PACKET_SIZE * 8.0 / parameters[:, 0], MIN_TRACE_RATE)
+    return parameters
+
+
+def load_mahimahi(file_path: str, bin_duration: int = MAHIMAHI_BIN_DURATION,
+                  verbose: bool = False) -> ThroughputTrace:
+    """
+        Loads a Mahimahi downlink trace (and the uplink trace with the same base name and the extension ".up", if it
+        exists)
+        """
+    parameters = _mahimahi_to_parameters(file_path, TRACE_COLUMNS.index("rdl"), bin_duration)
+    uplink_path = f"{os.path.splitext(file_path)[0]}{_EXTENSION_MAHIMAHI_UP}"
+    uplink = None
+    if file_path.endswith(_EXTENSION_MAHIMAHI_DOWN) and os.path.isfile(uplink_path):
+        uplink = _mahimahi_to_parameters(uplink_path, TRACE_COLUMNS.index("rul"), bin_duration)
+    return ThroughputTrace(parameters, uplink, verbose)
+
+
+def load_trace(file_path: str, verbose: bool = False) -> ThroughputTrace:
+    """Loads a trace, the format is determined by the extension of the file (.npy, .csv, otherwise Mahimahi)"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".npy":
+        return load_npy(file_path, verbose)
+    if extension == ".csv":
+        return load_csv(file_path, verbose)
+    return load_mahimahi(file_path, verbose=verbose)
+
+
+def find_trace_file(directory: str, variant: str, rate: float) -> Optional[Tuple[str, Optional[float]]]:
+    """
+        Returns the file of a dynamic parameter variant for the given download rate [kbit/s] and the rate the trace
+        has to be scaled to (None if the file is specific to the rate) or None if there is no file
+
+        Rate specific files ("{variant}_{rate}.npy" or ".csv") are preferred over a trace of the variant
+        ("{variant}.npy" or a Mahimahi trace "{variant}.down") which is scaled to the rate.
+        """
+    for file_name, scaled_rate in [(f"{variant}_{int(rate)}.npy", None), (f"{variant}_{int(rate)}.csv", None),
+                                   (f"{variant}.npy", rate), (f"{variant}{_EXTENSION_MAHIMAHI_DOWN}", rate)]:
+        file_path = os.path.join(directory, file_name)
+        if os.path.isfile(file_path):
+            return file_path, scaled_rate
+    return None
+
+
+class TraceStore:
+    """
+        Least recently used traces
+
+        Attributes
+        ----------
+        cache_dir : str
+            Directory in which imported traces are stored as .npy files (not stored if None)
+        size : int
+            Number of traces kept in memory
+        """
+
+    def __init__(self, cache_dir: str = None, size: int = TRACE_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        self._traces = collections.OrderedDict()  # (file path, modification time, rate): ThroughputTrace
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str, rate: float = None, verbose: bool = False) -> ThroughputTrace:
+        """
+            Returns the trace of the given file
+
+            Parameters
+            ----------
+            file_path : str
+                Path of the trace
+            rate : float, optional
+                Mean download rate [kbit/s] the trace is scaled to (e.g. if one trace is used for stimuli of
+                different rates), not scaled if None
+            verbose : bool
+                Log each change of the parameters when the trace is emulated
+            """
+        file_path = os.path.abspath(file_path)
+        key = (file_path, os.stat(file_path).st_mtime_ns, rate)
+        with self._lock:
+            trace = self._traces.get(key)
+            if trace is not None:
+                self._traces.move_to_end(key)
+        if trace is None:
+            trace = self._load(file_path, key[1])
+            if rate is not None:
+                trace = trace.scaled_to_rate(rate)
+            with self._lock:
+                self._traces[key] = trace
+                while len(self._traces) > self.size:
+                    self._traces.popitem(last=False)
+        # a trace is shared by all users of the store, only the logging differs
+        return ThroughputTrace(trace.parameters, trace.uplink_parameters, verbose)
+
+    def _load(self, file_path: str, modification_time: int) -> ThroughputTrace:
+        if self.cache_dir is None or file_path.lower().endswith(".npy"):
+            return load_trace(file_path)
+        digest = hashlib.sha256(f"{file_path}:{modification_time}".encode()).hexdigest()[:16]
+        cache_path = os.path.join(self.cache_dir, f"{os.path.basename(file_path)}.{digest}.npy")
+        if not os.path.isfile(cache_path):
+            trace = load_trace(file_path)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                trace.save(cache_path)
+            except OSError as err:
+                log.warning(f"Cannot store trace {file_path} in {self.cache_dir}: {err}")
+                return trace
+            log.debug(f"Stored trace {file_path} as {cache_path}")
+        return load_npy(cache_path)
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+_TRACE_STORE: Optional[TraceStore] = None
+_TRACE_STORE_LOCK = threading.Lock()
+
+
+def get_trace_store() -> TraceStore:
+    """Returns the trace store shared by all coordinators of the process"""
+    global _TRACE_STORE
+    with _TRACE_STORE_LOCK:
+        if _TRACE_STORE is None:
+            _TRACE_STORE = TraceStore(TRACE_CACHE_PATH)
+        return _TRACE_STORE
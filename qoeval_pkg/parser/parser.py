@@ -7,11 +7,12 @@
 
 """Module for parsing .csv stimuli-parameter files"""
 
-# TODO: Refactor to reduce redundant code when detecting url, start, end, parameter names / named tuple
-
 from collections import namedtuple
+import hashlib
 import os
-from typing import List
+import pickle
+import sys
+from typing import Dict, List, Optional, Tuple
 
 import logging as log
 from importlib_resources import files
@@ -23,590 +24,599 @@ STIMULI_PARAMETER_NAMES = ['t_init', 'rul', 'rdl', 'dul', 'ddl', 'stimulus', 'co
 SET_PARAMETER_NAMES = [ 'link', 'start', 'end']
 PARAMETER_NAMES = STIMULI_PARAMETER_NAMES + SET_PARAMETER_NAMES
 
-file = []
-file_loaded = False
-
-
-def load_parameter_file(file_path):
-    """
-       Loads the specified file globally. If no file is specified it will load CSV_FILENAME.
-
-       Reads the contents of the given file and saves it in the global variable "file" as a list of strings
-       containing the lines of the file.
-
-       Parameters
-       ----------
-       file_path : str, optional
-            File path of the file to be loaded, default is the constant CSV_FILENAME
-
-       """
-    global file
-    global file_loaded
-
-    parselog.setLevel('WARNING')
-
-    try:
-        file = open(file_path).read().split("\n")
-        file_loaded = True
-        if not is_correct_parameter_file():
-            log.warning(f"Parameter file \"{file_path}\" is not fully parsable - some use-cases might not have valid "
-                        f"parameter values. Please check the format of the csv file.")
-    except FileNotFoundError:
-        log.error(f"Parameter file \"{file_path}\" not found")
-        raise FileNotFoundError
-
-
-def get_type_ids():
-    """
-        Returns a list of all type id's within the loaded file
-
-        The provided parameter file identifies each set of parameters with an ID in the following form
-        "VS-B-4"
-        The first part of this id corresponds to the type of capture (Video Streaming/Web Browsing) and is
-        therefore called type_id in this module.
-
-
-        Returns
-        -------
-        *str
-            A list of all type id's in the file
-
-        """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    type_ids = []
-
-    next_line_has_id = False
-
-    for line in file:
-
-        if next_line_has_id:
-            next_line_has_id = False
-            type_id = line.split(";")[0].split("-")[0]
-            if type_id not in type_ids:
-                type_ids.append(type_id)
-
-        if line.startswith("Stimulus-ID"):
-            next_line_has_id = True
-
-    return type_ids
-
-
-def get_table_ids(type_id):
-    """
-            Returns a list of all table id's belonging to the specified type
-
-            The provided paramter file identifies each set of parameters with an ID in the following form
-            "VS-B-4"
-            The second part of this id corresponds to a table of entries and is
-            therefore called table_id in this module.
-
-            Parameters
-            ----------
-            type_id : str
-                The type id of which the table id's should be returned.
-
-            Returns
-            -------
-            *str
-                Returns a list of all table id's belonging to the specified type
-
-            """
-
-    if not file_loaded:
-        log.error("No file loaded")
-        return
+# one parsed line of the parameter file, identified by its "type-table-entry" key
+# (parameters holds the values of STIMULI_PARAMETER_NAMES, line_nr is the index of the line within the file)
+ParameterRecord = namedtuple("ParameterRecord", "type_id table_id entry_id codec parameters error line_nr")
+# information shared by all entries of a table (taken from the description of the table's first entry)
+TableRecord = namedtuple("TableRecord", "type_id table_id link start end entry_ids")
 
-    table_ids = []
+# compiled parameter tables are cached to avoid re-parsing unchanged parameter files
+PARAMETER_CACHE_PATH = os.path.join(os.path.expanduser("~/.cache/qoeval/"), "parameter_tables")
+PARAMETER_CACHE_VERSION = 2  # increment whenever the structure of ParameterTable changes
 
-    next_line_has_id = False
+_COMPACT_REMOVED_COLUMNS = (1, 7, 12, 13, 14)  # columns which are not part of compact exports
+EXPORT_STAMP_SUFFIX = ".export"  # sidecar of exported tables: path and content hash of the exported parameter file
 
-    for line in file:
-
-        if next_line_has_id:
-            next_line_has_id = False
-            if line.split(";")[0].split("-")[0] == type_id:
-                id = line.split(";")[0].split("-")[1]
-                if id not in table_ids:
-                    table_ids.append(line.split(";")[0].split("-")[1])
-
-        if line.startswith("Stimulus-ID"):
-            next_line_has_id = True
-
-    return table_ids
-
-
-def get_entry_ids(type_id, table_id):
-    """
-    Returns a list of the entry id's belonging to the specified type
-
-    The provided paramter file identifies each set of parameters with an ID in the following form
-    "VS-B-4"
-    The third part of this id corresponds to an entry of parameters and is
-    therefore called entry_id in this module.
-
-    Parameters
-    ----------
-    type_id : str
-        The type id of which the entry id's should be returned.
-    table_id : str
-        The table id of which the entry id's should be returned.
-
-    Returns
-    -------
-    *str
-         Returns a list of all entry id's belonging to the type and table
 
+class ParameterTable:
     """
+        In-memory index of a stimuli parameter file.
 
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    entry_ids = []
-
-    for line in file:
-        if line.startswith(f"{type_id}-{table_id}"):
-            search_string = f"{type_id}-{table_id}-" + "{:d}"
-            id = search(search_string, line)[0]
-            if id not in entry_ids:
-                entry_ids.append(str(id))
-
-    return entry_ids
-
-
-def get_table_ids(type_id):
-    """
-    Returns a list of the table id's belonging to the specified type
-
-    The provided paramter file identifies each set of parameters with an ID in the following form
-    "VS-B-4"
-    The second part of this id corresponds to a table of parameters and is
-    therefore called table_id in this module.
-
-    Parameters
-    ----------
-    type_id : str
-        The type id of which the entry id's should be returned.
-
-    Returns
-    -------
-    *str
-         Returns a list of all table id's belonging to the type
-
-    """
-
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    table_ids = []
-
-    for line in file:
-        if line.startswith(f"{type_id}-"):
-            search_string = f"{type_id}-" + "{}"
-            id = search(search_string, line)[0]
-            if id not in table_ids:
-                table_ids.append(id)
+        The file is parsed once when the table is created. Each entry is stored as a ParameterRecord
+        which is accessible by its type, table and entry id, so all lookups are done in constant time.
 
-    return table_ids
+        A ParameterTable is an immutable snapshot of the parameter file: it cannot be modified after it has been
+        created and all accessors return copies. It can therefore be passed to several coordinators or worker
+        threads and read concurrently without locking.
 
+        The provided parameter file identifies each set of parameters with an ID in the following form
+        "VS-B-4". The first part of this id corresponds to the type of capture (Video Streaming/Web Browsing) and is
+        called type_id, the second part corresponds to a table of parameters (table_id) and the third part to an
+        entry of parameters (entry_id).
 
-def get_link(type_id, table_id, entry_id):
-    """
-        Returns the link belonging to the specified entry
-
+        Tables which have already been parsed by another loader (e.g. of a structured parameter file) are created
+        by passing their TableRecords and ParameterRecords - the lines are not parsed in this case.
 
-        Parameters
+        Attributes
         ----------
-        type_id : str
-            The type id of the entry
-        table_id : str
-            The table id of the entry
-        entry_id : str
-            The entry id of the entry
-
-        Returns
-        -------
-        str
-            The link belonging to the specified entry
-
+        file_path : str
+            Path of the parsed parameter file (None if the table was created from a list of lines)
+        lines : Tuple[str]
+            Lines of the parsed parameter file (in .csv format)
+        errors : Tuple[str]
+            Descriptions of all problems detected while parsing the file
         """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    if type_id == "VS" or type_id == "VSB":
-
-        link = None
-        link_found = False
-
-        for line in file:
-
-            if link_found:
-                if line.startswith(f"{type_id}-{table_id}"):
-                    return link
 
+    def __init__(self, lines: List[str], file_path: str = None, *, tables: List[TableRecord] = None,
+                 records: List[ParameterRecord] = None, errors: List[str] = None):
+        self.file_path = file_path
+        self.lines = tuple(lines)
+        self.errors: List[str] = list(errors) if errors else []
+        self._type_ids: List[str] = []
+        self._table_ids: Dict[str, List[str]] = {}
+        self._tables: Dict[Tuple[str, str], TableRecord] = {}
+        # records are stored as plain tuples (in the order of ParameterRecord) since these are much faster to
+        # (un)pickle than named tuples when the table is cached
+        self._records: Dict[Tuple[str, str, str], tuple] = {}
+        if tables is None:
+            self._parse()
+        else:
+            self._add_records(tables, records or [])
+        self.errors = tuple(self.errors)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"ParameterTable is immutable - cannot set attribute \"{name}\"")
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_query', None)  # derived data, rebuilt on demand
+        return state
+
+    @staticmethod
+    def from_file(file_path: str):
+        """Reads and parses the given parameter file"""
+        with open(file_path) as f:
+            return ParameterTable(f.read().split("\n"), file_path)
+
+    def _parse(self):
+        """Parses all lines of the file in a single pass"""
+        codec_column = 0
+        table_info = None  # dict holding link, start and end of the table which is currently described
+
+        for line_nr, line in enumerate(self.lines):
             if line.startswith("Stimulus-ID"):
-                # new table - previously detected link is invalid
-                link = None
-                link_found = False
-
-            if line.startswith("Resolution"):
-                link = line.split(";")[1]
-                link_found = True
-
-        return ""
-
-    if type_id == "WB":
-        table_found = False
-        for line in file:
-
-            if line.startswith(f"{type_id}-{table_id}"):
-                table_found = True
-
-            if table_found:
-                if "https:" in line:
-                    result = search("https:{})", line)
-                    if result is None:
-                        result = search("https:{};", line)
-                    return "https:" + result[0]
-        return
-    if type_id == "AL":
-        table_found = False
-        for line in file:
-
-            if line.startswith(f"{type_id}-{table_id}"):
-                table_found = True
-
-            if table_found:
-                if "app://" in line:
-                    result = search("app://{})", line)
-                    if result is None:
-                        result = search("app://{};", line)
-                    return result[0]
-        return
-
-
-def get_start(type_id, table_id, entry_id):
-    """
-            Returns the video start time of the specified entry
-
-
-            Parameters
-            ----------
-            type_id : str
-                The type id of the entry
-            table_id : str
-                The table id of the entry
-            entry_id : str
-                The entry id of the entry
+                # new table - previously detected description is invalid
+                table_info = None
+                for i, column in enumerate(line.split(";")):
+                    if column.strip('"') == "Codec":
+                        codec_column = i
+                        break
+                continue
 
-            Returns
-            -------
-            str
-                The video start time belonging to the specified entry
+            splitted_line = line.split(";")
+            key = _split_stimulus_id(splitted_line[0])
+            if key is not None:
+                type_id, table_id, entry_id = key = (sys.intern(key[0]), sys.intern(key[1]), key[2])
+                if type_id not in self._table_ids:
+                    self._type_ids.append(type_id)
+                    self._table_ids[type_id] = []
+                if table_id not in self._table_ids[type_id]:
+                    self._table_ids[type_id].append(table_id)
+                    table_info = {'type_id': type_id, 'table_id': table_id, 'link': None, 'start': None,
+                                  'end': None, 'entry_ids': []}
+                    self._tables[(type_id, table_id)] = table_info
+                elif table_info is None:
+                    table_info = self._tables[(type_id, table_id)]
+                if key not in self._records:
+                    table_info['entry_ids'].append(entry_id)
+                    record = self._parse_entry(type_id, table_id, entry_id, splitted_line, codec_column, line_nr)
+                    self._records[key] = tuple(record)
+                    if record.error:
+                        self.errors.append(f"Error while parsing {type_id}-{table_id}-{entry_id} - {record.error}")
+
+            if table_info is not None:
+                self._parse_description(line, table_info)
+
+        # freeze the collected table information
+        for type_id in self._table_ids:
+            self._table_ids[type_id] = tuple(self._table_ids[type_id])
+        for (type_id, table_id), table_info in self._tables.items():
+            link = table_info['link']
+            if link is None and type_id in ["VS", "VSB"]:
+                link = ""
+            self._tables[(type_id, table_id)] = TableRecord(type_id, table_id, link, table_info['start'],
+                                                            table_info['end'], tuple(table_info['entry_ids']))
+
+    def _add_records(self, tables: List[TableRecord], records: List[ParameterRecord]):
+        for table in tables:
+            if table.type_id not in self._table_ids:
+                self._type_ids.append(table.type_id)
+                self._table_ids[table.type_id] = []
+            self._table_ids[table.type_id].append(table.table_id)
+            self._tables[(table.type_id, table.table_id)] = table._replace(entry_ids=tuple(table.entry_ids))
+        for type_id in self._table_ids:
+            self._table_ids[type_id] = tuple(self._table_ids[type_id])
+        for record in records:
+            self._records[(record.type_id, record.table_id, record.entry_id)] = tuple(record)
+
+    @staticmethod
+    def _parse_entry(type_id: str, table_id: str, entry_id: str, splitted_line: List[str], codec_column: int,
+                     line_nr: int) -> ParameterRecord:
+        if type_id == "WB" or codec_column == 0:
+            codec = None
+        elif codec_column < len(splitted_line):
+            codec = sys.intern(splitted_line[codec_column].translate(str.maketrans('', '', '"')))
+        else:
+            codec = None
+        try:
+            parameters = _parse_parameters(splitted_line)
+            error = None
+        except ValueError as ve:
+            parameters = None
+            error = str(ve)
+        return ParameterRecord(type_id, table_id, entry_id, codec, parameters, error, line_nr)
+
+    def _parse_description(self, line: str, table_info: dict):
+        """Detects link, start and end of a table within the description of its first entry"""
+        type_id = table_info['type_id']
+        try:
+            if table_info['link'] is None:
+                if type_id in ["VS", "VSB"]:
+                    if line.startswith("Resolution"):
+                        table_info['link'] = line.split(";")[1]
+                elif type_id == "WB":
+                    if "https:" in line:
+                        result = search("https:{})", line)
+                        if result is None:
+                            result = search("https:{};", line)
+                        table_info['link'] = "https:" + result[0]
+                elif type_id == "AL":
+                    if "app://" in line:
+                        result = search("app://{})", line)
+                        if result is None:
+                            result = search("app://{};", line)
+                        table_info['link'] = result[0]
+
+            if line.startswith("Excerpt") and table_info['start'] is None:
+                if "appr." in line:
+                    search_string_start = "appr. {} ("
+                else:
+                    search_string_start = "from {} ("
+                if "(h:min:sec)" in line:
+                    append = ""
+                else:
+                    append = "00:"
+                table_info['start'] = append + str(search(search_string_start, line)[0])
+                if "h:min" in line:
+                    append = ""
+                else:
+                    append = "00:"
+                table_info['end'] = str(append + search(" to {} (", line)[0])
+        except (TypeError, IndexError):
+            self.errors.append(f"Error while parsing description of table {type_id}-{table_info['table_id']} - "
+                               f"cannot parse line: \"{line}\"")
+
+    def type_ids(self) -> List[str]:
+        """Returns a list of all type id's within the file"""
+        return list(self._type_ids)
+
+    def table_ids(self, type_id: str) -> List[str]:
+        """Returns a list of all table id's belonging to the specified type"""
+        return list(self._table_ids.get(type_id, []))
+
+    def entry_ids(self, type_id: str, table_id: str) -> List[str]:
+        """Returns a list of all entry id's belonging to the specified type and table"""
+        table = self._tables.get((type_id, table_id))
+        if table is None:
+            return []
+        return list(table.entry_ids)
+
+    def has_entry(self, type_id: str, table_id: str, entry_id: str) -> bool:
+        return (type_id, table_id, str(entry_id)) in self._records
+
+    def record(self, type_id: str, table_id: str, entry_id: str) -> Optional[ParameterRecord]:
+        """Returns the ParameterRecord of the specified entry or None if the entry does not exist"""
+        record = self._records.get((type_id, table_id, str(entry_id)))
+        return ParameterRecord._make(record) if record else None
+
+    def link(self, type_id: str, table_id: str, entry_id: str = None) -> Optional[str]:
+        """Returns the link (video URL, web page or app) belonging to the specified entry"""
+        table = self._tables.get((type_id, table_id))
+        if table is None:
+            return "" if type_id in ["VS", "VSB"] else None
+        return table.link
+
+    def start(self, type_id: str, table_id: str, entry_id: str = None) -> Optional[str]:
+        """Returns the video start time belonging to the specified entry"""
+        table = self._tables.get((type_id, table_id))
+        return table.start if table else None
+
+    def end(self, type_id: str, table_id: str, entry_id: str = None) -> Optional[str]:
+        """Returns the video end time belonging to the specified entry"""
+        table = self._tables.get((type_id, table_id))
+        return table.end if table else None
+
+    def codec(self, type_id: str, table_id: str, entry_id: str) -> Optional[str]:
+        """Returns the codec belonging to the specified entry"""
+        record = self._records.get((type_id, table_id, str(entry_id)))
+        return record[3] if record else None
+
+    def parameters(self, type_id: str, table_id: str, entry_id: str) -> Optional[dict]:
+        """
+            Returns a copy of the netem parameters of the specified entry
 
+            The dictionary contains the parameters [t_init, rul, rdl, dul, ddl, stimulus, codec, dynamic, genbufn,
+            genbuft]. Raises a ValueError if the parameters of the entry could not be parsed.
             """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    start_found = False
-    start = None
-
-    for line in file:
-
-        if start_found:
-            if line.startswith(f"{type_id}-{table_id}"):
-                return start
-
-        if line.startswith("Stimulus-ID"):
-            # new table - previously detected start is invalid
-            start = None
-            start_found = False
-
-        if line.startswith("Excerpt"):
-            if "appr." in line:
-                search_string_start = "appr. {} ("
-            else:
-                search_string_start = "from {} ("
-            if "(h:min:sec)" in line:
-                append = ""
-            else:
-                append = "00:"
-            start = append + str(search(search_string_start, line)[0])
-            start_found = True
-
-    return None
-
-
-def get_end(type_id, table_id, entry_id):
-    """
-            Returns the video end time of the specified entry
+        record = self._records.get((type_id, table_id, str(entry_id)))
+        if record is None:
+            return None
+        if record[5]:
+            raise ValueError(record[5])
+        return dict(zip(STIMULI_PARAMETER_NAMES, record[4]))
+
+    def entries(self, type_id_filter: str = None, table_id_filter: str = None) -> List[Entry]:
+        """
+            Returns a list of named tuples, each tuple representing one entry matching the filter specified.
 
+            The named tuples returned are defined as following:
+             ("Entry", "type_id table_id entry_id link start end codec t_init rul rdl dul ddl")
+            """
+        entries = []
+        for type_id in self._type_ids:
+            if type_id_filter is not None and type_id != type_id_filter:
+                continue
+            for table_id in self._table_ids[type_id]:
+                if table_id_filter is not None and table_id != table_id_filter:
+                    continue
+                table = self._tables[(type_id, table_id)]
+                for entry_id in table.entry_ids:
+                    params = self.parameters(type_id, table_id, entry_id)
+                    entries.append(Entry(type_id, table_id, entry_id, table.link, table.start, table.end,
+                                         self.codec(type_id, table_id, entry_id),
+                                         params['t_init'], params['rul'], params['rdl'], params['dul'],
+                                         params['ddl']))
+        return entries
+
+    def query(self):
+        """Returns a ParameterQuery (see qoeval_pkg.parser.query) for columnar queries over all entries"""
+        query = self.__dict__.get('_query')
+        if query is None:
+            # imported here since the query module depends on this module
+            from qoeval_pkg.parser.query import ParameterQuery
+            query = ParameterQuery(self)
+            # the query is derived from the immutable content, so caching it does not modify the table
+            object.__setattr__(self, '_query', query)
+        return query
+
+    def is_correct(self) -> bool:
+        """Returns True if all entries and table descriptions of the file could be parsed"""
+        return len(self.errors) == 0
+
+    def export_entries(self, type_id: str, table_id: str, output_path: str, compact: bool = False):
+        """
+            Exports a parameter table as individual .csv file (e.g. for documentation purposes)
 
-            Parameters
-            ----------
-            type_id : str
-                The type id of the entry
-            table_id : str
-                The table id of the entry
-            entry_id : str
-                The entry id of the entry
+            :param str type_id :
+                The type id of the requested entries
+            :param str table_id :
+                The table id of the requested entries
+            :param str output_path :
+                The path to the output file
+            :param compact:
+                If set to True, a compact format is used (for reports only)
+            """
+        output_file = open(output_path, "w")
 
-            Returns
-            -------
-            str
-                The video end time belonging to the specified entry
+        nr_ids_to_be_written = len(self.entry_ids(type_id, table_id))
 
-            """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
+        is_header_written = False
 
-    end_found = False
-    end = None
+        if compact:
+            columns_to_be_removed = list(_COMPACT_REMOVED_COLUMNS)
+        else:
+            columns_to_be_removed = []
 
-    for line in file:
+        is_in_relevant_section = False
 
-        if end_found:
-            if line.startswith(f"{type_id}-{table_id}"):
-                return end
-            if line.startswith(f"{type_id}"):
-                end_found = False
+        for line in self.lines:
+            if line.startswith(f"Stimulus-ID"):
+                if compact:
+                    header_line = _remove_columns(_get_compact_header(line), columns_to_be_removed)
+                else:
+                    header_line = line
 
-        if line.startswith("Stimulus-ID"):
-            # new table - previously detected end is invalid
-            start = None
-            start_found = False
+            if line.startswith(f"{type_id}-{table_id}-"):
+                is_in_relevant_section = True
+                if not is_header_written:
+                    output_file.write(header_line+"\n")
+                    is_header_written = True
+                if compact:
+                    line = _remove_columns(line, columns_to_be_removed)
+                nr_ids_to_be_written = nr_ids_to_be_written - 1
 
-        if line.startswith("Excerpt"):
-            if "h:min" in line:
-                append = ""
-            else:
-                append = "00:"
-            end = str(append + search(" to {} (", line)[0])
-            end_found = True
+            if is_in_relevant_section and (not compact or line.startswith(f"{type_id}-{table_id}-")):
+                output_file.write(line + "\n")
 
-    return None
+            if nr_ids_to_be_written < 1:
+                break
 
+        output_file.close()
+        log.info(f"Exported {type_id}-{table_id} to {output_path}.")
 
-def get_codec(type_id, table_id, entry_id):
-    """
-            Returns the codec of the specified entry
+    def export_tables(self, output_dir: str, tables: List[Tuple[str, str]] = None,
+                      force: bool = False) -> List[str]:
+        """
+            Exports parameter tables as individual .csv files in a single pass over the parameter file
 
+            For each table, the files "{type_id}-{table_id}.csv" and "{type_id}-{table_id}_compact.csv" are written
+            to the output directory. The content is the same as written by export_entries. Tables whose files are
+            already up to date (i.e. exported from the same parameter file with the same content, as recorded in the
+            sidecar "{type_id}-{table_id}.export") are skipped.
 
             Parameters
             ----------
-            type_id : str
-                The type id of the entry
-            table_id : str
-                The table id of the entry
-            entry_id : str
-                The entry id of the entry
+            output_dir : str
+                Directory the .csv files are written to
+            tables : List[Tuple[str, str]], optional
+                (type_id, table_id) tuples of the tables to be exported, default is all tables of the file
+            force : bool, optional
+                If set to True, the files are written even if they are up to date
 
             Returns
             -------
-            str
-                The codec belonging to the specified entry
-
+            List[str]
+                Paths of all files which have been written
             """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
-
-    if type_id == "WB":
-        return None
-
-    codec_column = 0
-    for line in file:
-
-        if line.startswith("Stimulus-ID"):
-            i = 0
-            for s in line.split(";"):
-                if s == "Codec":
-                    codec_column = i
-                    break
-                i += 1
-
-        if line.startswith(f"{type_id}-{table_id}-{entry_id}") and codec_column != 0:
-            return line.split(";")[codec_column].translate(str.maketrans('', '', '"'))
-
+        if tables is None:
+            tables = [(type_id, table_id) for type_id in self._type_ids for table_id in self._table_ids[type_id]]
+
+        stamp = self._get_export_stamp()
+        # remaining number of entries and collected lines (full and compact) of each table still to be exported
+        pending = {}
+        for type_id, table_id in tables:
+            if (type_id, table_id) not in self._tables:
+                log.error(f"Cannot export {type_id}-{table_id} - table does not exist")
+                continue
+            output_path = os.path.join(output_dir, f"{type_id}-{table_id}")
+            if not force and _is_export_up_to_date(output_path, stamp):
+                log.debug(f"Export of {type_id}-{table_id} to {output_dir} is up to date - skipped.")
+                continue
+            pending[(type_id, table_id)] = [len(self._tables[(type_id, table_id)].entry_ids), None, None]
+
+        compact_columns = list(_COMPACT_REMOVED_COLUMNS)
+        written = []
+        active = []  # tables whose first entry has been found but not the last one
+        header_line = ""
+        for line in self.lines:
+            if not pending:
+                break
+            if line.startswith("Stimulus-ID"):
+                header_line = line
 
-def get_parameters(type_id, table_id, entry_id):
+            key = _split_stimulus_id(line.split(";", 1)[0])
+            table = pending.get(key[:2]) if key else None
+            if table is not None:
+                if table[1] is None:
+                    table[1] = [header_line]
+                    table[2] = [_remove_columns(_get_compact_header(header_line), compact_columns)]
+                    active.append(key[:2])
+                table[2].append(_remove_columns(line, compact_columns))
+                table[0] -= 1
+
+            for active_key in list(active):
+                full_lines, compact_lines = pending[active_key][1:]
+                full_lines.append(line)
+                if pending[active_key][0] < 1:
+                    active.remove(active_key)
+                    del pending[active_key]
+                    output_path = os.path.join(output_dir, f"{active_key[0]}-{active_key[1]}")
+                    written.extend(_write_export(output_path, full_lines, compact_lines, stamp))
+                    log.info(f"Exported {active_key[0]}-{active_key[1]} to {output_dir}.")
+        return written
+
+    def _get_export_stamp(self) -> Optional[str]:
+        """Returns the stamp identifying exports of this table (None if it has not been read from a file)"""
+        if self.file_path is None:
+            return None
+        content_hash = hashlib.sha256("\n".join(self.lines).encode("utf-8")).hexdigest()
+        return f"{os.path.abspath(self.file_path)}\n{content_hash}\n"
+
+
+def load_cached_parameter_table(file_path: str, cache_path: str = None) -> ParameterTable:
     """
-            Returns the list of netem parameters of the specified entry
+       Returns the ParameterTable of the given file, using the compiled cache if it is up to date.
 
+       The cache is a pickled sidecar file, which is keyed by the absolute path, the modification time and the
+       SHA-256 hash of the content of the parameter file. If any of these has changed (or the cache cannot be
+       read), the file is parsed again and the cache is updated.
 
-            Parameters
-            ----------
-            type_id : str
-                The type id of the entry
-            table_id : str
-                The table id of the entry
-            entry_id : str
-                The entry id of the entry
+       Parameters
+       ----------
+       file_path : str
+            File path of the parameter file
+       cache_path : str, optional
+            File path of the cache file, default is a file within PARAMETER_CACHE_PATH
 
-            Returns
-            -------
-            *str
-                The list of parameters: [t_init, rul, rdl, dul, ddl, stimulus, codec, dynamic, genbufn, genbuft]
+       """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    file_path_abs = os.path.abspath(file_path)
+    mtime = os.stat(file_path).st_mtime_ns
+    content_hash = hashlib.sha256(content).hexdigest()
+    if cache_path is None:
+        cache_path = _get_cache_path(file_path_abs)
 
-            """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['version'] == PARAMETER_CACHE_VERSION and cached['file_path'] == file_path_abs and \
+                cached['mtime'] == mtime and cached['hash'] == content_hash:
+            log.debug(f"Using compiled parameter table {cache_path} for \"{file_path}\"")
+            return cached['table']
+    except FileNotFoundError:
+        pass
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError, AttributeError) as e:
+        log.debug(f"Ignoring unreadable parameter table cache {cache_path}: {e}")
 
-    for line in file:
-        if line.startswith(f"{type_id}-{table_id}-{entry_id}"):
-            splitted_line = line.split(";")
-            float_parameter_values_str = splitted_line[2:7]
-            float_parameter_values = [float(i) for i in float_parameter_values_str]
-            # evaluate string parameters
-            str_parameter_values = splitted_line[7:10]
-            # evaluate parameters for artificial buffer generation (VSB stimuli), if present
-            if len(splitted_line) > 12:
-                gen_parameter_values_str = splitted_line[10:12]
-                gen_parameter_values_str = [_replace_empty_with_default(i, "0") for i in gen_parameter_values_str]
-                gen_parameter_values = [int (gen_parameter_values_str[0]), float(gen_parameter_values_str[1])]
-            else:
-                gen_parameter_values = [0, 0.0]
-            it_name = iter(STIMULI_PARAMETER_NAMES)
-            it_value = iter(float_parameter_values + str_parameter_values + gen_parameter_values)
-            return dict(zip(it_name, it_value))
-
-
-def get_entries(type_id_filter=None, table_id_filter=None):
+    table = ParameterTable(content.decode("utf-8").split("\n"), file_path)
+
+    cached = {'version': PARAMETER_CACHE_VERSION, 'file_path': file_path_abs, 'mtime': mtime,
+              'hash': content_hash, 'table': table}
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write to a temporary file first, so concurrent readers never see a partially written cache
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.warning(f"Cannot write parameter table cache {cache_path}: {e}")
+    return table
+
+
+def load_parameter_file(file_path: str, use_cache: bool = True) -> ParameterTable:
     """
-            Returns a list of named tuples, each tuple representing one entry matching the filter specified.
+       Loads the specified parameter file.
 
-            The named tuples returned are defined as following:
-             ("Entry", "type_id table_id entry_id link start end codec t_init rul rdl dul ddl")
+       Reads and parses the contents of the given file, which is either a .csv parameter file or a structured
+       (.json) parameter file (see qoeval_pkg.parser.structured). The returned ParameterTable is immutable, so it
+       can be shared between threads (e.g. the coordinator and post-processing workers) without locking. Loading
+       the file again returns a new ParameterTable and does not affect tables which are already in use.
 
-            Parameters
-            ----------
-            type_id_filter : str, optional
-                The type id of the requested entries
-            table_id_filter : str, optional
-                The table id of the requested entries
-
-            Returns
-            -------
-            *Entry
-                A list of named tuples, which represent one entry each, in the following form:
-                namedtuple("Entry", "type_id table_id entry_id link start end codec t_init rul rdl dul ddl")
+       Parameters
+       ----------
+       file_path : str
+            File path of the file to be loaded
+       use_cache : bool, optional
+            If set to True (default), an up-to-date compiled version of a .csv file is loaded from the cache
 
-            """
-    if not file_loaded:
-        log.error("No file loaded")
-        return []
+       Returns
+       -------
+       ParameterTable
+            The parsed parameter file
 
-    entries = []
+       """
+    # imported here since the structured module depends on this module
+    from qoeval_pkg.parser import structured
 
-    for type_id in get_type_ids():
+    parselog.setLevel('WARNING')
 
-        if type_id_filter is not None and type_id != type_id_filter:
-            continue
+    is_structured = structured.is_structured_parameter_file(file_path)
+    try:
+        if is_structured:
+            parameter_table = structured.load_structured_parameter_file(file_path)
+        elif use_cache:
+            parameter_table = load_cached_parameter_table(file_path)
+        else:
+            parameter_table = ParameterTable.from_file(file_path)
+    except FileNotFoundError:
+        log.error(f"Parameter file \"{file_path}\" not found")
+        raise FileNotFoundError
 
-        for table_id in get_table_ids(type_id):
+    if not parameter_table.is_correct():
+        file_format = "structured (.json)" if is_structured else ".csv"
+        log.warning(f"Parameter file \"{file_path}\" is not fully parsable - some use-cases might not have valid "
+                    f"parameter values. Please check the format of the {file_format} file.")
+    return parameter_table
 
-            if table_id_filter is not None and table_id is not table_id_filter:
-                continue
 
-            for entry_id in get_entry_ids(type_id, table_id):
-                entries.append(Entry(type_id,
-                                     table_id,
-                                     entry_id,
-                                     get_link(type_id, table_id, entry_id),
-                                     get_start(type_id, table_id, entry_id),
-                                     get_end(type_id, table_id, entry_id),
-                                     get_codec(type_id, table_id, entry_id),
-                                     *get_parameters(type_id, table_id, entry_id)))
-    return entries
+def is_correct_parameter_file(parameter_table: ParameterTable) -> bool:
+    """Logs all problems detected while parsing the given parameter table and returns True if there are none"""
+    for error in parameter_table.errors:
+        log.error(error)
+    return parameter_table.is_correct()
 
 
-def export_entries(type_id: str, table_id: str, output_path: str, compact: bool = False):
-    """
-            Exports a parameter table as individual .csv file (e.g. for documentation purposes)
+def _get_cache_path(file_path_abs: str) -> str:
+    key = hashlib.sha1(file_path_abs.encode("utf-8")).hexdigest()
+    return os.path.join(PARAMETER_CACHE_PATH, f"{key}.pickle")
 
-            :param str type_id :
-                The type id of the requested entries
-            :param str table_id :
-                The table id of the requested entries
-            :param str output_path :
-                The path to the output file
-            :param compact:
-                If set to True, a compact format is used (for reports only)
-            """
-    if not file_loaded:
-        log.error("No file loaded")
-        return
 
-    output_file = open(output_path, "w")
+def _split_stimulus_id(stimulus_id: str) -> Optional[Tuple[str, str, str]]:
+    """Splits a stimulus id like "VS-B-4" into type, table and entry id (None if it is not a valid stimulus id)"""
+    parts = stimulus_id.split("-")
+    if len(parts) != 3 or len(parts[0]) == 0 or len(parts[1]) == 0 or not parts[2].isdigit():
+        return None
+    return parts[0], parts[1], str(int(parts[2]))
+
+
+def _parse_parameters(splitted_line: List[str]) -> tuple:
+    """Returns the values of the STIMULI_PARAMETER_NAMES found in a line of the parameter file"""
+    float_parameter_values_str = splitted_line[2:7]
+    float_parameter_values = [float(i) for i in float_parameter_values_str]
+    # evaluate string parameters
+    str_parameter_values = [sys.intern(i) for i in splitted_line[7:10]]
+    # evaluate parameters for artificial buffer generation (VSB stimuli), if present
+    if len(splitted_line) > 12:
+        gen_parameter_values_str = splitted_line[10:12]
+        gen_parameter_values_str = [_replace_empty_with_default(i, "0") for i in gen_parameter_values_str]
+        gen_parameter_values = [int(gen_parameter_values_str[0]), float(gen_parameter_values_str[1])]
+    else:
+        gen_parameter_values = [0, 0.0]
+    return tuple(float_parameter_values + str_parameter_values + gen_parameter_values)[:len(STIMULI_PARAMETER_NAMES)]
 
-    nr_ids_to_be_written = len(get_entry_ids(type_id, table_id))
 
-    is_header_written = False
+def _get_compact_header(header_line: str) -> str:
+    header_line = header_line.replace("Stimulus-ID", "ID")
+    header_line = header_line.replace("Dynamic", "Dyn")
+    header_line = header_line.replace("Num. Rebuffering", "# Buf")
+    return header_line.replace("Rebuffering duration  [ms]", "Buf [ms]")
 
-    if compact:
-        columns_to_be_removed = [1,7,12,13,14]
-    else:
-        columns_to_be_removed = []
-
-    is_in_relevant_section = False
-
-    for line in file:
-        if line.startswith(f"Stimulus-ID"):
-            if compact:
-                header_line = line.replace("Stimulus-ID", "ID")
-                header_line = header_line.replace("Dynamic", "Dyn")
-                header_line = header_line.replace("Num. Rebuffering", "# Buf")
-                header_line = header_line.replace("Rebuffering duration  [ms]", "Buf [ms]")
-                header_line = _remove_columns(header_line, columns_to_be_removed)
-            else:
-                header_line = line
 
-        if line.startswith(f"{type_id}-{table_id}-"):
-            is_in_relevant_section = True
-            if not is_header_written:
-                output_file.write(header_line+"\n")
-                is_header_written = True
-            if compact:
-                line = _remove_columns(line, columns_to_be_removed)
-            nr_ids_to_be_written = nr_ids_to_be_written - 1
-
-        if is_in_relevant_section and (not compact or line.startswith(f"{type_id}-{table_id}-")):
-            output_file.write(line + "\n")
-
-        if nr_ids_to_be_written < 1:
-            break
-
-    output_file.close()
-    log.info(f"Exported {type_id}-{table_id} to {output_path}.")
-
-
-def is_correct_parameter_file() -> bool:
-    status_ok = True
-    all_type_ids = get_type_ids()
-    for type_id in all_type_ids:
-        all_table_ids = get_table_ids(type_id)
-        for table_id in all_table_ids:
-            all_entry_ids = get_entry_ids(type_id, table_id)
-            for entry_id in all_entry_ids:
-                try:
-                    get_parameters(type_id, table_id, entry_id)
-                    get_codec(type_id, table_id, entry_id)
-                    get_link(type_id, table_id, entry_id)
-                    get_start(type_id, table_id, entry_id)
-                    get_end(type_id, table_id, entry_id)
-                except ValueError as ve:
-                    log.error(f"Error while parsing {type_id}-{table_id}-{entry_id} - {ve}")
-                    status_ok = False
-
-    return status_ok
+def _is_export_up_to_date(output_path: str, stamp: Optional[str]) -> bool:
+    """Checks if both exports of a table exist and have been written from the parameter file given by the stamp"""
+    if stamp is None:
+        return False
+    try:
+        with open(f"{output_path}{EXPORT_STAMP_SUFFIX}") as stamp_file:
+            if stamp_file.read() != stamp:
+                return False
+        return all(os.path.exists(f"{output_path}{suffix}.csv") for suffix in ["", "_compact"])
+    except OSError:
+        return False
+
+
+def _write_export(output_path: str, full_lines: List[str], compact_lines: List[str],
+                  stamp: Optional[str] = None) -> List[str]:
+    """Writes the full and the compact export of a table (output_path is the path without suffix) and its stamp"""
+    written = []
+    stamp_path = f"{output_path}{EXPORT_STAMP_SUFFIX}"
+    if os.path.exists(stamp_path):
+        # the exports are not up to date until all of them have been written
+        os.remove(stamp_path)
+    for suffix, lines in [("", full_lines), ("_compact", compact_lines)]:
+        path = f"{output_path}{suffix}.csv"
+        with open(path, "w") as output_file:
+            output_file.write("\n".join(lines) + "\n")
+        written.append(path)
+    if stamp is not None:
+        with open(stamp_path, "w") as stamp_file:
+            stamp_file.write(stamp)
+    return written
 
 
 def _remove_columns(csv_line: str, columns: List[int]) -> str:
@@ -617,6 +627,7 @@ def _remove_columns(csv_line: str, columns: List[int]) -> str:
             del splitted_line[column]
     return ";".join(splitted_line)
 
+
 def _replace_empty_with_default(value: str, default_value: str):
     if not value or len(value) == 0:
         return default_value
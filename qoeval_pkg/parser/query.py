@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""Columnar (pandas based) queries over the entries of a stimuli-parameter file"""
+
+from typing import List
+
+import pandas as pd
+
+from qoeval_pkg.parser.parser import ParameterTable, STIMULI_PARAMETER_NAMES, SET_PARAMETER_NAMES
+
+ID_COLUMNS = ['type_id', 'table_id', 'entry_id']
+# parameters which must be equal for two entries to be alternatives, i.e. to result in interchangeable stimuli
+ALTERNATIVE_PARAMETER_NAMES = ['rul', 'rdl', 'dul', 'ddl', 'codec', 'dynamic']
+
+
+def get_alternative_parameter_names(type_id: str, postprocessing_step: str) -> List[str]:
+    """
+        Returns the names of the parameters which are relevant to decide if two entries are alternatives
+
+        Which parameters are relevant can depend on the type of the stimuli, since e.g. for Video Stream With
+        Generated Buffering (VSB) the t_init parameter is only relevant for post-processing step 2.
+        """
+    names = list(ALTERNATIVE_PARAMETER_NAMES)
+    if not (type_id == "VSB" and postprocessing_step in ["0", "1"]):
+        names.append('t_init')
+    return names
+
+
+class ParameterQuery:
+    """
+        Column-oriented view of a ParameterTable for filtering, grouping and de-duplicating entries.
+
+        All entries with valid parameters are stored in one pandas DataFrame with the columns
+        type_id, table_id, entry_id, the STIMULI_PARAMETER_NAMES and the SET_PARAMETER_NAMES (link, start, end).
+        Entries whose parameters cannot be parsed are not included. All methods return new DataFrames, so the
+        query can be shared between threads like the ParameterTable it is based on.
+
+        Attributes
+        ----------
+        parameter_table : ParameterTable
+            The parameter table the query is based on
+        """
+
+    def __init__(self, parameter_table: ParameterTable):
+        self.parameter_table = parameter_table
+        self._data = self._create_dataframe()
+
+    def _create_dataframe(self) -> pd.DataFrame:
+        columns = {name: [] for name in ID_COLUMNS + STIMULI_PARAMETER_NAMES + SET_PARAMETER_NAMES}
+        table = self.parameter_table
+        for type_id in table.type_ids():
+            for table_id in table.table_ids(type_id):
+                link = table.link(type_id, table_id)
+                start = table.start(type_id, table_id)
+                end = table.end(type_id, table_id)
+                for entry_id in table.entry_ids(type_id, table_id):
+                    try:
+                        parameters = table.parameters(type_id, table_id, entry_id)
+                    except ValueError:
+                        continue
+                    for name, value in zip(ID_COLUMNS + SET_PARAMETER_NAMES,
+                                           [type_id, table_id, entry_id, link, start, end]):
+                        columns[name].append(value)
+                    for name in STIMULI_PARAMETER_NAMES:
+                        columns[name].append(parameters.get(name))
+        return pd.DataFrame(columns)
+
+    def dataframe(self) -> pd.DataFrame:
+        """Returns a copy of the DataFrame holding all entries"""
+        return self._data.copy()
+
+    def filter(self, condition: str = None, **column_values) -> pd.DataFrame:
+        """
+            Returns all entries matching the given condition and column values
+
+            Example: query.filter("rdl < 1000 and t_init > 3000", type_id="VS")
+
+            Parameters
+            ----------
+            condition : str, optional
+                Boolean expression over the column names as supported by pandas.DataFrame.query
+            column_values : optional
+                Column names and the values the columns must be equal to, e.g. type_id="VS"
+
+            Returns
+            -------
+            pd.DataFrame
+                The matching entries
+            """
+        data = self._data
+        if column_values:
+            mask = pd.Series(True, index=data.index)
+            for column, value in column_values.items():
+                mask &= data[column] == value
+            data = data[mask]
+        if condition:
+            data = data.query(condition)
+        return data.copy()
+
+    def unique(self, columns: List[str], **column_values) -> pd.DataFrame:
+        """Returns the first entry of each distinct combination of values of the given columns"""
+        return self.filter(**column_values).drop_duplicates(subset=columns)
+
+    def groups(self, columns: List[str], **column_values) -> pd.Series:
+        """
+            Returns a group number for each entry, entries with equal values in all given columns share a group
+
+            The returned Series is indexed like the DataFrame of the entries and groups are numbered in the order of
+            their first appearance.
+            """
+        data = self.filter(**column_values)
+        return data.groupby(columns, sort=False, dropna=False).ngroup()
+
+    def alternative_groups(self, type_id: str, table_id: str, postprocessing_step: str) -> pd.Series:
+        """Returns the group number of each entry of the table, alternative entries share the same group"""
+        return self.groups(get_alternative_parameter_names(type_id, postprocessing_step),
+                           type_id=type_id, table_id=table_id)
+
+    def alternative_entry_ids(self, type_id: str, table_id: str, entry_id: str,
+                              postprocessing_step: str) -> List[str]:
+        """
+            Returns the ids of all entries of the table which are alternatives of the given entry (including itself)
+
+            Raises a ValueError if the parameters of the given entry could not be parsed.
+            """
+        groups = self.alternative_groups(type_id, table_id, postprocessing_step)
+        entry_ids = self._data.loc[groups.index, 'entry_id']
+        selected = groups[entry_ids == str(entry_id)]
+        if selected.empty:
+            # raises a ValueError if the entry exists but is invalid
+            self.parameter_table.parameters(type_id, table_id, entry_id)
+            return []
+        return list(entry_ids[groups == selected.iloc[0]])
@@ -0,0 +1,280 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Structured (.json) stimuli-parameter files
+
+A structured parameter file describes the same stimuli as a .csv parameter file, but stores links, excerpt times
+and parameters in explicit fields instead of free text. Example:
+
+    {
+      "format": "qoeval-parameters",
+      "version": 1,
+      "tables": [
+        {
+          "type_id": "VS", "table_id": "A",
+          "link": "https://www.youtube.com/watch?v=1dxhytrMmkM", "start": "00:12:55", "end": "00:13:16",
+          "entries": [
+            {"entry_id": "1", "assessment": "Basic set", "t_init": 720, "rul": 80, "rdl": 50000,
+             "dul": 22, "ddl": 22, "stimulus": "Reference", "codec": "Auto"}
+          ]
+        }
+      ]
+    }
+
+The fields of tables and entries are described by TABLE_SCHEMA and ENTRY_SCHEMA. The loader validates the whole
+file in one pass and reports all errors found, not only the first one.
+"""
+
+import argparse
+import json
+import re
+import logging as log
+from typing import List, Optional
+
+from qoeval_pkg.parser.parser import ParameterTable, ParameterRecord, TableRecord, STIMULI_PARAMETER_NAMES, \
+    load_parameter_file
+
+STRUCTURED_FORMAT_NAME = "qoeval-parameters"
+STRUCTURED_FORMAT_VERSION = 1
+STRUCTURED_FILE_EXTENSIONS = [".json"]
+
+# field name: (allowed types, is required, default value)
+TABLE_SCHEMA = {
+    'type_id': (str, True, None),
+    'table_id': (str, True, None),
+    'link': (str, False, None),
+    'start': (str, False, None),
+    'end': (str, False, None),
+    'entries': (list, True, None),
+}
+ENTRY_SCHEMA = {
+    'entry_id': ((str, int), True, None),
+    'assessment': (str, False, ""),
+    't_init': ((int, float), True, None),
+    'rul': ((int, float), True, None),
+    'rdl': ((int, float), True, None),
+    'dul': ((int, float), True, None),
+    'ddl': ((int, float), True, None),
+    'stimulus': (str, False, ""),
+    'codec': (str, False, ""),
+    'dynamic': (str, False, ""),
+    'genbufn': (int, False, 0),
+    'genbuft': ((int, float), False, 0),
+}
+_NON_NEGATIVE_FIELDS = ['t_init', 'rul', 'rdl', 'dul', 'ddl', 'genbufn', 'genbuft']
+_TIME_PATTERN = re.compile(r"^\d+:\d{2}:\d{2}(\.\d+)?$")
+
+# header of the .csv lines which are generated for the exports of a structured parameter file
+_CSV_HEADER = 'Stimulus-ID;Assessment;"Tinit [ms]";"RUL [kbps]";"RDL [kbps]";"DUL [ms]";"DDL [ms]";' \
+              '"Stimulus in picture";"Codec";"Dynamic";"Num. Rebuffering";"Rebuffering duration  [ms]";Video;Link;' \
+              'Assessment'
+
+
+def is_structured_parameter_file(file_path: str) -> bool:
+    return any(file_path.lower().endswith(extension) for extension in STRUCTURED_FILE_EXTENSIONS)
+
+
+def load_structured_parameter_file(file_path: str) -> ParameterTable:
+    """
+        Loads and validates a structured parameter file
+
+        All problems found are collected in the errors of the returned ParameterTable. Entries with invalid
+        parameters are part of the table, but requesting their parameters raises a ValueError (like for .csv files).
+
+        Parameters
+        ----------
+        file_path : str
+            File path of the structured parameter file
+
+        Returns
+        -------
+        ParameterTable
+            The loaded parameter table
+        """
+    with open(file_path) as f:
+        try:
+            document = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"Parameter file \"{file_path}\" is not a valid JSON file: {e}")
+    return create_parameter_table(document, file_path)
+
+
+def create_parameter_table(document: dict, file_path: str = None) -> ParameterTable:
+    """Validates the content of a structured parameter file and creates the corresponding ParameterTable"""
+    errors = []
+    tables = []
+    records = []
+    lines = []
+
+    if not isinstance(document, dict):
+        raise RuntimeError(f"Invalid structured parameter file - expected an object at top level")
+    if document.get('format') != STRUCTURED_FORMAT_NAME:
+        errors.append(f"Unknown format \"{document.get('format')}\" - expected \"{STRUCTURED_FORMAT_NAME}\"")
+    if document.get('version') != STRUCTURED_FORMAT_VERSION:
+        errors.append(f"Unsupported format version {document.get('version')} - "
+                      f"expected {STRUCTURED_FORMAT_VERSION}")
+    if not isinstance(document.get('tables'), list):
+        raise RuntimeError(f"Invalid structured parameter file - \"tables\" must be a list")
+
+    table_keys = set()
+    for table_nr, table in enumerate(document['tables']):
+        location = f"table #{table_nr + 1}"
+        table_errors = _validate(table, TABLE_SCHEMA, location)
+        if table_errors:
+            errors.extend(table_errors)
+            continue
+        type_id = table['type_id']
+        table_id = table['table_id']
+        location = f"table {type_id}-{table_id}"
+        if (type_id, table_id) in table_keys:
+            errors.append(f"Error in {location} - table is defined more than once")
+            continue
+        table_keys.add((type_id, table_id))
+        for field in ['start', 'end']:
+            if table.get(field) is not None and not _TIME_PATTERN.match(table[field]):
+                errors.append(f"Error in {location} - {field} \"{table[field]}\" is not in the format h:mm:ss")
+
+        link = table.get('link')
+        if link is None and type_id in ["VS", "VSB"]:
+            link = ""
+        lines.append(_CSV_HEADER)
+        entry_ids = []
+        for entry_nr, entry in enumerate(table['entries']):
+            entry_location = f"{location} entry #{entry_nr + 1}"
+            entry_errors = _validate(entry, ENTRY_SCHEMA, entry_location)
+            entry_id = str(entry.get('entry_id')) if isinstance(entry, dict) else ""
+            if not entry_id.isdigit():
+                if not entry_errors:
+                    entry_errors.append(f"Error in {entry_location} - entry_id \"{entry_id}\" is not a number")
+                errors.extend(entry_errors)
+                continue
+            entry_id = str(int(entry_id))
+            if entry_id in entry_ids:
+                errors.append(f"Error in {location} - entry {entry_id} is defined more than once")
+                continue
+            entry_ids.append(entry_id)
+            for field in _NON_NEGATIVE_FIELDS:
+                value = entry.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0:
+                    entry_errors.append(f"Error in {entry_location} - field \"{field}\" must not be negative")
+
+            if entry_errors:
+                errors.extend(entry_errors)
+                parameters = None
+                error = "; ".join(entry_errors)
+            else:
+                values = {name: entry.get(name, ENTRY_SCHEMA[name][2]) for name in STIMULI_PARAMETER_NAMES}
+                parameters = tuple([float(values[name]) for name in ['t_init', 'rul', 'rdl', 'dul', 'ddl']] +
+                                   [values[name] for name in ['stimulus', 'codec', 'dynamic']] +
+                                   [int(values['genbufn']), float(values['genbuft'])])
+                error = None
+            codec = None if type_id == "WB" or parameters is None else parameters[6]
+            records.append(ParameterRecord(type_id, table_id, entry_id, codec, parameters, error, len(lines)))
+            lines.append(_get_csv_line(type_id, table_id, entry_id, entry,
+                                       link if len(entry_ids) == 1 else None))
+        tables.append(TableRecord(type_id, table_id, link, table.get('start'), table.get('end'), entry_ids))
+        lines.append("")
+
+    return ParameterTable(lines, file_path, tables=tables, records=records, errors=errors)
+
+
+def convert_parameter_file(input_path: str, output_path: str) -> List[str]:
+    """
+        Converts a .csv parameter file to a structured parameter file
+
+        Entries of the .csv file which cannot be parsed are not converted.
+
+        Parameters
+        ----------
+        input_path : str
+            File path of the .csv parameter file
+        output_path : str
+            File path of the structured parameter file to be written
+
+        Returns
+        -------
+        List[str]
+            Descriptions of all problems detected while parsing the .csv parameter file
+        """
+    parameter_table = load_parameter_file(input_path, use_cache=False)
+    document = {'format': STRUCTURED_FORMAT_NAME, 'version': STRUCTURED_FORMAT_VERSION, 'tables': []}
+    for type_id in parameter_table.type_ids():
+        for table_id in parameter_table.table_ids(type_id):
+            table = {'type_id': type_id, 'table_id': table_id}
+            for field, value in [('link', parameter_table.link(type_id, table_id)),
+                                 ('start', parameter_table.start(type_id, table_id)),
+                                 ('end', parameter_table.end(type_id, table_id))]:
+                if value:
+                    table[field] = value
+            table['entries'] = []
+            for entry_id in parameter_table.entry_ids(type_id, table_id):
+                try:
+                    parameters = parameter_table.parameters(type_id, table_id, entry_id)
+                except ValueError:
+                    continue
+                record = parameter_table.record(type_id, table_id, entry_id)
+                entry = {'entry_id': entry_id,
+                         'assessment': parameter_table.lines[record.line_nr].split(";")[1].strip('"')}
+                for name in STIMULI_PARAMETER_NAMES:
+                    value = parameters.get(name, ENTRY_SCHEMA[name][2])
+                    if value != ENTRY_SCHEMA[name][2] or ENTRY_SCHEMA[name][1]:
+                        entry[name] = _get_number(value) if isinstance(value, float) else value
+                table['entries'].append(entry)
+            document['tables'].append(table)
+
+    with open(output_path, "w") as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    log.info(f"Converted \"{input_path}\" to \"{output_path}\".")
+    return list(parameter_table.errors)
+
+
+def _validate(item, schema: dict, location: str) -> List[str]:
+    """Returns descriptions of all differences between the given table or entry and its schema"""
+    if not isinstance(item, dict):
+        return [f"Error in {location} - expected an object"]
+    errors = []
+    for field, (types, is_required, _) in schema.items():
+        if field not in item:
+            if is_required:
+                errors.append(f"Error in {location} - required field \"{field}\" is missing")
+        elif not isinstance(item[field], types) or isinstance(item[field], bool):
+            errors.append(f"Error in {location} - field \"{field}\" has invalid value {item[field]!r}")
+    for field in item:
+        if field not in schema:
+            errors.append(f"Error in {location} - unknown field \"{field}\"")
+    return errors
+
+
+def _get_number(value: float):
+    return int(value) if float(value).is_integer() else value
+
+
+def _get_csv_line(type_id: str, table_id: str, entry_id: str, entry: dict, link: Optional[str]) -> str:
+    columns = [f"{type_id}-{table_id}-{entry_id}", entry.get('assessment', "")]
+    for name in STIMULI_PARAMETER_NAMES:
+        value = entry.get(name, ENTRY_SCHEMA[name][2])
+        columns.append(str(_get_number(value)) if isinstance(value, (int, float)) else str(value))
+    columns.extend(["", link or "", ""])
+    return ";".join(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts a .csv stimuli-parameter file to a structured "
+                                                 "(.json) parameter file")
+    parser.add_argument('input', help='Path to the .csv parameter file')
+    parser.add_argument('output', help='Path to the structured parameter file to be written')
+    args = parser.parse_args()
+
+    errors = convert_parameter_file(args.input, args.output)
+    for error in errors:
+        print(f"Not converted: {error}")
+    print(f"Converted {args.input} to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Reuse-aware planning of recordings
+
+Before any device is used, the entries to be generated are grouped by the parameters which are relevant for the
+recording (see get_alternative_parameter_names). Only one representative of each group is recorded, the recording is
+then linked to the other entries of the group.
+"""
+
+import logging as log
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.parser.parser import ParameterTable
+from qoeval_pkg.uicontrol.usecase import UseCaseType, get_uc_type
+from qoeval_pkg.utils import convert_to_seconds, convert_to_timestr, get_stimuli_filename
+
+RECORDING_OVERHEAD = 60  # rough estimate of the time for launching the device and setting up the emulation [s]
+
+
+def get_capture_duration(parameter_table: ParameterTable, type_id: str, table_id: str, entry_id: str) -> float:
+    """Returns the time span [s] to be captured when recording the given entry"""
+    excerpt_duration = (convert_to_seconds(parameter_table.end(type_id, table_id, entry_id)) -
+                        convert_to_seconds(parameter_table.start(type_id, table_id, entry_id)))
+    return estimate_capture_duration(excerpt_duration, get_uc_type(type_id))
+
+
+def estimate_capture_duration(excerpt_duration: float, uc_type: UseCaseType) -> float:
+    """Returns the time span [s] to be captured for an excerpt of the given duration [s]"""
+    # estimate timespan to be recorded - to be careful we double the duration
+    capture_duration = excerpt_duration * 2.0 + 40
+    if uc_type == UseCaseType.YOUTUBE:
+        # for youtube we add three minutes (assumed maximum time for youtube to adapt playback to rate)
+        # and add some extra time during which e.g. the overflow can be shown
+        capture_duration = capture_duration + 180 + 20
+    return capture_duration
+
+
+@dataclass
+class PlannedRecording:
+    """A recording and the entries which re-use its result"""
+    entry_id: str
+    linked_entry_ids: List[str] = field(default_factory=list)
+    is_available: bool = False  # True: recording already exists, only the links are missing
+    duration: float = 0.0  # estimated duration of the recording [s]
+
+
+@dataclass
+class CampaignPlan:
+    """Recordings to be made for a set of entries of a parameter table"""
+    type_id: str
+    table_id: str
+    recordings: List[PlannedRecording] = field(default_factory=list)
+    skipped_ids: List[str] = field(default_factory=list)  # entries which are already available
+
+    @property
+    def planned_count(self) -> int:
+        return sum(1 for recording in self.recordings if not recording.is_available)
+
+    @property
+    def linked_count(self) -> int:
+        return sum(len(recording.linked_entry_ids) for recording in self.recordings)
+
+    @property
+    def planned_time(self) -> float:
+        return sum(recording.duration for recording in self.recordings if not recording.is_available)
+
+    @property
+    def saved_time(self) -> float:
+        return sum(recording.duration * len(recording.linked_entry_ids) for recording in self.recordings)
+
+    def __str__(self):
+        return f"Planned {self.planned_count} recording(s) for {self.type_id}-{self.table_id} " \
+               f"({len(self.skipped_ids)} entries already available, {self.linked_count} entries re-use a recording) " \
+               f"- estimated recording time: {convert_to_timestr(self.planned_time)}, " \
+               f"time saved: {convert_to_timestr(self.saved_time)}"
+
+
+def plan_campaign(parameter_table: ParameterTable, journal: CampaignJournal, type_id: str, table_id: str,
+                  entry_ids: List[str], overwrite: bool = False) -> CampaignPlan:
+    """
+        Plans the recordings for the given entries
+
+        Entries which are alternatives of each other are combined in one PlannedRecording. If an alternative has
+        already been recorded (even if it is not part of entry_ids), it is re-used instead of recording again.
+
+        Parameters
+        ----------
+        parameter_table : ParameterTable
+            Parameter table holding the entries
+        journal : CampaignJournal
+            Journal used to determine which entries are already available
+        type_id : str
+            Type of the stimuli, e.g. "VS"
+        table_id : str
+            Table of the stimuli, e.g. "A"
+        entry_ids : List[str]
+            Entries to be generated
+        overwrite : bool
+            Plan to record the entries even if they are already available
+
+        Returns
+        -------
+        CampaignPlan
+            The planned recordings
+        """
+    plan = CampaignPlan(type_id, table_id)
+    completed_ids = set() if overwrite else journal.completed_entry_ids(type_id, table_id, "0")
+    query = parameter_table.query()
+    alternative_groups = query.alternative_groups(type_id, table_id, "0")
+    table_entry_ids = list(query.filter(type_id=type_id, table_id=table_id)['entry_id'])
+    group_of_entry = dict(zip(table_entry_ids, alternative_groups))
+
+    recordings = {}
+    for entry_id in entry_ids:
+        if entry_id in completed_ids:
+            plan.skipped_ids.append(entry_id)
+            continue
+        # entries with invalid parameters are planned on their own (and will fail when being prepared)
+        group = group_of_entry.get(entry_id, f"invalid-{entry_id}")
+        recording = recordings.get(group)
+        if recording is None:
+            available_ids = [other_id for other_id in table_entry_ids
+                             if other_id in completed_ids and group_of_entry[other_id] == group]
+            if available_ids:
+                recording = PlannedRecording(available_ids[0], [entry_id], is_available=True)
+            else:
+                recording = PlannedRecording(entry_id)
+            try:
+                recording.duration = get_capture_duration(parameter_table, type_id, table_id, recording.entry_id) \
+                    + RECORDING_OVERHEAD
+            except (ValueError, TypeError):
+                recording.duration = 0.0
+            recordings[group] = recording
+            plan.recordings.append(recording)
+        else:
+            recording.linked_entry_ids.append(entry_id)
+    return plan
+
+
+def link_recording(qoeval_config: QoEvalConfiguration, journal: CampaignJournal, type_id: str, table_id: str,
+                   recording: PlannedRecording) -> Optional[str]:
+    """
+        Links the recorded stimulus of a planned recording to all entries re-using it
+
+        A symbolic link is used if possible, otherwise a hard link. Returns the path of the recorded stimulus or
+        None if it does not exist.
+        """
+    directory = qoeval_config.video_capture_path.get()
+    filename = get_stimuli_filename(qoeval_config, type_id, table_id, recording.entry_id, "0")
+    if not os.path.isfile(os.path.join(directory, filename)):
+        log.error(f"Recorded stimulus {filename} does not exist - cannot link it to {recording.linked_entry_ids}")
+        return None
+    for entry_id in recording.linked_entry_ids:
+        link_path = os.path.join(directory, get_stimuli_filename(qoeval_config, type_id, table_id, entry_id, "0"))
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        try:
+            os.symlink(filename, link_path)
+        except OSError:
+            os.link(os.path.join(directory, filename), link_path)
+        journal.complete(type_id, table_id, entry_id, "0", {'linked_to': filename})
+        print(f"Stimuli {os.path.basename(link_path)} re-uses {filename} (same relevant parameters)")
+    return os.path.join(directory, filename)
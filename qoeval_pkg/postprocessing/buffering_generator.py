@@ -11,9 +11,10 @@ import importlib_resources
 import logging as log
 
 from qoeval_pkg.configuration import QoEvalConfiguration
-from qoeval_pkg.parser.parser import get_parameters
+from qoeval_pkg.parser.parser import ParameterTable
 from qoeval_pkg.postprocessing.bufferer.bufferer import Bufferer
 from qoeval_pkg.postprocessing.postprocessor import FFPROBE
+from qoeval_pkg.timing import span
 from qoeval_pkg.utils import get_stimuli_path, get_video_id
 from qoeval_pkg import spinner
 
@@ -31,13 +32,14 @@ def _get_video_duration(input_path: str):
 
 
 class BufferingGenerator:
-    def __init__(self, qoeval_config: QoEvalConfiguration):
+    def __init__(self, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable):
         self.qoeval_config = qoeval_config
+        self.parameter_table = parameter_table
         self._spinner = importlib_resources.files(spinner) / _SPINNER_NAME
 
     def generate(self, type_id, table_id, entry_id):
 
-        input_path = get_stimuli_path(self.qoeval_config, type_id, table_id, entry_id, "1", True)
+        input_path = get_stimuli_path(self.qoeval_config, self.parameter_table, type_id, table_id, entry_id, "1", True)
         if not os.path.isfile(input_path):
             log.error(f"Cannot open post-processed input file {input_path}")
             raise RuntimeError(f"Video file {input_path} does not exist.")
@@ -45,7 +47,7 @@ class BufferingGenerator:
         output_path = os.path.join(self.qoeval_config.video_capture_path.get(),
                                    get_video_id(self.qoeval_config, type_id, table_id, entry_id, "2") + ".avi")
 
-        params = get_parameters(type_id, table_id, entry_id)
+        params = self.parameter_table.parameters(type_id, table_id, entry_id)
 
         buffering_list = ''
         if params['t_init'] > 0:
@@ -94,14 +96,16 @@ class BufferingGenerator:
                            '--black-frame': True,
                            '--force-framerate': False,
                            '--skipping': False}
-            bufferer = Bufferer(buffer_args)
+            with span("bufferer.probe"):
+                bufferer = Bufferer(buffer_args)
             try:
-                bufferer.insert_buf_audiovisual()
+                with span("bufferer.insert_buffering"):
+                    bufferer.insert_buf_audiovisual()
             except Exception as e:
                 raise RuntimeError("generating buffer video failed: " + str(e))
 
     def recode_setpts(self, type_id, table_id, entry_id):
-        input_path = get_stimuli_path(self.qoeval_config, type_id, table_id, entry_id, "2", True)
+        input_path = get_stimuli_path(self.qoeval_config, self.parameter_table, type_id, table_id, entry_id, "2", True)
         if not os.path.isfile(input_path):
             log.error(f"Cannot open post-processed input file {input_path}")
             raise RuntimeError(f"Video file {input_path} does not exist.")
@@ -116,6 +120,7 @@ class BufferingGenerator:
                   f"-map \"[v0]\" -map \"[a0]\" -y " \
                   f" {output_path}"
 
-        output = subprocess.run(shlex.split(command), stderr=subprocess.PIPE,
-                                universal_newlines=True)
+        with span("bufferer.recode_setpts"):
+            output = subprocess.run(shlex.split(command), stderr=subprocess.PIPE,
+                                    universal_newlines=True)
         output.check_returncode()
@@ -12,6 +12,7 @@ import subprocess
 import importlib_resources
 
 from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.timing import span
 from qoeval_pkg.videos import t_init
 
 FFMPEG = "ffmpeg"
@@ -104,7 +105,9 @@ class PostProcessor:
         ffmpeg_audio_filter = ""  # default is no audio filtering
         if normalize_audio:
             target_volume = self.qoeval_config.audio_target_volume.get()
-            current_volume = _get_max_volume(f"{os.path.join(self.qoeval_config.video_capture_path.get(), input_filename)}.avi")
+            with span("postprocessing.volume_detection"):
+                current_volume = _get_max_volume(
+                    f"{os.path.join(self.qoeval_config.video_capture_path.get(), input_filename)}.avi")
             if current_volume != target_volume:
                 volume = target_volume - current_volume
                 log.debug(f"audio normalization by {volume}dB (current volume: {current_volume}, "
@@ -165,8 +168,9 @@ class PostProcessor:
                           f"-map \"[v0]\" -map \"[a0]\" " \
                           f" -y {os.path.join(self.qoeval_config.video_capture_path.get(), output_filename)}.avi"
             log.debug(f"postproc mp4 reencoded cmd: {command}")
-            subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                           universal_newlines=True).check_returncode()
+            with span("postprocessing.cut_avi"):
+                subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
+                               universal_newlines=True).check_returncode()
 
             # Additionally create a H.264 encoded .mp4 output file
             if initbuf_len > 0:
@@ -195,8 +199,9 @@ class PostProcessor:
                           f"-map \"[v0]\" -map \"[a0]\" " \
                           f" -y {os.path.join(self.qoeval_config.video_capture_path.get(), output_filename)}.mp4"
             log.debug(f"postproc mp4 reencoded cmd: {command}")
-            subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
-                           universal_newlines=True).check_returncode()
+            with span("postprocessing.cut_mp4"):
+                subprocess.run(shlex.split(command), stdout=subprocess.PIPE,
+                               universal_newlines=True).check_returncode()
 
 
 def main():
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Retry policy for generating stimuli
+
+Permanent errors fail immediately. All other errors are retried with an exponentially growing, jittered delay, so that
+several devices failing at the same time (e.g. because of a network outage) do not retry in lock-step.
+"""
+
+import random
+from dataclasses import dataclass
+
+from qoeval_pkg.errors import PermanentError, PHASE_DEVICE
+
+RETRY_JITTER = 0.25  # max. relative deviation of a retry delay from its nominal value [0..1]
+
+# errors which are not StimulusErrors but will occur again if retried
+_PERMANENT_ERROR_TYPES = (PermanentError, ValueError, KeyError, FileNotFoundError)
+
+
+def is_permanent(error: BaseException) -> bool:
+    return isinstance(error, _PERMANENT_ERROR_TYPES)
+
+
+def get_retry_phase(error: BaseException) -> str:
+    """Returns the phase from which a failed recording has to be restarted (default: launching the device)"""
+    return getattr(error, 'phase', None) or PHASE_DEVICE
+
+
+@dataclass
+class RetryPolicy:
+    """
+        Decides if and when a failed attempt is retried
+
+        Attributes
+        ----------
+        max_retries : int
+            Number of retries after the first attempt
+        base_delay : float
+            Delay [s] before the first retry, doubled for each further retry
+        max_delay : float
+            Maximum delay [s] before a retry
+        """
+    max_retries: int
+    base_delay: float = 15.0
+    max_delay: float = 240.0
+
+    def should_retry(self, error: BaseException, retry_counter: int) -> bool:
+        """Returns True if the attempt which failed with error should be retried (retry_counter: retries so far)"""
+        return not is_permanent(error) and retry_counter < self.max_retries
+
+    def get_delay(self, retry_counter: int) -> float:
+        """Returns the delay [s] before the next retry (retry_counter: retries so far)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** retry_counter))
+        return delay * random.uniform(1.0 - RETRY_JITTER, 1.0 + RETRY_JITTER)
@@ -0,0 +1,241 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Parallel generation of stimuli on several devices
+
+The CampaignScheduler distributes the entries of a parameter table to one Coordinator per device. Each device is
+described by a copy of the configuration in which the device specific options (e.g. AdbDeviceSerial, NetDeviceName)
+are replaced by the values given in the CoordinatorWorkers option. Entries which are alternatives of each other
+(i.e. result in interchangeable stimuli) are handed to the same worker, so they are never recorded twice. The
+recordings are queued longest first (as predicted by the CostModel), so that the workers finish close together.
+"""
+
+import collections
+import logging as log
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+from qoeval_pkg.coordinator import Coordinator, MAX_RETRIES
+from qoeval_pkg.cost_model import CampaignEstimate, CostModel, sort_longest_first
+from qoeval_pkg.parser.parser import ParameterTable
+from qoeval_pkg.planner import CampaignPlan, plan_campaign
+from qoeval_pkg.journal import CampaignJournal
+from qoeval_pkg.retry import RetryPolicy, is_permanent
+from qoeval_pkg.utils import get_video_id
+
+MAX_WORKER_FAILURES = 3  # number of consecutive failures after which a worker (i.e. its device) is not used anymore
+
+
+@dataclass
+class CampaignSummary:
+    """Result of a campaign run by the CampaignScheduler"""
+    generated: int = 0  # stimuli actually recorded
+    linked: int = 0  # stimuli re-using the recording of an alternative entry (not part of the throughput)
+    skipped: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+    duration: float = 0.0  # [s]
+
+    @property
+    def failed(self) -> int:
+        return len(self.failed_ids)
+
+    @property
+    def stimuli_per_hour(self) -> float:
+        if self.duration <= 0:
+            return 0.0
+        return self.generated * 3600.0 / self.duration
+
+    def __str__(self):
+        text = f"Generated {self.generated} stimuli, linked {self.linked}, skipped {self.skipped}, " \
+               f"failed {self.failed} in {self.duration:.0f} s ({self.stimuli_per_hour:.1f} stimuli/hour)"
+        if self.failed_ids:
+            text += f" - failed: {', '.join(self.failed_ids)}"
+        return text
+
+
+@dataclass
+class _WorkItem:
+    entry_ids: List[str]
+    attempts: int = 0
+
+
+class CampaignScheduler:
+    """
+        Generates the stimuli of a parameter table in parallel on several devices.
+
+        Every worker owns one Coordinator (and therefore one device, capture and network emulation connection). A
+        failing entry is re-queued, so that it can be retried by any worker, and a worker which fails
+        MAX_WORKER_FAILURES times in a row is retired without affecting the other workers.
+
+        Attributes
+        ----------
+        qoeval_config : QoEvalConfiguration
+            Configuration of the campaign
+        parameter_table : ParameterTable
+            Parameter table holding the entries to be generated
+        worker_configs : List[QoEvalConfiguration]
+            One configuration per device
+        max_retries : int
+            Number of retries of an entry before it is regarded as failed
+        cost_model : CostModel
+            Model predicting the duration of the recordings
+        estimate : CampaignEstimate
+            Estimate to which the workers report finished recordings (optional)
+        """
+
+    def __init__(self, qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable,
+                 worker_configs: List[QoEvalConfiguration] = None, max_retries: int = MAX_RETRIES,
+                 cost_model: CostModel = None):
+        self.qoeval_config = qoeval_config
+        self.parameter_table = parameter_table
+        if worker_configs is None:
+            worker_configs = [qoeval_config.copy(option_values) for option_values in
+                              qoeval_config.coordinator_workers.get()]
+        if len(worker_configs) < 1:
+            worker_configs = [qoeval_config]
+        self.worker_configs = worker_configs
+        self.max_retries = max_retries
+        self.retry_policy = RetryPolicy(max_retries, qoeval_config.coordinator_retry_delay.get(),
+                                        qoeval_config.coordinator_retry_max_delay.get())
+        self.journal = CampaignJournal(qoeval_config)
+        self.cost_model = cost_model if cost_model else CostModel.from_history(qoeval_config, parameter_table)
+        self.estimate: Optional[CampaignEstimate] = None
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._in_progress = 0
+        self._summary = None
+
+    def run(self, type_id: str, table_id: str, entry_ids: List[str] = None,
+            overwrite: bool = False) -> CampaignSummary:
+        """
+            Generates the stimuli of the given entries and blocks until all of them are processed
+
+            Parameters
+            ----------
+            type_id : str
+                Type of the stimuli, e.g. "VS"
+            table_id : str
+                Table of the stimuli, e.g. "A"
+            entry_ids : List[str], optional
+                Entries to be generated, all entries of the table if not given
+            overwrite : bool
+                Generate stimuli even if they (or alternatives) are already available
+
+            Returns
+            -------
+            CampaignSummary
+                Number of generated, skipped and failed stimuli and the achieved throughput
+            """
+        if entry_ids is None:
+            entry_ids = self.parameter_table.entry_ids(type_id, table_id)
+        if len(entry_ids) < 1:
+            raise RuntimeError(f"No Stimuli-IDs to evaluate for {type_id}-{table_id}")
+
+        # exported once, before the workers start, so that they do not write the same files concurrently
+        self.parameter_table.export_tables(self.qoeval_config.video_capture_path.get(), [(type_id, table_id)])
+
+        self._summary = CampaignSummary()
+        start_time = time.time()
+        for ids in self._get_groups(type_id, table_id, entry_ids, overwrite):
+            self._queue.append(_WorkItem(ids))
+
+        workers = [threading.Thread(target=self._run_worker, name=f"worker{i}",
+                                    args=(f"worker{i}", config, type_id, table_id, overwrite), daemon=True)
+                   for i, config in enumerate(self.worker_configs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # entries which are still queued could not be processed since all workers have been retired
+        for item in self._queue:
+            self._summary.failed_ids.extend(get_video_id(self.qoeval_config, type_id, table_id, entry_id)
+                                            for entry_id in item.entry_ids)
+        self._queue.clear()
+        self._summary.duration = time.time() - start_time
+        log.info(f"Campaign {type_id}-{table_id} finished: {self._summary}")
+        print(self._summary)
+        return self._summary
+
+    def _get_groups(self, type_id: str, table_id: str, entry_ids: List[str], overwrite: bool) -> List[List[str]]:
+        """Returns the entries to be generated (longest first), alternative entries are combined in one group"""
+        plan = plan_campaign(self.parameter_table, self.journal, type_id, table_id, entry_ids, overwrite)
+        print(plan)
+        self._summary.skipped = len(plan.skipped_ids)
+        return [([] if recording.is_available else [recording.entry_id]) + recording.linked_entry_ids
+                for recording in sort_longest_first(self.cost_model, self.parameter_table, type_id, table_id,
+                                                    plan.recordings)]
+
+    def _get_next_item(self) -> Optional[_WorkItem]:
+        """Returns the next item to be processed or None if all items have been processed"""
+        with self._condition:
+            while len(self._queue) == 0:
+                if self._in_progress == 0:
+                    return None
+                # a failing item of another worker might be re-queued
+                self._condition.wait()
+            self._in_progress += 1
+            return self._queue.popleft()
+
+    def _finish_item(self, item: _WorkItem, error: Optional[Exception], type_id: str, table_id: str,
+                     plan: Optional[CampaignPlan]):
+        with self._condition:
+            self._in_progress -= 1
+            if plan is not None:
+                self._summary.generated += plan.planned_count
+                self._summary.linked += plan.linked_count
+            if error is not None:
+                item.attempts += 1
+                if self.retry_policy.should_retry(error, item.attempts - 1):
+                    self._queue.append(item)
+                else:
+                    self._summary.failed_ids.extend(get_video_id(self.qoeval_config, type_id, table_id, entry_id)
+                                                    for entry_id in item.entry_ids
+                                                    if not self.journal.is_completed(type_id, table_id, entry_id))
+            self._condition.notify_all()
+
+    def _run_worker(self, name: str, worker_config: QoEvalConfiguration, type_id: str, table_id: str,
+                    overwrite: bool):
+        try:
+            coordinator = Coordinator(worker_config, self.parameter_table, name=name)
+        except Exception as err:
+            log.error(f"Worker {name} could not be initialized and is not used: {err}")
+            return
+        coordinator.estimate = self.estimate
+
+        try:
+            self._process_items(name, coordinator, type_id, table_id, overwrite)
+        finally:
+            coordinator.close()
+
+    def _process_items(self, name: str, coordinator: Coordinator, type_id: str, table_id: str, overwrite: bool):
+        consecutive_failures = 0
+        while consecutive_failures < MAX_WORKER_FAILURES:
+            item = self._get_next_item()
+            if item is None:
+                return
+            plan = None
+            error = None
+            try:
+                # retries are handled by the scheduler, so that another device can retry the entries
+                plan = coordinator.generate(type_id, table_id, item.entry_ids, overwrite, max_retries=0)
+                consecutive_failures = 0
+            except Exception as err:
+                traceback.print_exc()
+                log.error(f"Worker {name} failed to generate {type_id}-{table_id} {item.entry_ids}: {err}")
+                error = err
+                # a permanent error is caused by the entries, not by the device of the worker
+                if not is_permanent(err):
+                    consecutive_failures += 1
+            self._finish_item(item, error, type_id, table_id, plan)
+            if error is not None and not is_permanent(error):
+                time.sleep(self.retry_policy.get_delay(consecutive_failures - 1))
+        log.error(f"Worker {name} failed {MAX_WORKER_FAILURES} times in a row and is not used anymore")
@@ -0,0 +1,109 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Synchronized start of the components of a recording
+
+The network emulation, the traffic analysis, the UI control and the capture of a recording are started by different
+threads. Each of them waits at the StartBarrier until all of them are ready, then all of them start at a common epoch
+(a time.monotonic() instant shortly after the last one arrived). Each component reports when it has actually started,
+so the offsets from the epoch (e.g. the time ffmpeg needs to start) are logged with the recording. The epoch is also
+available as wall-clock time, e.g. as time 0 of the traffic statistics.
+"""
+
+import logging as log
+import threading
+import time
+from typing import Callable, Dict, List
+
+START_BARRIER_LEAD = 0.1  # time [s] from the last component arriving at the barrier to the common start
+START_BARRIER_TIMEOUT = 60.0  # max. time [s] to wait for all components to arrive at the barrier
+
+
+class StartBarrier:
+    """
+        Barrier at which the components of a recording wait for a common start
+
+        Attributes
+        ----------
+        parties : List[str]
+            Names of the components, e.g. ["netem", "capture"]
+        epoch : float
+            time.monotonic() instant at which all components start (None until all of them have arrived)
+        wall_epoch : float
+            epoch as wall-clock time (time.time())
+        """
+
+    def __init__(self, parties: List[str], lead: float = START_BARRIER_LEAD, timeout: float = START_BARRIER_TIMEOUT):
+        if len(set(parties)) != len(parties):
+            raise RuntimeError(f"Names of the parties of a start barrier are not unique: {parties}")
+        self.parties = parties
+        self.epoch = None
+        self.wall_epoch = None
+        self._lead = lead
+        self._timeout = timeout
+        self._offsets = {}  # party: time [s] from the epoch to the actual start
+        self._lock = threading.Lock()
+        self._barrier = threading.Barrier(len(parties), action=self._set_epoch, timeout=timeout)
+
+    def _set_epoch(self):
+        # called by the last party arriving, before any party is released
+        self.epoch = time.monotonic() + self._lead
+        self.wall_epoch = time.time() + self._lead
+
+    def wait(self, party: str) -> float:
+        """
+            Blocks until all parties have arrived and the epoch has been reached, returns the epoch
+
+            Raises threading.BrokenBarrierError (a RuntimeError) if the barrier is aborted or not all parties arrive
+            within the timeout.
+            """
+        if party not in self.parties:
+            raise RuntimeError(f"{party} is not a party of the start barrier {self.parties}")
+        self._barrier.wait()
+        delay = self.epoch - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return self.epoch
+
+    def started(self, party: str) -> float:
+        """Records that the party has started now, returns its offset [s] from the epoch"""
+        offset = time.monotonic() - self.epoch
+        with self._lock:
+            self._offsets[party] = offset
+        log.debug(f"{party} started {offset * 1000.0:.1f} ms after the common start")
+        return offset
+
+    def abort(self):
+        """
+            Releases all waiting parties with a BrokenBarrierError, e.g. if a party cannot start at all
+
+            Has no effect once all parties have arrived.
+            """
+        if self.epoch is None:
+            self._barrier.abort()
+
+    def run(self, function: Callable, *args, **kwargs):
+        """Calls function (a party waiting at the barrier) and aborts the barrier if function fails"""
+        try:
+            return function(*args, **kwargs)
+        except BaseException:
+            self.abort()
+            raise
+
+    @property
+    def is_broken(self) -> bool:
+        return self._barrier.broken
+
+    def get_offsets(self) -> Dict[str, float]:
+        """Returns the offset [s] from the epoch to the start of each party which has started"""
+        with self._lock:
+            return dict(self._offsets)
+
+    def __str__(self):
+        offsets = self.get_offsets()
+        return ", ".join(f"{party}: {offsets[party] * 1000.0:.1f}ms" if party in offsets else f"{party}: not started"
+                         for party in self.parties)
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Concurrent execution of dependent tasks
+
+Used for preparing a recording (see Coordinator._prepare): the steps are blocking calls of external tools (adb, tc,
+ping), so each task runs in a thread of its own as soon as all tasks it depends on have finished.
+"""
+
+import concurrent.futures
+import logging as log
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+
+@dataclass
+class Task:
+    name: str
+    function: Callable[[], None]
+    depends_on: List[str] = field(default_factory=list)  # names of tasks which must have finished before
+
+
+def run_task_graph(tasks: List[Task], thread_name_prefix: str = "task"):
+    """
+        Runs the tasks concurrently and blocks until all of them have finished
+
+        A dependency which is not part of the graph is regarded as finished, so a graph can be reduced to a subset of
+        its tasks (e.g. when retrying only the later steps). If a task fails, no further tasks are started - the tasks
+        still running are awaited and the error of the first failed task is raised.
+
+        Parameters
+        ----------
+        tasks : List[Task]
+            Tasks to be run, names must be unique
+        thread_name_prefix : str
+            Prefix of the names of the threads running the tasks
+        """
+    names = [task.name for task in tasks]
+    if len(set(names)) != len(names):
+        raise RuntimeError(f"Task names are not unique: {names}")
+    pending = {task.name: task for task in tasks}
+    finished = set(dependency for task in tasks for dependency in task.depends_on if dependency not in pending)
+    running = {}  # future: name of its task
+    error = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(tasks)),
+                                               thread_name_prefix=thread_name_prefix) as executor:
+        while pending or running:
+            if error is None:
+                for name, task in list(pending.items()):
+                    if all(dependency in finished for dependency in task.depends_on):
+                        del pending[name]
+                        running[executor.submit(task.function)] = name
+            if not running:
+                if error is None:
+                    raise RuntimeError(f"Tasks {list(pending)} depend on each other and cannot be run")
+                break
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    log.error(f"Task {name} failed: {future.exception()}")
+                    error = error or future.exception()
+                else:
+                    finished.add(name)
+    if error is not None:
+        raise error
@@ -0,0 +1,261 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+
+"""
+Timing of the processing phases of stimuli
+
+A phase is measured by
+
+    with span("capture.record"):
+        ...
+
+The span is added to the StimulusTimer which is active in the current thread - if no timer is active, nothing is
+measured. A StimulusTimer collects the spans of one stimulus and processing step (P0: recording, P1: post-processing,
+...) and is written to "{video_id}_timing.json" in the video capture path. CampaignMetrics aggregates all finished
+timers of a process and writes them to a Prometheus textfile (e.g. for the textfile collector of the node exporter):
+the total time spent in each phase, the wall-clock time per stimulus and the throughput.
+"""
+
+import contextlib
+import json
+import logging as log
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+from qoeval_pkg.configuration import QoEvalConfiguration
+
+TIMING_FILE_SUFFIX = "_timing.json"
+METRICS_FILE_NAME = "qoeval.prom"
+METRICS_PREFIX = "qoeval"
+
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+_local = threading.local()
+_metrics = {}  # CampaignMetrics of each metrics file
+_metrics_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # wall-clock time (time.time()) at which the span started
+    duration: float  # [s]
+    thread: str
+
+
+class StimulusTimer:
+    """
+        Collects the spans of one processing step of a stimulus
+
+        Spans can be added by several threads (see bind), e.g. by the capture and the ui control thread.
+
+        Attributes
+        ----------
+        video_id : str
+            Id of the processed stimulus (including the processing step)
+        step : str
+            Processing step, e.g. "0" for the recording
+        """
+
+    def __init__(self, video_id: str, step: str):
+        self.video_id = video_id
+        self.step = step
+        self.spans: List[Span] = []
+        self.start_time = time.time()
+        self.duration = None
+        self.status = None
+        self.features = None  # parameters of the stimulus the duration depends on (see cost_model)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Makes this timer the active timer of the current thread while the context is entered"""
+        previous = getattr(_local, 'timer', None)
+        _local.timer = self
+        try:
+            yield self
+        finally:
+            _local.timer = previous
+
+    def finish(self, status: str):
+        self.duration = time.monotonic() - self._start
+        self.status = status
+
+    def phase_durations(self) -> Dict[str, float]:
+        """Returns the total duration [s] of each phase (spans with the same name are added up)"""
+        durations = {}
+        with self._lock:
+            for timer_span in self.spans:
+                durations[timer_span.name] = durations.get(timer_span.name, 0.0) + timer_span.duration
+        return durations
+
+    def save(self, directory: str) -> str:
+        """Writes the timer to "{video_id}_timing.json" in the given directory and returns the path of the file"""
+        file_path = os.path.join(directory, f"{self.video_id}{TIMING_FILE_SUFFIX}")
+        with self._lock:
+            content = {'video_id': self.video_id, 'step': self.step, 'start': self.start_time,
+                       'duration': self.duration, 'status': self.status, 'features': self.features,
+                       'spans': [asdict(timer_span) for timer_span in self.spans]}
+        content['phases'] = self.phase_durations()
+        with open(file_path, "w") as f:
+            json.dump(content, f, indent=2)
+        return file_path
+
+
+def current_timer() -> Optional[StimulusTimer]:
+    return getattr(_local, 'timer', None)
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Measures the duration of the enclosed code as phase name of the active timer (if any)"""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    start_time = time.time()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timer.add(Span(name, start_time, time.monotonic() - start, threading.current_thread().name))
+
+
+def bind(function: Callable, name: str = None) -> Callable:
+    """
+        Returns a function which calls function with the timer active in the calling thread
+
+        Used for functions executed in another thread. If name is given, the call is measured as a span.
+        """
+    timer = current_timer()
+
+    def bound_function(*args, **kwargs):
+        if timer is None:
+            return function(*args, **kwargs)
+        with timer.activate():
+            if name is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+
+    return bound_function
+
+
+def metrics_file(qoeval_config: QoEvalConfiguration) -> str:
+    directory = qoeval_config.metrics_textfile_path.get() or qoeval_config.video_capture_path.get()
+    return os.path.join(directory, METRICS_FILE_NAME)
+
+
+def get_campaign_metrics(qoeval_config: QoEvalConfiguration) -> 'CampaignMetrics':
+    """Returns the CampaignMetrics of the metrics file of the configuration (shared by all coordinators)"""
+    file_path = metrics_file(qoeval_config)
+    with _metrics_lock:
+        if file_path not in _metrics:
+            _metrics[file_path] = CampaignMetrics(file_path)
+        return _metrics[file_path]
+
+
+class CampaignMetrics:
+    """
+        Aggregates the finished StimulusTimers of a process and writes them as Prometheus textfile
+
+        Attributes
+        ----------
+        file_path : str
+            Path of the Prometheus textfile, written each time a timer is added
+        """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.start_time = None  # start of the first stimulus
+        self._phase_sums = {}  # phase: total duration [s]
+        self._phase_counts = {}  # phase: number of spans
+        self._step_sums = {}  # step: total wall-clock duration [s] of all stimuli
+        self._step_counts = {}  # (step, status): number of stimuli
+        self._lock = threading.Lock()
+
+    def add(self, timer: StimulusTimer):
+        with self._lock:
+            self.start_time = timer.start_time if self.start_time is None else min(self.start_time, timer.start_time)
+            for phase_span in list(timer.spans):
+                self._phase_sums[phase_span.name] = self._phase_sums.get(phase_span.name, 0.0) + phase_span.duration
+                self._phase_counts[phase_span.name] = self._phase_counts.get(phase_span.name, 0) + 1
+            self._step_sums[timer.step] = self._step_sums.get(timer.step, 0.0) + (timer.duration or 0.0)
+            key = (timer.step, timer.status)
+            self._step_counts[key] = self._step_counts.get(key, 0) + 1
+            text = self._get_text()
+        try:
+            # written to a temporary file first, so that the collector never reads a partially written file
+            tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, self.file_path)
+        except OSError as err:
+            log.error(f"Cannot write metrics to {self.file_path}: {err}")
+
+    def get_wall_time(self) -> float:
+        """Returns the wall-clock time [s] since the first stimulus has been started"""
+        return time.time() - self.start_time if self.start_time is not None else 0.0
+
+    def get_throughput(self, step: str) -> float:
+        """Returns the number of stimuli per hour which completed processing step step"""
+        wall_time = self.get_wall_time()
+        if wall_time <= 0:
+            return 0.0
+        return self._step_counts.get((step, STATUS_COMPLETED), 0) * 3600.0 / wall_time
+
+    def get_summary(self) -> str:
+        """Returns a human-readable summary of the number of stimuli and the throughput of each processing step"""
+        with self._lock:
+            lines = [f"Campaign wall-clock time: {self.get_wall_time():.1f} s"]
+            for step in sorted(self._step_sums):
+                lines.append(f"P{step}: {self._step_counts.get((step, STATUS_COMPLETED), 0)} completed, "
+                             f"{self._step_counts.get((step, STATUS_FAILED), 0)} failed, "
+                             f"{self.get_throughput(step):.1f} stimuli/h")
+        return "\n".join(lines)
+
+    def _get_text(self) -> str:
+        now = time.time()
+        wall_time = self.get_wall_time()
+        lines = [f"# HELP {METRICS_PREFIX}_phase_duration_seconds Time spent in a processing phase",
+                 f"# TYPE {METRICS_PREFIX}_phase_duration_seconds summary"]
+        for phase in sorted(self._phase_sums):
+            lines.append(f'{METRICS_PREFIX}_phase_duration_seconds_sum{{phase="{phase}"}} '
+                         f'{self._phase_sums[phase]:.3f}')
+            lines.append(f'{METRICS_PREFIX}_phase_duration_seconds_count{{phase="{phase}"}} '
+                         f'{self._phase_counts[phase]}')
+        lines += [f"# HELP {METRICS_PREFIX}_stimulus_duration_seconds Wall-clock time of a processing step",
+                  f"# TYPE {METRICS_PREFIX}_stimulus_duration_seconds summary"]
+        for step in sorted(self._step_sums):
+            count = sum(value for (count_step, _), value in self._step_counts.items() if count_step == step)
+            lines.append(f'{METRICS_PREFIX}_stimulus_duration_seconds_sum{{step="P{step}"}} '
+                         f'{self._step_sums[step]:.3f}')
+            lines.append(f'{METRICS_PREFIX}_stimulus_duration_seconds_count{{step="P{step}"}} {count}')
+        lines += [f"# HELP {METRICS_PREFIX}_stimuli_total Number of processed stimuli",
+                  f"# TYPE {METRICS_PREFIX}_stimuli_total counter"]
+        for (step, status) in sorted(self._step_counts):
+            lines.append(f'{METRICS_PREFIX}_stimuli_total{{step="P{step}",status="{status}"}} '
+                         f'{self._step_counts[(step, status)]}')
+        lines += [f"# HELP {METRICS_PREFIX}_stimuli_per_hour Completed stimuli per hour since the campaign started",
+                  f"# TYPE {METRICS_PREFIX}_stimuli_per_hour gauge"]
+        for step in sorted(self._step_sums):
+            lines.append(f'{METRICS_PREFIX}_stimuli_per_hour{{step="P{step}"}} {self.get_throughput(step):.3f}')
+        lines += [f"# HELP {METRICS_PREFIX}_campaign_wall_seconds Wall-clock time since the campaign started",
+                  f"# TYPE {METRICS_PREFIX}_campaign_wall_seconds gauge",
+                  f"{METRICS_PREFIX}_campaign_wall_seconds {wall_time:.3f}",
+                  f"# HELP {METRICS_PREFIX}_last_update_timestamp_seconds Time of the last update of this file",
+                  f"# TYPE {METRICS_PREFIX}_last_update_timestamp_seconds gauge",
+                  f"{METRICS_PREFIX}_last_update_timestamp_seconds {now:.3f}"]
+        return "\n".join(lines) + "\n"
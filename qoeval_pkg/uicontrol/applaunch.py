@@ -30,6 +30,7 @@ very helpful, if you need to find out the different IDs of user-interface elemen
 import logging as log
 import time
 
+from qoeval_pkg.errors import PermanentError
 from qoeval_pkg.uicontrol.usecase import UseCase, UseCaseState, UseCaseInteractionElement, UseCaseInteraction
 
 # Specification of app names for specific app packages (TODO: automatically find out name)
@@ -166,7 +167,7 @@ class _AppLaunch(UseCase):
 
     def _reset_app_cache(self):
         if not self._package in _APP_NAMES:
-            raise RuntimeError(f'Cannot reset only cached data for {self._package} - not in _APP_NAMES')
+            raise PermanentError(f'Cannot reset only cached data for {self._package} - not in _APP_NAMES')
         self.device.shell("am force-stop com.android.settings")
         time.sleep(_SHORT_TIME)
         self.device.shell("am start -a android.settings.APPLICATION_SETTINGS")
@@ -227,8 +228,7 @@ class _AppLaunch(UseCase):
         #     self._vc.dump(window=-1, sleep=0)
         #     self._vc.traverse()
 
-        if time.time() - start_time < duration:
-            time.sleep(duration - (time.time() - start_time))
+        self._wait(duration - (time.time() - start_time))
 
         self.state = UseCaseState.EXECUTED
 
@@ -65,6 +65,11 @@ class UiControl:
             raise RuntimeError('Cannot execute use case - not prepared.')
         self._current_use_case.execute(duration)
 
+    def stop_use_case(self):
+        """Requests the use-case currently executed to finish early"""
+        if self._current_use_case:
+            self._current_use_case.request_stop()
+
     def shutdown_use_case(self):
         if not self._current_use_case:
             raise RuntimeError('Cannot shutdown use case - must be set first.')
@@ -72,6 +77,45 @@ class UiControl:
         self._current_use_case = None
 
 
+class SimulatedUiControl(UiControl):
+    """
+        UI control of a SimulatedDevice (see qoeval --simulate)
+
+        The use-case is not executed on a device: executing it returns immediately (or when it is stopped), the
+        simulated capture synthesizes the recorded video.
+        """
+
+    def __init__(self, serialno: str):
+        super().__init__(serialno)
+        self._use_case_type = None
+
+    def connect_device(self):
+        self.is_connected = True
+
+    def set_use_case(self, use_case_type: UseCaseType, **kwargs: object):
+        if self._use_case_type is not None:
+            log.error(f"There is already an active use-case: {self._use_case_type.name}")
+            return
+        log.debug(f"simulated use-case {use_case_type.name}: {kwargs}")
+        self._use_case_type = use_case_type
+
+    def prepare_use_case(self):
+        if not self._use_case_type:
+            raise RuntimeError('Cannot prepare use case - must be set first.')
+
+    def execute_use_case(self, duration: float):
+        if not self._use_case_type:
+            raise RuntimeError('Cannot execute use case - not prepared.')
+
+    def stop_use_case(self):
+        pass
+
+    def shutdown_use_case(self):
+        if not self._use_case_type:
+            raise RuntimeError('Cannot shutdown use case - must be set first.')
+        self._use_case_type = None
+
+
 if __name__ == '__main__':
     # executed directly as a script
     print("QoE User Interface control")
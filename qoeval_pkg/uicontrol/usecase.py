@@ -3,6 +3,7 @@
 # Authors:  Lars Wischhof, <wischhof@ieee.org>
 #
 # License:  LGPL 3.0 - see LICENSE file for details
+import threading
 import time
 from enum import Enum
 import logging as log
@@ -12,6 +13,8 @@ from com.dtmilano.android.adb.adbclient import Device
 from typing import List
 from dataclasses import dataclass
 
+from qoeval_pkg.errors import PermanentError
+
 
 # define available types of use-cases (used for factory)
 class UseCaseType(Enum):
@@ -21,6 +24,17 @@ class UseCaseType(Enum):
     UI_TRACING = "_UiTracing"  # a special use-case for tracing user-interface elements
 
 
+def get_uc_type(type_id: str) -> UseCaseType:
+    """Returns the type of use-case of a stimuli type id as used in parameter files (e.g. "VS")"""
+    if type_id.startswith("VS"):
+        return UseCaseType.YOUTUBE
+    elif type_id.startswith("WB"):
+        return UseCaseType.WEB_BROWSING
+    elif type_id.startswith("AL"):
+        return UseCaseType.APP_LAUNCH
+    raise PermanentError(f'Use-case type of \"{type_id}\" is unknown.')
+
+
 class UseCaseState(Enum):
     UNKNOWN = 0
     CREATED = 1
@@ -59,6 +73,7 @@ class UseCase:
         self.time_end = None
         self._vc = None
         self.state = UseCaseState.CREATED
+        self._stop_event = threading.Event()
 
     def _touch_view_by_id(self, id: str, max_waiting_time: float = 0.5, text_input=None, do_touch=True):
         end_time = time.time() + max_waiting_time
@@ -76,7 +91,7 @@ class UseCase:
                 return
 
         log.error(f"View {id} NOT found!")
-        raise RuntimeError(f"View {id} NOT found!")
+        raise PermanentError(f"View {id} NOT found!")
 
     def _wait_until_id_not_found(self, id: str, max_waiting_time: float = 0.5):
         end_time = time.time() + max_waiting_time
@@ -105,7 +120,7 @@ class UseCase:
                 return
 
         log.error(f"View with text {text} NOT found!")
-        raise RuntimeError(f"View with text {text} NOT found!")
+        raise PermanentError(f"View with text {text} NOT found!")
 
     def _handle_interactions(self, interactions):
         for interaction in interactions.elements:
@@ -157,6 +172,14 @@ class UseCase:
     def execute(self, duration: float):
         self.time_end = time.time() + duration
 
+    def request_stop(self):
+        """Requests to finish the execution early, e.g. because the end of the relevant section was recorded"""
+        self._stop_event.set()
+
+    def _wait(self, duration: float) -> bool:
+        """Waits for the given duration [s] or until a stop is requested, returns True if a stop was requested"""
+        return self._stop_event.wait(max(0.0, duration))
+
     def shutdown(self):
         pass
 
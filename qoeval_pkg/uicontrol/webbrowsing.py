@@ -143,7 +143,7 @@ class _WebBrowsing(UseCase):
             self._handle_interactions(interactions)
         else:
             log.debug(f"No interactions defined for {self._url} - waiting a few seconds and terminating.")
-            ViewClient.sleep(10)
+            self._wait(10)
         # self._vc.dump(window=-1, sleep=0)
         # self._vc.traverse()
         # ViewClient.sleep(10)
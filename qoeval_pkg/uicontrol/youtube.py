@@ -9,6 +9,7 @@ import logging as log
 import time
 import re
 from com.dtmilano.android.adb import adbclient
+from qoeval_pkg.errors import PermanentError
 from qoeval_pkg.uicontrol.usecase import UseCase, UseCaseState
 
 # Links
@@ -147,7 +148,7 @@ class _Youtube(UseCase):
                 break
 
         if not target_views[0]:
-            raise RuntimeError(f'Could not manually select resolution {self.resolution}')
+            raise PermanentError(f'Could not manually select resolution {self.resolution}')
 
         # self._vc.dump(window=-1, sleep=0)
         # self._vc.traverse()
@@ -184,7 +185,7 @@ class _Youtube(UseCase):
             prep_url = _get_intent_url(self.url, _ASSUMED_POS_OUTSIDE_STIMULI)
             if self.start_time is None or \
                     abs(_ASSUMED_POS_OUTSIDE_STIMULI - self.start_time) < _ASSUMED_MAX_BUFFER_TIME:
-                raise RuntimeError(f'Use case wants to manually select the resolution but start_time {self.start_time} '
+                raise PermanentError(f'Use case wants to manually select the resolution but start_time {self.start_time} '
                                    f'is too close to preparation time position.')
         else:
             prep_url = YOUTUBE_URL_PREPARE_DEFAULT
@@ -235,7 +236,8 @@ class _Youtube(UseCase):
         self.device.shell(f"am start -a android.intent.action.VIEW \"{intent_url}\"")
 
         if self.show_resolution:
-            time.sleep(duration - _SHOW_RESOLUTION_TIMESPAN)
+            # the overflow is also shown if the execution is stopped early
+            self._wait(duration - _SHOW_RESOLUTION_TIMESPAN)
             log.debug("Showing overflow")
             # pausing youtube app
             self._pause_player()
@@ -244,7 +246,7 @@ class _Youtube(UseCase):
             self._touch_overflow_button()
             time.sleep(_SHOW_RESOLUTION_TIMESPAN)
         else:
-            time.sleep(duration)
+            self._wait(duration)
         self.state = UseCaseState.EXECUTED
 
     def shutdown(self):
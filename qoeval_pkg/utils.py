@@ -11,7 +11,8 @@ from typing import List
 
 from qoeval_pkg.configuration import QoEvalConfiguration, MobileDeviceType
 from . import __version__
-from .parser.parser import get_entry_ids, get_parameters, get_codec
+from .parser.parser import ParameterTable
+from .parser.query import get_alternative_parameter_names
 
 
 def wait_countdown(time_in_sec: int):
@@ -48,6 +49,8 @@ def get_video_id(qoeval_config: QoEvalConfiguration, type_id: str, table_id: str
         emulator_id += "G"
     if qoeval_config.emulator_type.get() == MobileDeviceType.REAL_DEVICE:
         emulator_id += "R"
+    if qoeval_config.emulator_type.get() == MobileDeviceType.SIMULATED:
+        emulator_id += "X"
 
     emulator_id += f"-{__version__}"
 
@@ -71,27 +74,22 @@ def is_stimuli_available(qoeval_config: QoEvalConfiguration, type_id, table_id,
 # Note: Which parameters are relevant can depend on the type of the stimuli, since e.g. for
 #       Video Stream With Generated Buffering (VSB) the t_init parameter is only relevant for post-processing step 2
 def are_alternative_params(params_A, params_B, type_id, postprocessing_step):
-    checklist = ['rul', 'rdl', 'dul', 'ddl', 'codec', 'dynamic']
-    if not ( type_id == "VSB" and postprocessing_step in ["0", "1"] ):
-        checklist.append('t_init')
+    checklist = get_alternative_parameter_names(type_id, postprocessing_step)
     is_ok = True
     for check in checklist:
         is_ok = is_ok and params_A[check] == params_B[check]
     return is_ok
 
 
-def get_existing_stimuli_with_same_parameters(qoeval_config: QoEvalConfiguration, type_id, table_id, entry_id,
-                                              postprocessing_step) -> List[str]:
+def get_existing_stimuli_with_same_parameters(qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable,
+                                              type_id, table_id, entry_id, postprocessing_step) -> List[str]:
     stimuli = []
 
-    ids_available = get_entry_ids(type_id, table_id)
-    desired_params = get_parameters(type_id, table_id, entry_id)
-    desired_codec = get_codec(type_id, table_id, entry_id)
+    # all alternatives are determined by a single group-by over the relevant parameters of the table
+    alternative_ids = parameter_table.query().alternative_entry_ids(type_id, table_id, entry_id, postprocessing_step)
 
-    for entry_id_to_check in ids_available:
-        params = get_parameters(type_id, table_id, entry_id_to_check)
-        if are_alternative_params(params, desired_params, type_id, postprocessing_step) and \
-                is_stimuli_available(qoeval_config, type_id, table_id, entry_id_to_check, postprocessing_step):
+    for entry_id_to_check in alternative_ids:
+        if is_stimuli_available(qoeval_config, type_id, table_id, entry_id_to_check, postprocessing_step):
             path_to_stimuli = os.path.join(qoeval_config.video_capture_path.get(),
                                            get_stimuli_filename(qoeval_config, type_id, table_id, entry_id_to_check,
                                                                 postprocessing_step))
@@ -100,7 +98,7 @@ def get_existing_stimuli_with_same_parameters(qoeval_config: QoEvalConfiguration
     return stimuli
 
 
-def get_stimuli_path(qoeval_config: QoEvalConfiguration, type_id, table_id, entry_id,
+def get_stimuli_path(qoeval_config: QoEvalConfiguration, parameter_table: ParameterTable, type_id, table_id, entry_id,
                      postprocessing_step: str = "0",
                      reuse_existing_with_same_parameters=True) -> str:
     if is_stimuli_available(qoeval_config, type_id, table_id, entry_id, postprocessing_step):
@@ -108,7 +106,7 @@ def get_stimuli_path(qoeval_config: QoEvalConfiguration, type_id, table_id, entr
                             get_stimuli_filename(qoeval_config, type_id, table_id, entry_id, postprocessing_step))
 
     if reuse_existing_with_same_parameters:
-        stimuli = get_existing_stimuli_with_same_parameters(qoeval_config, type_id, table_id,
+        stimuli = get_existing_stimuli_with_same_parameters(qoeval_config, parameter_table, type_id, table_id,
                                                             entry_id, postprocessing_step)
         if stimuli and len(stimuli) > 0:
             return stimuli[0]
@@ -0,0 +1,83 @@
+#!/bin/python3
+# SPDX-License-Identifier: LGPL-3.0-or-later
+#
+# Authors:  Lars Wischhof, <wischhof@ieee.org>
+#
+# License:  LGPL 3.0 - see LICENSE file for details
+"""
+    Benchmark for loading (large) parameter files with and without the compiled parameter table cache
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from qoeval_pkg.parser.parser import ParameterTable, load_cached_parameter_table
+
+HEADER = "Stimulus-ID;Assessment;\"Tinit [ms]\";\"RUL [kbps]\";\"RDL [kbps]\";\"DUL [ms]\";\"DDL [ms]\";" \
+         "\"Stimulus in picture\";Codec;\"Dynamic\";\"Num. Rebuffering\";\"Rebuffering duration  [ms]\";" \
+         "Video;Link;Assessment"
+
+
+def _generate_table(table_id: str, nr_entries: int) -> str:
+    lines = [";;;;;;;;;;;;;;", HEADER,
+             f"VS-{table_id}-1;\"Sweep\";720;80;50000;16;16;Reference;Auto;;0;0;\"Synthetic sweep\n"
+             f"Excerpt from appr. 00:00:57 (h:min:sec) to 00:01:14 (h:min:sec).\n"
+             f"Resolution: Auto, 1080p, 720p\";https://www.youtube.com/watch?v=yTL8j-JU_ow;Throughput"]
+    for i in range(2, nr_entries + 1):
+        lines.append(f"VS-{table_id}-{i};\"Sweep\";{720 + (i % 50) * 100};{40 + i % 40};{100 + (i * 37) % 50000};"
+                     f"{16 + i % 300};{16 + i % 300};Assessment;Auto;;{i % 4};{(i % 4) * 1000};;;")
+    return "\n".join(lines)
+
+
+def generate_parameter_file(path: str, nr_tables: int, nr_entries: int):
+    """Writes a synthetic parameter file with nr_tables VS tables of nr_entries entries each"""
+    table_ids = [chr(ord('A') + i) for i in range(nr_tables)]
+    with open(path, "w") as f:
+        f.write("Video-Streaming (VS);;;;;;;;;;;;;;\n")
+        f.write("\n".join(_generate_table(table_id, nr_entries) for table_id in table_ids))
+
+
+def _measure(function, repetitions: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and warm load times of a synthetic parameter file")
+    parser.add_argument('--tables', type=int, default=10, help='Number of tables (default: 10)')
+    parser.add_argument('--entries', type=int, default=2000, help='Number of entries per table (default: 2000)')
+    parser.add_argument('--repetitions', type=int, default=5, help='Number of repetitions (default: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parameter_file = os.path.join(tmp_dir, "synthetic.csv")
+        cache_file = os.path.join(tmp_dir, "synthetic.pickle")
+        generate_parameter_file(parameter_file, args.tables, args.entries)
+        print(f"Synthetic parameter file: {args.tables} tables x {args.entries} entries "
+              f"({os.path.getsize(parameter_file) / 1024:.0f} KiB)")
+
+        def cold_load():
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+            load_cached_parameter_table(parameter_file, cache_file)
+
+        t_parse = _measure(lambda: ParameterTable.from_file(parameter_file), args.repetitions)
+        t_cold = _measure(cold_load, args.repetitions)
+        t_warm = _measure(lambda: load_cached_parameter_table(parameter_file, cache_file), args.repetitions)
+
+        table = load_cached_parameter_table(parameter_file, cache_file)
+        nr_entries = sum(len(table.entry_ids(type_id, table_id))
+                         for type_id in table.type_ids() for table_id in table.table_ids(type_id))
+
+    print(f"Entries loaded:                     {nr_entries}")
+    print(f"Parse without cache:                {t_parse:8.1f} ms")
+    print(f"Cold load (parse and write cache):  {t_cold:8.1f} ms")
+    print(f"Warm load (from cache):             {t_warm:8.1f} ms")
+    print(f"Speed-up warm vs. parse:            {t_parse / t_warm:8.1f} x")
+
+
+if __name__ == '__main__':
+    main()